@@ -0,0 +1,340 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Assembler of Python bytecode listings.
+
+The compiler emits only a small subset of opcodes, in structured patterns.
+This allows for a simple assembler: labels are resolved by backpatching, and
+stack depth is tracked incrementally, in a single pass over the listing.
+The resulting code objects are identical to those that byteplay produces.'''
+
+import types
+from array import array
+from opcode import EXTENDED_ARG, HAVE_ARGUMENT
+
+import bp
+
+__all__ = ['assemble']
+
+CO_OPTIMIZED = 0x0001
+CO_NEWLOCALS = 0x0002
+CO_VARARGS = 0x0004
+CO_VARKEYWORDS = 0x0008
+CO_GENERATOR = 0x0020
+CO_NOFREE = 0x0040
+
+def _op(name):
+    return bp.opmap.get(name)
+
+# Stack effects of opcodes that always continue to the next instruction:
+_stack_effects = {}
+for _names, _effect in [
+    ('NOP PRINT_NEWLINE DELETE_FAST DELETE_GLOBAL DELETE_NAME '
+     'UNARY_POSITIVE UNARY_NEGATIVE UNARY_NOT UNARY_CONVERT UNARY_INVERT GET_ITER LOAD_ATTR', 0),
+    ('ROT_TWO ROT_THREE ROT_FOUR', 0),
+    ('LOAD_CONST LOAD_NAME LOAD_GLOBAL LOAD_FAST LOAD_CLOSURE LOAD_DEREF LOAD_LOCALS BUILD_MAP DUP_TOP IMPORT_FROM', 1),
+    ('POP_TOP PRINT_ITEM PRINT_EXPR STORE_NAME STORE_GLOBAL STORE_FAST STORE_DEREF DELETE_ATTR IMPORT_NAME '
+     'BINARY_POWER BINARY_MULTIPLY BINARY_DIVIDE BINARY_FLOOR_DIVIDE BINARY_TRUE_DIVIDE BINARY_MODULO '
+     'BINARY_ADD BINARY_SUBTRACT BINARY_SUBSCR BINARY_LSHIFT BINARY_RSHIFT BINARY_AND BINARY_XOR BINARY_OR '
+     'COMPARE_OP', -1),
+    ('STORE_ATTR DELETE_SUBSCR STORE_MAP', -2),
+    ('STORE_SUBSCR', -3),
+]:
+    for _name in _names.split():
+        if _name in bp.opmap:
+            _stack_effects[bp.opmap[_name]] = _effect
+del _names, _effect, _name
+
+def _stack_effect(op, arg):
+    try:
+        return _stack_effects[op]
+    except KeyError:
+        pass
+    if op == bp.CALL_FUNCTION:
+        return -((arg & 0xFF) + 2 * ((arg >> 8) & 0xFF))
+    elif op in (bp.BUILD_TUPLE, bp.BUILD_LIST):
+        return 1 - arg
+    elif op == bp.MAKE_FUNCTION:
+        return -arg
+    elif op == bp.MAKE_CLOSURE:
+        return -1 - arg
+    elif op == bp.UNPACK_SEQUENCE:
+        return arg - 1
+    raise NotImplementedError('The %r opcode is not supported by the assembler' % op)
+
+_terminators = frozenset([bp.RETURN_VALUE, bp.RAISE_VARARGS, bp.JUMP_ABSOLUTE, bp.JUMP_FORWARD, bp.BREAK_LOOP])
+# Conditional jumps: stack effects on the jumping and the falling-through
+# path.
+_conditional_jumps = {
+    _op('POP_JUMP_IF_FALSE'): (-1, -1),
+    _op('POP_JUMP_IF_TRUE'): (-1, -1),
+    _op('JUMP_IF_FALSE_OR_POP'): (0, -1),
+    _op('JUMP_IF_TRUE_OR_POP'): (0, -1),
+    _op('JUMP_IF_FALSE'): (0, 0),
+    _op('JUMP_IF_TRUE'): (0, 0),
+    bp.FOR_ITER: (-1, 1),
+}
+_conditional_jumps.pop(None, None)
+
+def _flow(listing, i, state):
+    '''Return the list of (position, state) pairs that the instruction at
+    position i can continue to. The 'position' is either None (the next
+    instruction), or a label.'''
+    depth, blocks = state
+    op, arg = listing[i]
+    if not bp.isopcode(op):
+        return [(None, state)]
+    if op in _conditional_jumps:
+        jump_effect, next_effect = _conditional_jumps[op]
+        return [(arg, (depth + jump_effect, blocks)), (None, (depth + next_effect, blocks))]
+    if op in (bp.JUMP_ABSOLUTE, bp.JUMP_FORWARD):
+        return [(arg, state)]
+    if op == bp.SETUP_LOOP:
+        return [(arg, state), (None, (depth, blocks + (depth,)))]
+    if op == bp.POP_BLOCK:
+        return [(None, (blocks[-1], blocks[:-1]))]
+    if op in _terminators:
+        return []
+    return [(None, (depth + _stack_effect(op, arg), blocks))]
+
+def _explore(listing, seeds, label_state):
+    '''Explore every path through the listing that starts at one of the seeds,
+    which are (label, state) pairs, and ends at a label with a known state.
+    Return the maximum stack depth on these paths.
+    This is needed for labels that are reachable only by backward jumps, such
+    as the beginning of body of a while loop.'''
+    label_pos = dict((op, i) for i, (op, arg) in enumerate(listing) if isinstance(op, bp.Label))
+    todo = [(label_pos[label], state) for label, state in seeds]
+    maxsize = 0
+    while todo:
+        i, state = todo.pop()
+        op = listing[i][0]
+        if isinstance(op, bp.Label):
+            if op in label_state:
+                continue
+            label_state[op] = state
+        maxsize = max(maxsize, state[0])
+        for target, new_state in _flow(listing, i, state):
+            if target is None:
+                todo += (i + 1, new_state),
+            else:
+                todo += (label_pos[target], new_state),
+    return maxsize
+
+_CONST, _NAME, _JUMP, _LOCAL, _COMPARE, _FREE = range(6)
+_operand_kinds = {}
+for _kind, _ops in [
+    (_FREE, bp.hasfree),
+    (_COMPARE, bp.hascompare),
+    (_LOCAL, bp.haslocal),
+    (_JUMP, bp.hasjump),
+    (_NAME, bp.hasname),
+    (_CONST, bp.hasconst),
+]:
+    for _op_ in _ops:
+        _operand_kinds[_op_] = _kind
+del _kind, _ops, _op_
+
+def _flags(code, opcodes):
+    flags = 0
+    if not (opcodes & _name_ops):
+        flags |= CO_OPTIMIZED
+    if code.newlocals:
+        flags |= CO_NEWLOCALS
+    if code.varargs:
+        flags |= CO_VARARGS
+    if code.varkwargs:
+        flags |= CO_VARKEYWORDS
+    if _op('YIELD_VALUE') in opcodes:
+        flags |= CO_GENERATOR
+    if not (opcodes & bp.hasfree):
+        flags |= CO_NOFREE
+    return flags
+
+_name_ops = frozenset([bp.STORE_NAME, bp.LOAD_NAME, bp.DELETE_NAME])
+_hascode = frozenset([bp.MAKE_FUNCTION, bp.MAKE_CLOSURE])
+
+def assemble(code):
+    '''Assemble a Python code object from the code (a bp.Code).'''
+    listing = code.code
+    consts = [code.docstring]
+    const_index = {id(code.docstring): 0}
+    names = []
+    name_index = {}
+    varnames = list(code.args)
+    varname_index = dict((name, i) for i, name in reversed(list(enumerate(varnames))))
+    freevars = tuple(code.freevars)
+    cellvars = set(
+        arg for op, arg in listing
+        if op in bp.hasfree and arg not in freevars and bp.isopcode(op)
+    )
+    cellvars_list = [arg for arg in code.args if arg in cellvars]
+    opcodes = set()
+    bytecode = array('B')
+    lnotab = array('B')
+    lineno = code.firstlineno
+    line_pos = 0
+    label_pos = {}
+    # Jumps to labels that are not yet known, to be backpatched:
+    fixups = {}
+    # Stack states (depth, depths at which the enclosing blocks start) that
+    # labels are reached with:
+    label_state = {}
+    unreached_labels = set()
+    # Labels that are reached by backward jumps only:
+    late_labels = []
+    state = (0, ())
+    maxsize = 0
+    n = len(listing)
+    for i in xrange(n):
+        op, arg = listing[i]
+        if isinstance(op, bp.Label):
+            pos = len(bytecode)
+            label_pos[op] = pos
+            for fixup in fixups.pop(op, ()):
+                target = pos
+                if bytecode[fixup] in bp.hasjrel:
+                    target -= fixup + 3
+                if target > 0xFFFF:
+                    raise NotImplementedError('Extended jumps are not implemented')
+                bytecode[fixup + 1] = target & 0xFF
+                bytecode[fixup + 2] = target >> 8
+            state = label_state.get(op, state)
+            if state is None:
+                unreached_labels.add(op)
+            else:
+                label_state[op] = state
+        elif op is bp.SetLineno:
+            incr_lineno = arg - lineno
+            incr_pos = len(bytecode) - line_pos
+            lineno = arg
+            line_pos = len(bytecode)
+            if incr_lineno == 0 and incr_pos == 0:
+                lnotab.append(0)
+                lnotab.append(0)
+            else:
+                while incr_pos > 255:
+                    lnotab.append(255)
+                    lnotab.append(0)
+                    incr_pos -= 255
+                while incr_lineno > 255:
+                    lnotab.append(incr_pos)
+                    lnotab.append(255)
+                    incr_pos = 0
+                    incr_lineno -= 255
+                if incr_pos or incr_lineno:
+                    lnotab.append(incr_pos)
+                    lnotab.append(incr_lineno)
+        else:
+            opcodes.add(op)
+            if op < HAVE_ARGUMENT:
+                bytecode.append(op)
+            else:
+                kind = _operand_kinds.get(op)
+                if kind == _CONST:
+                    if isinstance(arg, bp.Code) and i + 1 < n and listing[i + 1][0] in _hascode:
+                        arg = assemble(arg)
+                    key = id(arg)
+                    try:
+                        oparg = const_index[key]
+                    except KeyError:
+                        oparg = const_index[key] = len(consts)
+                        consts += arg,
+                elif kind == _NAME:
+                    try:
+                        oparg = name_index[arg]
+                    except KeyError:
+                        oparg = name_index[arg] = len(names)
+                        names += arg,
+                elif kind == _JUMP:
+                    if arg in label_pos:
+                        oparg = label_pos[arg]
+                        if op in bp.hasjrel:
+                            oparg -= len(bytecode) + 3
+                    else:
+                        oparg = 0
+                        fixups.setdefault(arg, []).append(len(bytecode))
+                elif kind == _LOCAL:
+                    try:
+                        oparg = varname_index[arg]
+                    except KeyError:
+                        oparg = varname_index[arg] = len(varnames)
+                        varnames += arg,
+                elif kind == _COMPARE:
+                    oparg = bp.cmp_op.index(arg)
+                elif kind == _FREE:
+                    if arg in freevars:
+                        oparg = freevars.index(arg) + len(cellvars)
+                    else:
+                        if arg not in cellvars_list:
+                            cellvars_list += arg,
+                        oparg = cellvars_list.index(arg)
+                else:
+                    oparg = arg
+                if oparg > 0xFFFF:
+                    bytecode.append(EXTENDED_ARG)
+                    bytecode.append((oparg >> 16) & 0xFF)
+                    bytecode.append((oparg >> 24) & 0xFF)
+                bytecode.append(op)
+                bytecode.append(oparg & 0xFF)
+                bytecode.append((oparg >> 8) & 0xFF)
+        if state is None:
+            continue
+        depth = state[0]
+        if depth > maxsize:
+            maxsize = depth
+        if op in _stack_effects:
+            # The common case, fast:
+            state = (depth + _stack_effects[op], state[1])
+            continue
+        next_state = None
+        for target, new_state in _flow(listing, i, state):
+            if target is None:
+                next_state = new_state
+            elif target in unreached_labels:
+                late_labels += (target, new_state),
+            elif target not in label_state:
+                label_state[target] = new_state
+        state = next_state
+    if fixups:
+        raise KeyError('Undefined labels: %r' % fixups.keys())
+    if late_labels:
+        maxsize = max(maxsize, _explore(listing, late_labels, label_state))
+    return types.CodeType(
+        len(code.args) - code.varargs - code.varkwargs,
+        len(varnames),
+        maxsize,
+        _flags(code, opcodes),
+        bytecode.tostring(),
+        tuple(consts),
+        tuple(names),
+        tuple(varnames),
+        code.filename,
+        code.name,
+        code.firstlineno,
+        lnotab.tostring(),
+        freevars,
+        tuple(cellvars_list)
+    )
+
+# vim:ts=4 sts=4 sw=4 et
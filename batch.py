@@ -0,0 +1,118 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Batch execution of compiled programs.
+
+A compiled program is run once for every input file, with its standard output
+and error written to files. Runs are forked children of this process, so a
+program compiled to Python bytecode is loaded only once, before the first
+fork, and no run pays for starting the interpreter and loading the program.
+Other programs (x86 executables) are executed in the children.'''
+
+import imp
+import marshal
+import os
+import sys
+import traceback
+
+import runner
+
+__all__ = ['load', 'run']
+
+def load(filename):
+    '''Load the program from the file. Return its code object, or None if the
+    file is not Python bytecode of this interpreter.'''
+    with open(filename, 'rb') as file:
+        if file.read(4) != imp.get_magic():
+            return None
+        file.read(4)
+        return marshal.load(file)
+
+def _redirect(fd, filename, flags):
+    new_fd = os.open(filename, flags, 0666)
+    os.dup2(new_fd, fd)
+    os.close(new_fd)
+
+def _child(program, code, result):
+    '''Run the program in a forked child, with the input and output files of
+    the result. Never return.'''
+    status = 127
+    try:
+        try:
+            _redirect(0, result['input'], os.O_RDONLY)
+            for fd, key in (1, 'stdout'), (2, 'stderr'):
+                _redirect(fd, result[key], os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            if code is None:
+                os.execv(program, [program])
+            status = runner.execute(code)
+            sys.stdout.flush()
+        except:
+            traceback.print_exc()
+            status = 127
+    finally:
+        os._exit(status)
+
+def _status(status):
+    '''Return the exit status of a child, as returned by os.waitpid(), in the
+    form used by subprocess: negative for a signal.'''
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def run(program, inputs, directory, jobs=1):
+    '''Run the program once for every input file, in up to 'jobs' children at
+    a time. The standard output and error of the n-th run are written to
+    n.stdout and n.stderr in the directory.
+    Return a list of results, one for each input: dictionaries with the names
+    of the input and output files, and the exit status.'''
+    program = os.path.abspath(program)
+    code = load(program)
+    if code is not None:
+        # The program may import the shared runtime, which is installed next
+        # to it:
+        sys.path.insert(0, os.path.dirname(program))
+    results = [
+        {
+            'input': input,
+            'stdout': os.path.join(directory, '%d.stdout' % n),
+            'stderr': os.path.join(directory, '%d.stderr' % n),
+            'status': None,
+        }
+        for n, input in enumerate(inputs)
+    ]
+    pending = results[::-1]
+    running = {}
+    # Buffered output would be written by every child:
+    sys.stdout.flush()
+    sys.stderr.flush()
+    while pending or running:
+        while pending and len(running) < jobs:
+            result = pending.pop()
+            pid = os.fork()
+            if pid == 0:
+                _child(program, code, result)
+            running[pid] = result
+        pid, status = os.waitpid(-1, 0)
+        running.pop(pid)['status'] = _status(status)
+    return results
+
+# vim:ts=4 sts=4 sw=4 et
@@ -20,10 +20,87 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+'''Python bytecode listings.
+
+A listing is a list of (opcode, argument) pairs, where the opcode can be also
+a Label or SetLineno. This module is compatible with the subset of byteplay
+that the compiler uses; listings are assembled by the assembler module.'''
+
+import opcode as _opcode
 import sys
 
-from byteplay import *
-from byteplay import __all__
+__all__ = [
+    'Code', 'Label', 'Opcode', 'SetLineno',
+    'cmp_op', 'hasarg', 'hasconst', 'hascompare', 'hasfree', 'hasjabs', 'hasjrel', 'hasjump', 'haslocal', 'hasname',
+    'isopcode', 'opmap', 'opname'
+]
+
+class Opcode(int):
+
+    '''An opcode, which is an int with a nicer repr.'''
+
+    def __repr__(self):
+        return opname[self]
+
+    __str__ = __repr__
+
+opmap = dict(
+    (name.replace('+', '_'), Opcode(code))
+    for name, code in _opcode.opmap.iteritems()
+    if name != 'EXTENDED_ARG'
+)
+opname = dict((code, name) for name, code in opmap.iteritems())
+globals().update(opmap)
+__all__ += sorted(opmap)
+
+cmp_op = _opcode.cmp_op
+hasarg = frozenset(code for code in opname if code >= _opcode.HAVE_ARGUMENT)
+hasconst = frozenset(Opcode(code) for code in _opcode.hasconst)
+hasname = frozenset(Opcode(code) for code in _opcode.hasname)
+hasjrel = frozenset(Opcode(code) for code in _opcode.hasjrel)
+hasjabs = frozenset(Opcode(code) for code in _opcode.hasjabs)
+hasjump = hasjrel | hasjabs
+haslocal = frozenset(Opcode(code) for code in _opcode.haslocal)
+hascompare = frozenset(Opcode(code) for code in _opcode.hascompare)
+hasfree = frozenset(Opcode(code) for code in _opcode.hasfree)
+
+class _SetLineno(object):
+
+    def __repr__(self):
+        return 'SetLineno'
+
+# Pseudo-opcode: set the line number of the following instructions.
+SetLineno = _SetLineno()
+
+class Label(object):
+    '''Pseudo-opcode: a jump target.'''
+    pass
+
+def isopcode(obj):
+    '''Return whether the object is an opcode (rather than SetLineno or
+    a Label).'''
+    return obj is not SetLineno and not isinstance(obj, Label)
+
+class Code(object):
+
+    '''A code object, with the bytecode as a listing.'''
+
+    def __init__(self, code, freevars, args, varargs, varkwargs, newlocals, name, filename, firstlineno, docstring):
+        self.code = code
+        self.freevars = freevars
+        self.args = args
+        self.varargs = varargs
+        self.varkwargs = varkwargs
+        self.newlocals = newlocals
+        self.name = name
+        self.filename = filename
+        self.firstlineno = firstlineno
+        self.docstring = docstring
+
+    def to_code(self):
+        '''Assemble a Python code object.'''
+        import assembler
+        return assembler.assemble(self)
 
 if sys.version_info >= (2, 7):
 
@@ -33,6 +110,12 @@ if sys.version_info >= (2, 7):
     def jump_if_true(label):
         return [(JUMP_IF_TRUE_OR_POP, label)]
 
+    def pop_jump_if_false(label):
+        return [(POP_JUMP_IF_FALSE, label)]
+
+    def pop_jump_if_true(label):
+        return [(POP_JUMP_IF_TRUE, label)]
+
 else:
 
     def jump_if_false(label):
@@ -47,6 +130,26 @@ else:
             (POP_TOP, None)
         ]
 
-__all__ = list(__all__) + ['jump_if_true', 'jump_if_false']
+    def pop_jump_if_false(label):
+        label_keep = Label()
+        return [
+            (JUMP_IF_TRUE, label_keep),
+            (POP_TOP, None),
+            (JUMP_ABSOLUTE, label),
+            (label_keep, None),
+            (POP_TOP, None)
+        ]
+
+    def pop_jump_if_true(label):
+        label_keep = Label()
+        return [
+            (JUMP_IF_FALSE, label_keep),
+            (POP_TOP, None),
+            (JUMP_ABSOLUTE, label),
+            (label_keep, None),
+            (POP_TOP, None)
+        ]
+
+__all__ += ['jump_if_true', 'jump_if_false', 'pop_jump_if_true', 'pop_jump_if_false']
 
 # vim:ts=4 sts=4 sw=4 et
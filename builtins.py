@@ -28,13 +28,15 @@ import syntax
 import type
 
 import bp
+import closures
+import py3
 import x86
 
 _py_globals = {
     'bool': '*bool',
     'int': '*int',
     'float': '*float',
-    'raw_input': '*input',
+    'xrange': '*xrange',
     'RuntimeError': '*error'
 }
 py_stub_pre = sum(
@@ -43,6 +45,107 @@ py_stub_pre = sum(
 )
 del _name, _alias
 
+# Global names under which the Python stub stores the I/O functions returned
+# by _py_io():
+_py_io_names = ['*write', '*readline', '*flush']
+
+# Global names under which the Python stub stores the runtime helpers:
+py_helper_names = sorted(_py_globals.values() + _py_io_names)
+
+def _py_io(buffered):
+    '''Return the functions that the generated code uses for I/O: write(),
+    which writes a string to stdout; readline(), which reads a line from
+    stdin, raising EOFError at end of file; and flush(), which flushes stdout.
+
+    In the buffered mode, output is written in large chunks. Input is read
+    straight from the stdin descriptor in large blocks, which are split into
+    lines (one number each) a block at a time. This would make interactive
+    programs unusable, so the mode is disabled if stdin or stdout is a
+    terminal. It is also disabled if either of them is not a real file.
+
+    This function is embedded in the generated code. It runs before Javalette
+    functions are created, so it can use built-ins, but the functions it
+    returns must not use any globals.'''
+    import sys
+    stdin = sys.stdin
+    stdout = sys.stdout
+    if buffered and isinstance(stdin, file) and isinstance(stdout, file) and not stdin.isatty() and not stdout.isatty():
+        import itertools
+        import os
+        output = os.fdopen(os.dup(stdout.fileno()), 'w', 1 << 16)
+        def blocks(read=os.read, fd=stdin.fileno(), error=EOFError):
+            # Lists of lines, without their newlines (as raw_input() returns
+            # them), one list per block read:
+            rest = ''
+            while True:
+                block = read(fd, 1 << 16)
+                if not block:
+                    break
+                lines = (rest + block).split('\n')
+                rest = lines.pop()
+                yield lines
+            if rest:
+                yield [rest]
+            raise error('EOF when reading a line')
+        return output.write, itertools.chain.from_iterable(blocks()).next, output.flush
+    return stdout.write, raw_input, stdout.flush
+
+def py_io_stub(buffered):
+    '''[py] Generate code that stores the I/O functions under their global
+    names.'''
+    result = [
+        (bp.LOAD_CONST, _py_io.func_code),
+        (bp.MAKE_FUNCTION, 0),
+        (bp.LOAD_CONST, buffered),
+        (bp.CALL_FUNCTION, 1),
+        (bp.UNPACK_SEQUENCE, len(_py_io_names)),
+    ]
+    result += [(bp.STORE_GLOBAL, name) for name in _py_io_names]
+    return result
+
+def py_bound_name(name):
+    '''[py] Return the placeholder constant for a bound name.'''
+    # No Javalette constant is a tuple, so this can't clash with a real one:
+    return ('*bind', name)
+
+def _py_bind(functions):
+    '''Replace the placeholder constants in the code of the functions with the
+    objects that the names refer to.
+    This function is embedded in the generated code, so it must not use any
+    globals: Javalette functions could shadow them.'''
+    for function in functions:
+        code = function.func_code
+        namespace = function.func_globals
+        consts = [
+            const.__class__ is ().__class__ and const[:1] == ('*bind',) and namespace[const[1]] or const
+            for const in code.co_consts
+        ]
+        function.func_code = code.__class__(
+            code.co_argcount, code.co_nlocals, code.co_stacksize, code.co_flags,
+            code.co_code, ().__class__(consts), code.co_names, code.co_varnames,
+            code.co_filename, code.co_name, code.co_firstlineno, code.co_lnotab,
+            code.co_freevars, code.co_cellvars
+        )
+
+py_bind_code = _py_bind.func_code
+
+def _py_lazy(bind):
+    '''Return a function that loads the body of a lazily loaded function from
+    the marshalled data: it replaces the code of the function (a stub) with the
+    unmarshalled one, binds names in it with the 'bind' function, unless it is
+    None, and returns the function.
+    This function is embedded in the generated code, so it must not use any
+    globals: Javalette functions could shadow them.'''
+    from marshal import loads
+    def load(function, data):
+        function.func_code = loads(data)
+        if bind is not None:
+            bind([function])
+        return function
+    return load
+
+py_lazy_code = _py_lazy.func_code
+
 _stub_label = bp.Label()
 py_stub_post = filter(None,
 [
@@ -58,6 +161,9 @@ py_stub_post = filter(None,
     (bp.IMPORT_FROM, 'exit'),
     (bp.LOAD_GLOBAL, 'main'),
     (bp.CALL_FUNCTION, 0),
+    (bp.LOAD_GLOBAL, '*flush'),
+    (bp.CALL_FUNCTION, 0),
+    (bp.POP_TOP, None),
     (bp.CALL_FUNCTION, 1),
     (bp.POP_TOP, None),
     (_stub_label, None),
@@ -65,6 +171,201 @@ py_stub_post = filter(None,
 ])
 del _stub_label
 
+# Name of the shared runtime module that programs compiled with
+# --shared-runtime import:
+py_runtime_module = 'jtc_runtime'
+
+_py_runtime_version = None
+
+def py_runtime_version():
+    '''Return the version of the shared runtime module: a checksum of its
+    code, generated with the version itself set to 0.'''
+    global _py_runtime_version
+    if _py_runtime_version is None:
+        import marshal
+        import zlib
+        data = marshal.dumps(_py_runtime_code(0).to_code())
+        _py_runtime_version = zlib.crc32(data) & 0xFFFFFFFF
+    return _py_runtime_version
+
+def _py_runtime_setup(version, buffered, names):
+    '''Check that the runtime is of the required version, set up I/O, and
+    return a dictionary mapping the names to the runtime objects.
+    This function is embedded in the shared runtime module. Each program calls
+    it when it is loaded, and adds the result to its globals.'''
+    namespace = globals()
+    if version != namespace['version']:
+        raise ImportError('%s version %d is required, but version %d is installed' % (
+            namespace['__name__'], version, namespace['version']
+        ))
+    namespace.update(zip(namespace['*io_names'], namespace['*io'](buffered)))
+    return dict((name, namespace[name]) for name in names)
+
+def py_runtime_code():
+    '''[py] Generate bytecode for the shared runtime module.'''
+    return _py_runtime_code(py_runtime_version())
+
+def _py_runtime_code(version):
+    listing = []
+    listing += py_stub_pre
+    for name, function in ('*io', _py_io), ('*bind', _py_bind), ('*lazy', _py_lazy), ('setup', _py_runtime_setup):
+        listing += [
+            (bp.LOAD_CONST, function.func_code),
+            (bp.MAKE_FUNCTION, 0),
+            (bp.STORE_GLOBAL, name)
+        ]
+    for function in pdf_function.construct_all():
+        listing += function.to_py(this_module_file_name)
+    listing += [
+        (bp.LOAD_CONST, tuple(_py_io_names)),
+        (bp.STORE_GLOBAL, '*io_names'),
+        (bp.LOAD_CONST, version),
+        (bp.STORE_GLOBAL, 'version'),
+        (bp.LOAD_CONST, None),
+        (bp.RETURN_VALUE, None)
+    ]
+    code = bp.Code(
+        code=listing,
+        freevars=[],
+        args=[],
+        varargs=False,
+        varkwargs=False,
+        newlocals=False,
+        name='<module>',
+        filename=this_module_file_name,
+        firstlineno=0,
+        docstring=None)
+    import peephole
+    peephole.optimize(code)
+    return code
+
+def install_py_runtime(directory):
+    '''[py] Write the shared runtime module into the directory, unless it
+    already contains the current version.'''
+    import imp
+    import marshal
+    import os
+    import struct
+    import tempfile
+    path = os.path.join(directory, py_runtime_module + '.pyc')
+    # The version takes place of the modification time, which Python ignores
+    # for modules without source:
+    header = imp.get_magic() + struct.pack('<I', py_runtime_version())
+    try:
+        runtime_file = open(path, 'rb')
+        try:
+            if runtime_file.read(len(header)) == header:
+                return
+        finally:
+            runtime_file.close()
+    except IOError:
+        pass
+    data = header + marshal.dumps(py_runtime_code().to_code())
+    # Other compilers could be installing the module at the same time, so
+    # replace it atomically:
+    fd, temporary_path = tempfile.mkstemp(prefix=py_runtime_module + '.', dir=directory)
+    try:
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        os.chmod(temporary_path, 0644)
+        os.rename(temporary_path, path)
+    except:
+        os.unlink(temporary_path)
+        raise
+
+def py_runtime_stub(buffered, names):
+    '''[py] Generate code that imports the shared runtime module and stores the
+    runtime objects under the names as globals.'''
+    return filter(None, [
+        (bp.LOAD_GLOBAL, 'globals'),
+        (bp.CALL_FUNCTION, 0),
+        (bp.LOAD_ATTR, 'update'),
+        sys.version_info >= (2, 5) and (bp.LOAD_CONST, -1),
+        (bp.LOAD_CONST, None),
+        (bp.IMPORT_NAME, py_runtime_module),
+        (bp.LOAD_ATTR, 'setup'),
+        (bp.LOAD_CONST, py_runtime_version()),
+        (bp.LOAD_CONST, buffered),
+        (bp.LOAD_CONST, tuple(names)),
+        (bp.CALL_FUNCTION, 3),
+        (bp.CALL_FUNCTION, 1),
+        (bp.POP_TOP, None)
+    ])
+
+# Run-time support code of Python 3 modules. It stores the helpers under names
+# that can't clash with Javalette identifiers:
+py3_runtime = '''\
+def _install(namespace):
+    import sys
+    def error():
+        raise RuntimeError()
+    def str_double(value):
+        # The same format as str() in Python 2:
+        text = '%.12g' % value
+        if text.lstrip('-').isdigit():
+            text += '.0'
+        return text
+    namespace.update({
+        '*bool': bool,
+        '*int': int,
+        '*float': float,
+        '*input': input,
+        '*print': print,
+        '*range': range,
+        '*error': error,
+        '*str_double': str_double,
+        '*exit': sys.exit,
+    })
+_install(globals())
+del _install
+'''
+
+# Run-time support code of Python source modules, which must work with both
+# Python 2 and Python 3. The helpers are named as in Python 3 modules, except
+# for a '_' in place of the '*' prefix:
+py_source_runtime = '''\
+# encoding=UTF-8
+
+from __future__ import division, print_function
+
+import sys as _sys
+
+try:
+    _input = raw_input
+    _range = xrange
+except NameError:
+    _input = input
+    _range = range
+
+_bool = bool
+_int = int
+_float = float
+_print = print
+_exit = _sys.exit
+
+
+def _error():
+    raise RuntimeError()
+
+
+def _str_double(value):
+    # The same format as str() in Python 2:
+    text = '%.12g' % value
+    if text.lstrip('-').isdigit():
+        text += '.0'
+    return text
+'''
+
+py3_stub_post = [
+    py3.node('Assign', targets=[py3.name('__all__', store=True)], value=py3.node('List', elts=[], ctx=py3.node('Load'))),
+    py3.node('If',
+        test=py3.node('Compare', left=py3.name('__name__'), ops=[py3.node('Eq')], comparators=[py3.constant('__main__')]),
+        body=[py3.node('Expr', value=py3.call('*exit', [py3.call('main', [])]))]
+    )
+]
+
 _label_io_error = x86.Label()
 x86_0div_error = x86.Label()
 _s_io_error = x86.Const('IOError\n\0')
@@ -72,7 +373,7 @@ _s_0div_error = x86.Const('ZeroDivisionError\n\0')
 _x_stderr = x86.Extern('stderr')
 _x_fputs = x86.Extern('fputs')
 _x_exit = x86.Extern('exit')
-x86_stub = [
+x86_stub = x86.parse([
     _s_io_error, _s_0div_error,
     _x_stderr, _x_fputs, _x_exit,
     x86.Label('main', public=True),
@@ -89,7 +390,7 @@ x86_stub = [
     'call %s' % _x_fputs,
     'push 1',
     'call %s' % _x_exit
-]
+])
 del _s_io_error, _s_0div_error
 
 from os.path import basename as _basename
@@ -141,7 +442,7 @@ class pdf_function(syntax.function):
 
     body_to_pyc.__doc__ = syntax.function.body_to_pyc.im_func.__doc__
 
-    def to_x86_asm(self):
+    def to_x86_asm(self, allocate_registers=False, sse2=False):
         result = []
         result += x86.Label(self.x86_name),
         result += self.x86_asm
@@ -149,15 +450,23 @@ class pdf_function(syntax.function):
 
     to_x86_asm.__doc__ = syntax.function.to_x86_asm.im_func.__doc__
 
+    def to_py3(self):
+        # Calls of built-in functions are always expanded inline.
+        return []
+
 _py_pdf_print = [
+    (bp.LOAD_GLOBAL, '*write'),
+    (bp.LOAD_CONST, '%s\n'),
     (bp.LOAD_FAST, '_0'),
-    (bp.PRINT_ITEM, None),
-    (bp.PRINT_NEWLINE, None),
-    (bp.LOAD_CONST, None),
+    (bp.BINARY_MODULO, None),
+    (bp.CALL_FUNCTION, 1),
     (bp.RETURN_VALUE, None)
 ]
 
 _py_pdf_error = [
+    (bp.LOAD_GLOBAL, '*flush'),
+    (bp.CALL_FUNCTION, 0),
+    (bp.POP_TOP, None),
     (bp.LOAD_GLOBAL, '*error'),
     (bp.CALL_FUNCTION, 0),
     (bp.RAISE_VARARGS, 1),
@@ -167,7 +476,7 @@ _py_pdf_error = [
 
 _py_pdf_read_int = [
     (bp.LOAD_GLOBAL, '*int'),
-    (bp.LOAD_GLOBAL, '*input'),
+    (bp.LOAD_GLOBAL, '*readline'),
     (bp.CALL_FUNCTION, 0),
     (bp.CALL_FUNCTION, 1),
     (bp.RETURN_VALUE, None)
@@ -175,7 +484,7 @@ _py_pdf_read_int = [
 
 _py_pdf_read_double = [
     (bp.LOAD_GLOBAL, '*float'),
-    (bp.LOAD_GLOBAL, '*input'),
+    (bp.LOAD_GLOBAL, '*readline'),
     (bp.CALL_FUNCTION, 0),
     (bp.CALL_FUNCTION, 1),
     (bp.RETURN_VALUE, None)
@@ -183,7 +492,7 @@ _py_pdf_read_double = [
 
 _const = x86.Const('%d\n\0')
 _x_printf = x86.Extern('printf')
-_x86_pdf_print_int = [
+_x86_pdf_print_int = x86.parse([
     _const, _x_printf,
     'push DWORD [esp + 4]',
     'push %s' % _const,
@@ -192,7 +501,7 @@ _x86_pdf_print_int = [
     'js %s' % _label_io_error,
     'add esp, 8',
     'ret'
-]
+])
 del _const
 
 _const = x86.Const('%.12g\0')
@@ -200,7 +509,7 @@ _x_snprintf = x86.Extern('snprintf')
 _x_puts = x86.Extern('puts')
 _label_loop = x86.Label()
 _label_exit_loop = x86.Label()
-_x86_pdf_print_double = [
+_x86_pdf_print_double = x86.parse([
     _const, _x_snprintf, _x_puts,
     'sub esp, 36',
     'mov edx, esp',
@@ -234,11 +543,11 @@ _x86_pdf_print_double = [
     'test eax, eax',
     'js %s' % _label_io_error,
     'ret'
-]
+])
 del _const
 del _label_loop, _label_exit_loop
 
-_x86_pdf_print_string = [
+_x86_pdf_print_string = x86.parse([
     _x_puts,
     'push DWORD [esp + 4]',
     'call %s' % _x_puts,
@@ -246,22 +555,22 @@ _x86_pdf_print_string = [
     'js %s' % _label_io_error,
     'add esp, 4',
     'ret'
-]
+])
 
 _const = x86.Const('RuntimeError\n\0')
-_x86_pdf_error = [
+_x86_pdf_error = x86.parse([
     _const, _x_fputs, _x_exit,
     'push DWORD [stderr]',
     'push %s' % _const,
     'call %s' % _x_fputs,
     'push 1',
     'call %s' % _x_exit
-]
+])
 del _const
 
 _const = x86.Const('%d\0')
 _x_scanf = x86.Extern('scanf')
-_x86_pdf_read_int = [
+_x86_pdf_read_int = x86.parse([
     _const, _x_scanf,
     'sub esp, 4',
     'mov eax, esp',
@@ -269,15 +578,15 @@ _x86_pdf_read_int = [
     'push %s' % _const,
     'call %s' % _x_scanf,
     'dec eax',
-    'jnz %s ' % _label_io_error,
+    'jnz %s' % _label_io_error,
     'add esp, 12',
     'mov eax, [esp - 4]',
     'ret'
-]
+])
 del _const
 
 _const = x86.Const('%lf\0')
-_x86_pdf_read_double = [
+_x86_pdf_read_double = x86.parse([
     _const, _x_scanf,
     'sub esp, 8',
     'mov eax, esp',
@@ -289,10 +598,90 @@ _x86_pdf_read_double = [
     'add esp, 16',
     'fld QWORD [esp - 8]',
     'ret'
-]
+])
 del _const
 
-class pdf_print_int(pdf_function):
+def _x86_puts(const):
+    return [
+        const, _x_puts,
+        x86.Instruction('push', const),
+        x86.Instruction('call', _x_puts),
+        x86.Instruction('test', 'eax', 'eax'),
+        x86.Instruction('js', _label_io_error),
+        x86.AddESP(4)
+    ]
+
+class pdf_print_function(pdf_function):
+
+    '''A built-in procedure that prints its argument followed by a newline.
+    Calls of such procedures are expanded inline. If the argument is a
+    constant, the text to print is computed at compile time.'''
+
+    def format(self, value):
+        '''Return the text to print for the constant value.'''
+        return str(value)
+
+    def py_inline_call(self, call):
+        from expression import const
+        [argument] = call.arguments
+        result = [(bp.LOAD_GLOBAL, '*write')]
+        if isinstance(argument, const):
+            result += (bp.LOAD_CONST, self.format(argument.value) + '\n'),
+        else:
+            # '%s' formats numbers the same way as str():
+            result += (bp.LOAD_CONST, '%s\n'),
+            result += argument.to_py()
+            result += (bp.BINARY_MODULO, None),
+        # write() returns None, which is the value of the call:
+        result += [
+            (bp.SetLineno, call.y),
+            (bp.CALL_FUNCTION, 1)
+        ]
+        return result
+
+    py_inline_call.__doc__ = syntax.function.py_inline_call.im_func.__doc__
+
+    def py3_inline_call(self, call):
+        from expression import const
+        [argument] = call.arguments
+        if isinstance(argument, const):
+            value = py3.constant(self.format(argument.value))
+        else:
+            value = self.py3_format(argument.to_py3())
+        return py3.call('*print', [value], call.y)
+
+    py3_inline_call.__doc__ = syntax.function.py3_inline_call.im_func.__doc__
+
+    def closure_inline_call(self, call, env):
+        from expression import const
+        [argument] = call.arguments
+        if isinstance(argument, const):
+            return closures.write_text(self.format(argument.value) + '\n')
+        return closures.write_value(argument.to_closure(env))
+
+    closure_inline_call.__doc__ = syntax.function.closure_inline_call.im_func.__doc__
+
+    def py3_format(self, value):
+        '''[py3] Generate Python AST for the text to print for the value (a
+        Python AST).'''
+        return value
+
+    def x86_inline_call(self, call, env):
+        from expression import const
+        [argument] = call.arguments
+        if isinstance(argument, const):
+            return _x86_puts(x86.Const(self.format(argument.value), '\0'))
+        else:
+            return self.x86_inline_print(argument, env)
+
+    x86_inline_call.__doc__ = syntax.function.x86_inline_call.im_func.__doc__
+
+    def x86_inline_print(self, argument, env):
+        '''[x86] Generate code for printing the value of the (non-constant)
+        argument. Return None if the call can't be inlined.'''
+        return None
+
+class pdf_print_int(pdf_print_function):
 
     '''printInt(int) built-in function.'''
 
@@ -301,7 +690,23 @@ class pdf_print_int(pdf_function):
         self.x86_asm = _x86_pdf_print_int
         pdf_function.__init__(self, 'printInt', type.void_t, type.int_t)
 
-class pdf_print_double(pdf_function):
+    def x86_inline_print(self, argument, env):
+        const = x86.Const('%d\n\0')
+        result = argument.to_x86_asm(env)
+        result += [
+            const, _x_printf,
+            x86.Instruction('push', 'eax'),
+            x86.Instruction('push', const),
+            x86.Instruction('call', _x_printf),
+            x86.Instruction('test', 'eax', 'eax'),
+            x86.Instruction('js', _label_io_error),
+            x86.AddESP(8)
+        ]
+        return result
+
+    x86_inline_print.__doc__ = pdf_print_function.x86_inline_print.im_func.__doc__
+
+class pdf_print_double(pdf_print_function):
 
     '''printDouble(double) built-in function.'''
 
@@ -310,7 +715,19 @@ class pdf_print_double(pdf_function):
         self.x86_asm = _x86_pdf_print_double
         pdf_function.__init__(self, 'printDouble', type.void_t, type.double_t)
 
-class pdf_print_string(pdf_function):
+    def format(self, value):
+        # Python's str() and the x86 printDouble agree: 12 significant digits,
+        # and a '.0' suffix if the result would look like an integer.
+        return str(float(value))
+
+    format.__doc__ = pdf_print_function.format.im_func.__doc__
+
+    def py3_format(self, value):
+        return py3.call('*str_double', [value])
+
+    py3_format.__doc__ = pdf_print_function.py3_format.im_func.__doc__
+
+class pdf_print_string(pdf_print_function):
 
     '''printString("...") built-in function.'''
 
@@ -319,6 +736,25 @@ class pdf_print_string(pdf_function):
         self.x86_asm = _x86_pdf_print_string
         pdf_function.__init__(self, 'printString', type.void_t, type.string_t)
 
+    def format(self, value):
+        return value
+
+    format.__doc__ = pdf_print_function.format.im_func.__doc__
+
+    def x86_inline_print(self, argument, env):
+        result = argument.to_x86_asm(env)
+        result += [
+            _x_puts,
+            x86.Instruction('push', 'eax'),
+            x86.Instruction('call', _x_puts),
+            x86.Instruction('test', 'eax', 'eax'),
+            x86.Instruction('js', _label_io_error),
+            x86.AddESP(4)
+        ]
+        return result
+
+    x86_inline_print.__doc__ = pdf_print_function.x86_inline_print.im_func.__doc__
+
 class pdf_error(pdf_function):
 
     '''error() built-in procedure.'''
@@ -328,25 +764,93 @@ class pdf_error(pdf_function):
         self.x86_asm = _x86_pdf_error
         pdf_function.__init__(self, 'error', type.void_t)
 
-class pdf_read_int(pdf_function):
+    def py3_inline_call(self, call):
+        return py3.call('*error', [], call.y)
+
+    py3_inline_call.__doc__ = syntax.function.py3_inline_call.im_func.__doc__
+
+    def closure_inline_call(self, call, env):
+        return closures.error()
+
+    closure_inline_call.__doc__ = syntax.function.closure_inline_call.im_func.__doc__
+
+class pdf_read_function(pdf_function):
+
+    '''A built-in function that reads a number. Calls of such functions are
+    expanded inline.'''
+
+    py3_convert = None
+    closure_convert = None
+    x86_format = None
+    x86_load = None
+    # The instruction that loads the number when doubles are computed with
+    # SSE2, if it is not x86_load:
+    x86_sse2_load = None
+
+    def py_inline_call(self, call):
+        # The body is a single expression, followed by RETURN_VALUE:
+        assert self.py[-1] == (bp.RETURN_VALUE, None)
+        return [(bp.SetLineno, call.y)] + self.py[:-1]
+
+    py_inline_call.__doc__ = syntax.function.py_inline_call.im_func.__doc__
+
+    def py3_inline_call(self, call):
+        return py3.call(self.py3_convert, [py3.call('*input', [])], call.y)
+
+    py3_inline_call.__doc__ = syntax.function.py3_inline_call.im_func.__doc__
+
+    def closure_inline_call(self, call, env):
+        return closures.read_line(self.closure_convert)
+
+    closure_inline_call.__doc__ = syntax.function.closure_inline_call.im_func.__doc__
+
+    def x86_inline_call(self, call, env):
+        const = x86.Const(self.x86_format, '\0')
+        size = self.type.return_type.x86_size()
+        return [
+            const, _x_scanf,
+            x86.SubESP(size),
+            x86.Instruction('push', 'esp'),
+            x86.Instruction('push', const),
+            x86.Instruction('call', _x_scanf),
+            x86.Instruction('dec', 'eax'),
+            x86.Instruction('jnz', _label_io_error),
+            x86.AddESP(8),
+            (env.sse2 and self.x86_sse2_load) or self.x86_load,
+            x86.AddESP(size)
+        ]
+
+    x86_inline_call.__doc__ = syntax.function.x86_inline_call.im_func.__doc__
+
+class pdf_read_int(pdf_read_function):
 
     '''readInt() built-in function.'''
 
+    py3_convert = '*int'
+    closure_convert = int
+    x86_format = '%d'
+    x86_load = x86.Instruction('mov', 'eax', '[esp]')
+
     def __init__(self):
         self.py = _py_pdf_read_int
         self.x86_asm = _x86_pdf_read_int
         pdf_function.__init__(self, 'readInt', type.int_t)
 
-class pdf_read_double(pdf_function):
+class pdf_read_double(pdf_read_function):
 
     '''readDouble() built-in function.'''
 
+    py3_convert = '*float'
+    closure_convert = float
+    x86_format = '%lf'
+    x86_load = x86.Instruction('fld', 'QWORD [esp]')
+    x86_sse2_load = x86.Instruction('movsd', 'xmm0', 'QWORD [esp]')
+
     def __init__(self):
         self.py = _py_pdf_read_double
         self.x86_asm = _x86_pdf_read_double
         pdf_function.__init__(self, 'readDouble', type.double_t)
 
-del _label_io_error
-del _x_stderr, _x_fputs, _x_exit, _x_snprintf, _x_puts
+del _x_stderr, _x_fputs, _x_exit, _x_snprintf
 
 # vim:ts=4 sts=4 sw=4 et
@@ -21,12 +21,50 @@
 # SOFTWARE.
 
 '''Usage:
-\tjtc [-T|-P|-X] [-o <output_file>] <source_file>
+\tjtc [-T|-P|-P3|-S|-X] [-O[<level>]] [--enable-pass=<pass>] [--disable-pass=<pass>]
+\t    [--verify-each] [--shared-runtime] [--sse2] [-j <jobs>] [-o <output_file>]
+\t    <source_file>
+\tjtc run [-C] [-O[<level>]] [--enable-pass=<pass>] [--disable-pass=<pass>]
+\t    [--verify-each] [-j <jobs>] <source_file>
+\tjtc batch [-j <jobs>] [-d <output_directory>] [-o <manifest_file>] <program>
+\t    <input_file>...
 
 Options:
 \t-T\tpretty print
 \t-P\tcompile to python bytecode (default)
+\t-P3\tcompile to python 3 bytecode, for the interpreter named by $PYTHON3
+\t\t(python3 by default)
+\t-S\tcompile to python source code
 \t-X\tcompile to x86 machine code
+\t-C\twith run, compile to python closures, rather than bytecode
+\t-O0\tdo not optimize (default)
+\t-O1\toptimize without making the code larger
+\t-O, -O2\toptimize
+\t--enable-pass=<pass>, --disable-pass=<pass>
+\t\tadd the optimization pass to the pipeline, or remove it from it
+\t--verify-each
+\t\tcheck consistency of the program after every optimization pass
+\t--shared-runtime
+\t\twith -P, import the built-ins from the jtc_runtime module, which is
+\t\tinstalled next to the output file, rather than embed them in it
+\t--sse2
+\t\twith -X, compute doubles with SSE2 instructions, rather than with the
+\t\tx87 FPU; the same as --enable-pass=sse2
+\t-j <jobs>
+\t\tcheck and generate code for functions in that many processes;
+\t\twith batch, run the program in that many processes
+\t-d <output_directory>
+\t\twith batch, write outputs of the program to the directory (the current
+\t\tdirectory by default)
+
+jtc run compiles the program to python bytecode in memory, and runs it in the
+same process.
+
+jtc batch runs a program compiled with -P or -X once for every input file. The
+standard output and error of the n-th run are written to n.stdout and n.stderr
+in the output directory, and the list of runs with their exit statuses, as
+JSON, to the manifest file (the standard output by default). A program
+compiled with -P is loaded only once.
 '''
 
 from getopt import GetoptError, gnu_getopt as getopt
@@ -42,9 +80,101 @@ def failure(message=None):
     print >>sys.stderr, 'Compilation failed!'
     sys.exit(2)
 
+def batch_main(args):
+    try:
+        (opts, args) = getopt(args, 'j:d:o:')
+    except GetoptError:
+        usage()
+    if len(args) < 2:
+        usage()
+    import json
+    import batch
+    from os import curdir
+    jobs = 1
+    directory = curdir
+    manifest = sys.stdout
+    for (ok, ov) in opts:
+        if ok == '-j':
+            if not ov.isdigit() or int(ov) < 1:
+                usage()
+            jobs = int(ov)
+        elif ok == '-d':
+            directory = ov
+        elif ok == '-o':
+            manifest = file(ov, 'w')
+    results = batch.run(args[0], args[1:], directory, jobs)
+    json.dump(results, manifest, indent=2, sort_keys=True)
+    print >>manifest
+
+_short_opts = 'o:TPSXCj:'
+_long_opts = ['enable-pass=', 'disable-pass=', 'verify-each', 'shared-runtime', 'sse2']
+
+def _takes_value(arg):
+    '''Return whether the option argument is followed by a separate value.'''
+    if arg.startswith('--'):
+        if '=' in arg:
+            return False
+        return [opt for opt in _long_opts if opt.startswith(arg[2:])] == [arg[2:] + '=']
+    for i, ch in enumerate(arg[1:]):
+        if ch + ':' in _short_opts:
+            return i == len(arg) - 2
+    return False
+
+def _level_index(arg):
+    '''Return the position of -O in a group of short options, or -1.'''
+    if arg.startswith('--'):
+        return -1
+    for i, ch in enumerate(arg[1:]):
+        if ch == 'O':
+            return i + 1
+        if ch + ':' in _short_opts:
+            break
+    return -1
+
+def _getopt(args):
+    '''Parse options of the main command. -O takes an optional level (it is
+    the same as -O2 without one), and -P3 is a multi-letter short option,
+    neither of which getopt can parse; they are taken as whole arguments, and
+    the arguments in between are parsed by getopt.'''
+    opts = []
+    positional = []
+    chunk = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == '--':
+            chunk += args[i - 1:]
+            break
+        k = arg.startswith('-') and _level_index(arg) or -1
+        if arg == '-P3' or k > 0:
+            if k > 1:
+                # Options grouped before -O, as in -TO2:
+                chunk += arg[:k],
+            (chunk_opts, chunk_args) = getopt(chunk, _short_opts, _long_opts)
+            opts += chunk_opts
+            positional += chunk_args
+            chunk = []
+            if arg == '-P3':
+                opts += ('-P3', ''),
+            else:
+                opts += ('-O', arg[k + 1:] or '2'),
+            continue
+        chunk += arg,
+        if arg.startswith('-') and _takes_value(arg) and i < len(args):
+            chunk += args[i],
+            i += 1
+    (chunk_opts, chunk_args) = getopt(chunk, _short_opts, _long_opts)
+    return opts + chunk_opts, positional + chunk_args
+
 def main(args):
+    if args[:1] == ['batch']:
+        return batch_main(args[1:])
+    run = args[:1] == ['run']
+    if run:
+        args = args[1:]
     try:
-        (opts, args) = getopt(args, 'o:TPX')
+        (opts, args) = _getopt(args)
     except GetoptError:
         usage()
     if len(args) != 1:
@@ -54,17 +184,57 @@ def main(args):
     from parser import Parser
     from error import JtError
     import context
-    from os.path import abspath
+    from os.path import abspath, curdir, dirname
 
     filename = abspath(args[0])
     stdin = file(filename, 'r')
     target = 'P'
+    level = 0
+    enabled = []
+    disabled = []
+    verify_each = False
+    shared_runtime = False
+    runtime_directory = curdir
+    jobs = 1
     stdout = sys.stdout
     for (ok, ov) in opts:
-        if ok in ('-T', '-P', '-X'):
+        if ok in ('-T', '-P', '-S', '-X', '-C'):
             target = ok[1]
+        elif ok == '-P3':
+            target = 'P3'
+        elif ok == '-O':
+            if ov not in ('0', '1', '2'):
+                usage()
+            level = int(ov)
+        elif ok == '--enable-pass':
+            enabled += ov,
+        elif ok == '--disable-pass':
+            disabled += ov,
+        elif ok == '--sse2':
+            enabled += 'sse2',
+        elif ok == '--verify-each':
+            verify_each = True
+        elif ok == '--shared-runtime':
+            shared_runtime = True
+        elif ok == '-j':
+            if not ov.isdigit() or int(ov) < 1:
+                usage()
+            jobs = int(ov)
         elif ok == '-o':
             stdout = file(ov, 'w')
+            runtime_directory = dirname(abspath(ov))
+    if shared_runtime and target != 'P':
+        usage()
+    if run and (target not in ('P', 'C') or shared_runtime or stdout is not sys.stdout):
+        usage()
+    if target == 'C' and not run:
+        usage()
+    import passes
+    try:
+        pipeline = passes.pipeline(level, enabled, disabled)
+    except KeyError, error:
+        failure('Unknown optimization pass: %s' % error.args[0])
+    pass_manager = passes.pass_manager(pipeline, verify_each=verify_each)
     contents = stdin.read()
     tokenizer = Tokenizer()
     tokenizer.build()
@@ -75,22 +245,66 @@ def main(args):
         result_tree = parser.parse()
     except JtError, error:
         failure(error)
+    result_tree.filename = filename
+    result_tree.peephole = 'peephole' in pipeline
+    result_tree.bind_names = 'bind-names' in pipeline
+    result_tree.allocate_locals = 'allocate-locals' in pipeline
+    result_tree.buffer_io = 'buffer-io' in pipeline
+    result_tree.lazy_load = 'lazy-load' in pipeline
+    result_tree.allocate_registers = 'allocate-registers' in pipeline
+    result_tree.sse2 = 'sse2' in pipeline
+    result_tree.shared_runtime = shared_runtime
     context.add_pdf(result_tree)
     ok = context.inspect(result_tree)
-    ok &= context.validate(result_tree)
-    if target == 'T':
-        print >>stdout, result_tree
+    lowered = None
+    if ok and jobs > 1 and target not in ('T', 'C') and not pass_manager.pipeline:
+        # Nothing in this process needs the checked syntax tree, so every
+        # function is checked by the worker that generates code for it.
+        import parallel
+        (valid, lowered) = parallel.check_and_lower(result_tree, target, jobs)
+        ok &= valid
+    else:
+        ok &= context.validate(result_tree)
     if not ok:
+        if target == 'T':
+            print >>stdout, result_tree
         failure()
-    result_tree.filename = filename
 
-    if target != 'T':
-        if stdout.isatty():
+    try:
+        pass_manager.run(result_tree)
+    except JtError, error:
+        failure(error)
+
+    if target == 'T':
+        # The tree is printed as the optimization passes left it:
+        print >>stdout, result_tree
+    else:
+        if stdout.isatty() and target != 'S' and not run:
             failure('Prevented from printing binary garbage to the terminal.')
-        if target == 'P':
-            result_tree.compile_pyc(stdout)
+        if run and target == 'C':
+            import closures
+            sys.exit(closures.execute(result_tree.to_closure()))
+        if lowered is None and jobs > 1:
+            import parallel
+            lowered = parallel.lower(result_tree, target, jobs)
+        if run:
+            import runner
+            code = runner.compile_program(result_tree, lowered)
+            sys.exit(runner.execute(code))
+        elif target == 'P':
+            result_tree.compile_pyc(stdout, lowered)
+            if shared_runtime:
+                import builtins
+                builtins.install_py_runtime(runtime_directory)
+        elif target == 'P3':
+            try:
+                result_tree.compile_py3(stdout, lowered)
+            except JtError, error:
+                failure(error)
+        elif target == 'S':
+            result_tree.compile_py_source(stdout, lowered)
         elif target == 'X':
-            result_tree.compile_x86(stdout)
+            result_tree.compile_x86(stdout, lowered)
         else:
             raise NotImplementedError()
 
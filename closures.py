@@ -0,0 +1,382 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Closure-compiling execution engine.
+
+Every node of a checked program is compiled once into a Python closure, which
+is then run directly, with no bytecode or machine code in between.
+
+- An expression is compiled into a function that takes the frame of the
+  Javalette function and returns the value of the expression.
+- A statement is compiled into a function that takes the frame and returns
+  None, or a one-tuple with the return value if the Javalette function
+  returns in it.
+- A frame is a list. Every variable of the function has its own slot in it,
+  with the arguments first.
+
+The semantics (including errors raised at run time) are those of the Python
+bytecode back-end.'''
+
+from __future__ import division
+
+import sys
+import traceback
+
+__all__ = [
+    'Env',
+    'assign', 'binary', 'block', 'call', 'const', 'convert', 'counted_loop', 'discard', 'error', 'execute',
+    'define', 'if_return', 'if_then_else', 'io', 'read', 'read_checked', 'read_line', 'return_value', 'store',
+    'unary', 'while_loop', 'write_text', 'write_value'
+]
+
+class Env(object):
+
+    '''Allocation of frame slots to variables of a function.'''
+
+    def __init__(self):
+        self.slots = {}
+        self.size = 0
+        # Variables that may be read before they are assigned to:
+        self.unassigned = set()
+
+    def declare(self, variable, assigned=True):
+        '''Allocate a slot for the variable. Return its number.
+        'assigned' tells whether the variable is assigned to where it is
+        declared.'''
+        slot = self.slots[variable] = self.size
+        self.size += 1
+        if not assigned:
+            self.unassigned.add(variable)
+        return slot
+
+    def slot(self, variable):
+        '''Return number of the slot of the variable.'''
+        return self.slots[variable]
+
+# I/O functions of the running program: write(), readline() and flush(). They
+# are set by execute(), so that a compiled program can run with different
+# streams.
+io = [None, None, None]
+
+def const(value):
+    '''Return a closure that evaluates to the constant value.'''
+    def evaluate(frame):
+        return value
+    return evaluate
+
+def read(slot):
+    '''Return a closure that reads the variable in the slot.'''
+    def evaluate(frame):
+        return frame[slot]
+    return evaluate
+
+def read_checked(slot, name):
+    '''Return a closure that reads the variable in the slot, and raises
+    UnboundLocalError if it has not been assigned to.'''
+    def evaluate(frame):
+        value = frame[slot]
+        if value is None:
+            raise UnboundLocalError('local variable %r referenced before assignment' % name)
+        return value
+    return evaluate
+
+# Closures of operators are specialized for kinds of the operands. Besides
+# other closures, the operands can be slots of variables that are always
+# assigned, or constants:
+_operand_kinds = {
+    'closure': '%s(frame)',
+    'slot': 'frame[%s]',
+    'const': '%s',
+}
+
+_binary_template = '''
+def factory(left, right):
+    def evaluate(frame):
+        return %s %s %s
+    return evaluate
+'''
+
+_unary_template = '''
+def factory(operand):
+    def evaluate(frame):
+        return %s %s
+    return evaluate
+'''
+
+def _factory(template, *args):
+    namespace = {}
+    exec template % args in namespace
+    return namespace['factory']
+
+_binary_factories = {}
+for _op in '+ - * // / % < <= > >= == != and or'.split():
+    for _left in _operand_kinds:
+        for _right in _operand_kinds:
+            _binary_factories[_op, _left, _right] = _factory(_binary_template,
+                _operand_kinds[_left] % 'left', _op, _operand_kinds[_right] % 'right'
+            )
+_unary_factories = {}
+for _op in 'not', '+', '-':
+    for _kind in 'closure', 'slot':
+        _unary_factories[_op, _kind] = _factory(_unary_template, _op, _operand_kinds[_kind] % 'operand')
+del _op, _left, _right, _kind
+
+def binary(op, left, right):
+    '''Return a closure that applies the Python binary operator to the
+    operands. Each of them is a (kind, value) pair, where kind is one of
+    'closure', 'slot' and 'const'.'''
+    (left_kind, left), (right_kind, right) = left, right
+    if left_kind == right_kind == 'const':
+        # Don't fold the operation: it could raise an exception, which must
+        # happen at run time (if at all).
+        left_kind, left = 'closure', const(left)
+    return _binary_factories[op, left_kind, right_kind](left, right)
+
+def unary(op, operand):
+    '''Return a closure that applies the Python unary operator to the operand,
+    a (kind, value) pair, as for binary().'''
+    kind, operand = operand
+    if kind == 'const':
+        kind, operand = 'closure', const(operand)
+    return _unary_factories[op, kind](operand)
+
+def discard(value):
+    '''Return a closure that evaluates the value, but yields None.'''
+    def evaluate(frame):
+        value(frame)
+    return evaluate
+
+def convert(function, value):
+    '''Return a closure that applies the Python function to the value.'''
+    def evaluate(frame):
+        return function(value(frame))
+    return evaluate
+
+def assign(slot, value):
+    '''Return a closure that stores the value to the slot, and evaluates to
+    it.'''
+    def evaluate(frame):
+        result = frame[slot] = value(frame)
+        return result
+    return evaluate
+
+def store(slot, value):
+    '''Return a closure that stores the value to the slot.'''
+    def run(frame):
+        frame[slot] = value(frame)
+    return run
+
+def write_text(text):
+    '''Return a closure that writes the text to stdout.'''
+    def evaluate(frame):
+        io[0](text)
+    return evaluate
+
+def write_value(value):
+    '''Return a closure that writes the value (formatted by str()) and a
+    newline to stdout.'''
+    def evaluate(frame):
+        io[0]('%s\n' % value(frame))
+    return evaluate
+
+def read_line(function):
+    '''Return a closure that reads a line from stdin, and evaluates to the
+    result of the Python function applied to it.'''
+    def evaluate(frame):
+        return function(io[1]())
+    return evaluate
+
+def error():
+    '''Return a closure that flushes stdout and raises RuntimeError.'''
+    def evaluate(frame):
+        io[2]()
+        raise RuntimeError()
+    return evaluate
+
+def _skip(frame):
+    pass
+
+def block(statements):
+    '''Return a closure that runs the statements in sequence, until one of
+    them returns.'''
+    statements = [statement for statement in statements if statement is not _skip]
+    if not statements:
+        return _skip
+    if len(statements) == 1:
+        return statements[0]
+    if len(statements) == 2:
+        first, second = statements
+        def run(frame):
+            return first(frame) or second(frame)
+        return run
+    if len(statements) == 3:
+        first, second, third = statements
+        def run(frame):
+            return first(frame) or second(frame) or third(frame)
+        return run
+    def run(frame):
+        for statement in statements:
+            result = statement(frame)
+            if result is not None:
+                return result
+    return run
+
+def if_then_else(test, then, orelse):
+    '''Return a closure of a condition statement.'''
+    if orelse is _skip:
+        def run(frame):
+            if test(frame):
+                return then(frame)
+    else:
+        def run(frame):
+            if test(frame):
+                return then(frame)
+            return orelse(frame)
+    return run
+
+def while_loop(test, body, finally_):
+    '''Return a closure of a loop. 'finally_' runs after every iteration.'''
+    if finally_ is _skip:
+        def run(frame):
+            while test(frame):
+                result = body(frame)
+                if result is not None:
+                    return result
+    else:
+        def run(frame):
+            while test(frame):
+                result = body(frame) or finally_(frame)
+                if result is not None:
+                    return result
+    return run
+
+def counted_loop(slot, step, bound, adjustment, body):
+    '''Return a closure of a counted loop, which adds the step to the
+    variable in the slot until it reaches the bound (plus the adjustment).
+    See syntax.while_loop._py_counted_to_py().'''
+    def run(frame):
+        start = frame[slot]
+        stop = bound(frame) + adjustment
+        frame[slot] = start - step
+        for frame[slot] in xrange(start, stop, step):
+            result = body(frame)
+            if result is not None:
+                return result
+        frame[slot] += step
+    return run
+
+def if_return(test, then, orelse):
+    '''Return a closure of a condition statement, whose both branches return
+    the values.'''
+    def run(frame):
+        if test(frame):
+            return then(frame),
+        return orelse(frame),
+    return run
+
+def return_value(value):
+    '''Return a closure of a return statement. 'value' is None for
+    procedures.'''
+    if value is None:
+        result = None,
+        def run(frame):
+            return result
+    else:
+        def run(frame):
+            return value(frame),
+    return run
+
+def call(cell, arguments):
+    '''Return a closure that calls a function with values of the arguments,
+    evaluated from left to right. 'cell' is a list, in which the body of the
+    function (a closure) and the padding of its frame (a list of None, one for
+    each variable other than the arguments) are stored once the function is
+    compiled.'''
+    n = len(arguments)
+    if n == 0:
+        def evaluate(frame):
+            body, padding = cell
+            result = body(padding[:])
+            if result is not None:
+                return result[0]
+    elif n == 1:
+        [first] = arguments
+        def evaluate(frame):
+            body, padding = cell
+            result = body([first(frame)] + padding)
+            if result is not None:
+                return result[0]
+    elif n == 2:
+        first, second = arguments
+        def evaluate(frame):
+            body, padding = cell
+            result = body([first(frame), second(frame)] + padding)
+            if result is not None:
+                return result[0]
+    else:
+        def evaluate(frame):
+            body, padding = cell
+            result = body([argument(frame) for argument in arguments] + padding)
+            if result is not None:
+                return result[0]
+    return evaluate
+
+def define(cell, body, nargs, size):
+    '''Store the body of a function, with the given number of arguments and
+    size of the frame, to the cell (see call()).'''
+    cell[:] = body, [None] * (size - nargs)
+
+# Number of Python frames (used for recursion) that a Javalette function call
+# can take, on average:
+_frames_per_call = 3
+
+_recursion_message = 'maximum recursion depth exceeded'
+
+def execute(main):
+    '''Run the compiled program (the cell of its main function, see call())
+    with the current sys.stdin and sys.stdout. Return the exit status of the program.
+    Exceptions raised by the program are reported on stderr.'''
+    stdout = sys.stdout
+    io[:] = stdout.write, raw_input, stdout.flush
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(recursion_limit * _frames_per_call)
+    try:
+        try:
+            status = call(main, [])(None)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        stdout.flush()
+    except Exception:
+        stdout.flush()
+        type, value = sys.exc_info()[:2]
+        # The depth may be exceeded in a call of a built-in, which appends
+        # its context to the message:
+        if type is RuntimeError and str(value).startswith(_recursion_message):
+            value = RuntimeError(_recursion_message)
+        traceback.print_exception(type, value, None)
+        return 1
+    finally:
+        io[:] = None, None, None
+    return status
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,43 @@
+/*
+ * Call-heavy benchmark: recursive and mutually recursive factorials.
+ */
+
+int
+rfac(int n)
+{
+  if (n == 0)
+    return 1;
+  else
+    return n * rfac(n - 1);
+}
+
+int
+mfac(int n)
+{
+  if (n == 0)
+    return 1;
+  else
+    return n * nfac(n - 1);
+}
+
+int
+nfac(int n)
+{
+  if (n != 0)
+    return mfac(n - 1) * n;
+  else
+    return 1;
+}
+
+int
+main()
+{
+  int i;
+  int s = 0;
+  for (i = 0; i < 1000000; i++)
+    s = s + rfac(i % 13) - mfac(i % 13);
+  printInt(s);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,33 @@
+/*
+ * Floating-point benchmark: arithmetic, comparisons, remainders and casts of
+ * doubles in a tight loop, and calls that pass and return doubles.
+ */
+
+double
+step(double x, double y)
+{
+  return x * 0.5 + y / 4.0 - 1.0;
+}
+
+int
+main()
+{
+  int i;
+  int n = 0;
+  double s = 0.0;
+  double t = 1.0;
+  for (i = 0; i < 100000; i++) {
+    double x = (double) i;
+    s = s + x * 1.5 - t;
+    if (s > 1000.0)
+      s = s % 1000.0;
+    t = step(t, (double) (i % 100));
+    n = n + (int) s % 10;
+  }
+  printDouble(s);
+  printDouble(t);
+  printInt(n);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
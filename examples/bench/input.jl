@@ -0,0 +1,22 @@
+/*
+ * Input-heavy benchmark: the number of lines, followed by that many numbers,
+ * one per line, e.g.:
+ *
+ *   (echo 1000000; seq 1000000) > input.txt
+ */
+
+int
+main()
+{
+  int n = readInt();
+  int sum = 0;
+  int i = 0;
+  while (i < n) {
+    sum = sum + readInt();
+    i++;
+  }
+  printInt(sum);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
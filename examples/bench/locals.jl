@@ -0,0 +1,224 @@
+/*
+ * Call-heavy benchmark: a function with many short-lived local variables,
+ * as generated from a template.
+ */
+
+int
+f(int n)
+{
+  int s = 0;
+  int a0 = n + 0;
+  s = s + a0;
+  int a1 = n + 1;
+  s = s + a1;
+  int a2 = n + 2;
+  s = s + a2;
+  int a3 = n + 3;
+  s = s + a3;
+  int a4 = n + 4;
+  s = s + a4;
+  int a5 = n + 5;
+  s = s + a5;
+  int a6 = n + 6;
+  s = s + a6;
+  int a7 = n + 7;
+  s = s + a7;
+  int a8 = n + 8;
+  s = s + a8;
+  int a9 = n + 9;
+  s = s + a9;
+  int a10 = n + 10;
+  s = s + a10;
+  int a11 = n + 11;
+  s = s + a11;
+  int a12 = n + 12;
+  s = s + a12;
+  int a13 = n + 13;
+  s = s + a13;
+  int a14 = n + 14;
+  s = s + a14;
+  int a15 = n + 15;
+  s = s + a15;
+  int a16 = n + 16;
+  s = s + a16;
+  int a17 = n + 17;
+  s = s + a17;
+  int a18 = n + 18;
+  s = s + a18;
+  int a19 = n + 19;
+  s = s + a19;
+  int a20 = n + 20;
+  s = s + a20;
+  int a21 = n + 21;
+  s = s + a21;
+  int a22 = n + 22;
+  s = s + a22;
+  int a23 = n + 23;
+  s = s + a23;
+  int a24 = n + 24;
+  s = s + a24;
+  int a25 = n + 25;
+  s = s + a25;
+  int a26 = n + 26;
+  s = s + a26;
+  int a27 = n + 27;
+  s = s + a27;
+  int a28 = n + 28;
+  s = s + a28;
+  int a29 = n + 29;
+  s = s + a29;
+  int a30 = n + 30;
+  s = s + a30;
+  int a31 = n + 31;
+  s = s + a31;
+  int a32 = n + 32;
+  s = s + a32;
+  int a33 = n + 33;
+  s = s + a33;
+  int a34 = n + 34;
+  s = s + a34;
+  int a35 = n + 35;
+  s = s + a35;
+  int a36 = n + 36;
+  s = s + a36;
+  int a37 = n + 37;
+  s = s + a37;
+  int a38 = n + 38;
+  s = s + a38;
+  int a39 = n + 39;
+  s = s + a39;
+  int a40 = n + 40;
+  s = s + a40;
+  int a41 = n + 41;
+  s = s + a41;
+  int a42 = n + 42;
+  s = s + a42;
+  int a43 = n + 43;
+  s = s + a43;
+  int a44 = n + 44;
+  s = s + a44;
+  int a45 = n + 45;
+  s = s + a45;
+  int a46 = n + 46;
+  s = s + a46;
+  int a47 = n + 47;
+  s = s + a47;
+  int a48 = n + 48;
+  s = s + a48;
+  int a49 = n + 49;
+  s = s + a49;
+  int a50 = n + 50;
+  s = s + a50;
+  int a51 = n + 51;
+  s = s + a51;
+  int a52 = n + 52;
+  s = s + a52;
+  int a53 = n + 53;
+  s = s + a53;
+  int a54 = n + 54;
+  s = s + a54;
+  int a55 = n + 55;
+  s = s + a55;
+  int a56 = n + 56;
+  s = s + a56;
+  int a57 = n + 57;
+  s = s + a57;
+  int a58 = n + 58;
+  s = s + a58;
+  int a59 = n + 59;
+  s = s + a59;
+  int a60 = n + 60;
+  s = s + a60;
+  int a61 = n + 61;
+  s = s + a61;
+  int a62 = n + 62;
+  s = s + a62;
+  int a63 = n + 63;
+  s = s + a63;
+  int a64 = n + 64;
+  s = s + a64;
+  int a65 = n + 65;
+  s = s + a65;
+  int a66 = n + 66;
+  s = s + a66;
+  int a67 = n + 67;
+  s = s + a67;
+  int a68 = n + 68;
+  s = s + a68;
+  int a69 = n + 69;
+  s = s + a69;
+  int a70 = n + 70;
+  s = s + a70;
+  int a71 = n + 71;
+  s = s + a71;
+  int a72 = n + 72;
+  s = s + a72;
+  int a73 = n + 73;
+  s = s + a73;
+  int a74 = n + 74;
+  s = s + a74;
+  int a75 = n + 75;
+  s = s + a75;
+  int a76 = n + 76;
+  s = s + a76;
+  int a77 = n + 77;
+  s = s + a77;
+  int a78 = n + 78;
+  s = s + a78;
+  int a79 = n + 79;
+  s = s + a79;
+  int a80 = n + 80;
+  s = s + a80;
+  int a81 = n + 81;
+  s = s + a81;
+  int a82 = n + 82;
+  s = s + a82;
+  int a83 = n + 83;
+  s = s + a83;
+  int a84 = n + 84;
+  s = s + a84;
+  int a85 = n + 85;
+  s = s + a85;
+  int a86 = n + 86;
+  s = s + a86;
+  int a87 = n + 87;
+  s = s + a87;
+  int a88 = n + 88;
+  s = s + a88;
+  int a89 = n + 89;
+  s = s + a89;
+  int a90 = n + 90;
+  s = s + a90;
+  int a91 = n + 91;
+  s = s + a91;
+  int a92 = n + 92;
+  s = s + a92;
+  int a93 = n + 93;
+  s = s + a93;
+  int a94 = n + 94;
+  s = s + a94;
+  int a95 = n + 95;
+  s = s + a95;
+  int a96 = n + 96;
+  s = s + a96;
+  int a97 = n + 97;
+  s = s + a97;
+  int a98 = n + 98;
+  s = s + a98;
+  int a99 = n + 99;
+  s = s + a99;
+  return s;
+}
+
+int
+main()
+{
+  int i;
+  int s = 0;
+  for (i = 0; i < 100000; i++)
+    s = s + f(i) % 7;
+  printInt(s);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,23 @@
+/*
+ * Output-heavy benchmark: a million lines of numbers and text.
+ */
+
+int
+main()
+{
+  int i = 0;
+  double d = 0.5;
+  while (i < 1000000) {
+    if (i % 2 == 0)
+      printInt(i);
+    else
+      printDouble(d);
+    if (i % 10 == 0)
+      printString("ten");
+    d = d + 0.5;
+    i++;
+  }
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,20 @@
+/* Test passing arguments of different sizes: doubles, followed by other
+   arguments. */
+
+double f(double a, int n, double b, boolean c) {
+    if (c)
+        return a * (double) n + b;
+    return a - b;
+}
+
+int g(double a, double b, int n) {
+    return (int) (a + b) + n;
+}
+
+int main() {
+    printDouble(f(1.5, 4, 0.25, true));
+    printDouble(f(1.5, 4, 0.25, false));
+    printInt(g(2.5, 4.5, 10));
+    printInt(g(f(0.5, 2, 3.0, true), -1.0, -3));
+    return 0;
+}
@@ -0,0 +1,42 @@
+/*
+ * Assignments used as values, in every kind of expression, and variables
+ * named after Python keywords.
+ */
+
+int
+add(int a, int b)
+{
+  return a - b;
+}
+
+boolean
+check(int n)
+{
+  printInt(n);
+  return n != 0;
+}
+
+int
+main()
+{
+  int lambda = 1, pass = 2;
+  int x = lambda - (lambda = 5);
+  printInt(x);
+  printInt(readInt() - (pass = readInt()));
+  printInt(add(pass = pass + 1, 3));
+  printInt(pass);
+  boolean b = false;
+  if (check(x) && (b = check(x = x + 1)))
+    printString("both");
+  if (b || (b = true))
+    printInt(x);
+  int i = 0;
+  while ((i = i + 1) < 3 && check(i)) {
+    int lambda = i * 10;
+    printInt(lambda);
+  }
+  printInt(lambda);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,13 @@
+/* Test that casts of doubles to int truncate towards zero. */
+
+int main() {
+    printInt((int) 2.75);
+    printInt((int) -2.75);
+    printInt((int) -0.5);
+    printInt((int) -6.0);
+    double x = -7.25;
+    printInt((int) x);
+    printInt((int) (x * 2.0));
+    printInt((int) -x);
+    return 0;
+}
@@ -0,0 +1,18 @@
+/* Conditions compiled to jumps. */
+
+boolean t(int n) { printInt(n); return true; }
+boolean f(int n) { printInt(n); return false; }
+int main() {
+  if (t(1) && f(2) || !t(3) && t(4)) printString("a"); else printString("b");
+  if (true) printString("c");
+  if (!(f(5) || f(6))) printString("d");
+  while (false) printString("e");
+  int i = 0;
+  while (i < 3 && !f(7)) i++;
+  boolean b = t(8) || f(9);
+  if (b) printString("f");
+  while (true) { if (i == 5) return 0; i++; }
+  return 1;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,57 @@
+/* Test arithmetic, comparisons and casts of doubles, and passing them to and
+   from functions. */
+
+double scale(double x, int n, double y) {
+    return x * (double) n + y;
+}
+
+double mean(double a, double b) {
+    return (a + b) / 2.0;
+}
+
+void show(double a, double b) {
+    printDouble(a + b);
+    printDouble(a - b);
+    printDouble(a * b);
+    printDouble(a / b);
+    printDouble(a % b);
+    printDouble(-a + 1.0);
+    printInt((int) a);
+    printInt((int) (a * b));
+    printBool((boolean) a);
+    printBool(a < b);
+    printBool(a <= b);
+    printBool(a > b);
+    printBool(a >= b);
+    printBool(a == b);
+    printBool(a != b);
+    return;
+}
+
+void printBool(boolean b) {
+    if (b)
+        printString("true");
+    else
+        printString("false");
+    return;
+}
+
+int main() {
+    show(7.5, -2.0);
+    show(-6.75, -1.5);
+    show(0.0, 3.25);
+    show(2.5, 2.5);
+    printDouble(scale(1.5, 4, 0.25));
+    printDouble(mean(scale(0.5, 3, 1.0), mean(6.0, 8.0)) * 4.0);
+    double s = 0.0;
+    int i = 0;
+    while (i < 20) {
+        s = s + (double) i * 0.5;
+        if (s > 10.0 && s % 4.0 < 2.0)
+            s = s - 8.0;
+        i++;
+    }
+    printDouble(s);
+    printDouble((double) (i / 3) + (double) true);
+    return 0;
+}
@@ -0,0 +1,57 @@
+/* Identical and unused functions. */
+
+int fac(int n) {
+  int r = 1;
+  while (n > 1) {
+    r = r * n;
+    n--;
+  }
+  return r;
+}
+
+int factorial(int k) {
+  int result = 1;
+  while (k > 1) {
+    result = result * k;
+    k--;
+  }
+  return result;
+}
+
+int fib(int n) {
+  if (n < 2)
+    return n;
+  return fib(n - 1) + fib(n - 2);
+}
+
+int fibonacci(int m) {
+  if (m < 2)
+    return m;
+  return fibonacci(m - 1) + fibonacci(m - 2);
+}
+
+int twice(int n) {
+  return 2 * n;
+}
+
+int halve(int n) {
+  return n / 2;
+}
+
+void unused() {
+  printString("never printed");
+  printInt(halve(readInt()));
+  return;
+}
+
+int main() {
+  int n = 5;
+  printInt(fac(n));
+  printInt(factorial(n + 1));
+  printInt(fib(2 * n));
+  printInt(fibonacci(2 * n + 2));
+  printInt(twice(21));
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,33 @@
+/* Counted for-loops, and the final values of their counters. */
+
+int f(int n) {
+  int i;
+  int s = 0;
+  for (i = 0; i < n; i++)
+    s = s + i;
+  printInt(i);
+  for (i = 10; i <= n; i = i + 3)
+    s = s + i;
+  printInt(i);
+  for (i = n; i > 0; i--) {
+    if (i == 2)
+      return s + i;
+    s = s - 1;
+  }
+  printInt(i);
+  for (i = 5; 2 * n >= i; i = i - 1) s++;
+  printInt(i);
+  int j = 0;
+  for (i = 0; i < n; i = i + 1) { j = j + i; i = i + 0; }
+  printInt(i);
+  return s;
+}
+int main() {
+  printInt(f(0));
+  printInt(f(1));
+  printInt(f(20));
+  printInt(f(-5));
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,22 @@
+/* Test that values kept in registers survive calls of functions that keep
+   local variables (including doubles) in their stack frames. */
+
+int id(int n) {
+    return n;
+}
+
+int g(int n) {
+    double x = (double) n * 1.5;
+    int a = id(n) + 1;
+    int b = id(a) * 2;
+    return a + b + (int) x;
+}
+
+int main() {
+    int k = 7;
+    int s = g(k);
+    printInt(k);
+    printInt(s);
+    printInt(k + g(s));
+    return 0;
+}
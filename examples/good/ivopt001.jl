@@ -0,0 +1,40 @@
+/* Loops with basic and derived induction variables. */
+
+int scaled(int n, int stride) {
+  int i, sum = 0;
+  for (i = 0; i < n; i++)
+    sum = sum + i * stride;
+  return sum;
+}
+
+int dead(int n) {
+  int i = 3, j = 0, sum = 0;
+  while (j < n) {
+    sum = sum + 7 * i + i * 7;
+    i = i - 2;
+    j++;
+  }
+  return sum;
+}
+
+int main() {
+  int i, k;
+  for (i = 0; i < 5; i++) {
+    int base = 100 + i * 10;
+    printInt(base);
+    for (k = 1; k <= 3; k++)
+      printInt(base + k * i);
+  }
+  printInt(i * 1000);
+  printInt(scaled(10, 3));
+  printInt(scaled(0, 3));
+  printInt(dead(5));
+  i = 10;
+  while (i > 0) {
+    i = i - 3;
+    printInt(i * -1);
+  }
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,14 @@
+/* An induction variable that is read after the loop by an increment. */
+
+int main() {
+  int i = 0, n = 0, s = 0;
+  while (n < 5) {
+    s = s + i * 3;
+    i = i + 1;
+    n++;
+  }
+  printInt(s);
+  int j = i++;
+  printInt(j);
+  return 0;
+}
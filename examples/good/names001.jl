@@ -0,0 +1,51 @@
+/*
+ * Functions whose names clash with Python built-ins and constants.
+ */
+
+int
+print(int n)
+{
+  printInt(n);
+  return n;
+}
+
+double
+float(int n)
+{
+  return 0.5;
+}
+
+int
+range(int a, int b)
+{
+  return b - a;
+}
+
+boolean
+None()
+{
+  return true;
+}
+
+void
+exit(int code)
+{
+  printString("exit");
+  return;
+}
+
+int
+main()
+{
+  int i = print(range(1, 5));
+  printDouble((double) i + float(i));
+  if (None())
+    exit(1);
+  i = 0;
+  while (i < range(2, 4))
+    i++;
+  printInt(i);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,23 @@
+/* Printing constants and non-constants, which are both expanded inline. */
+
+int main() {
+  int n = 42;
+  double d = 2.5;
+  printString("");
+  printString("trailing space ");
+  printString("tab\t");
+  printInt(0);
+  printInt(-7);
+  printInt(n);
+  printInt(-n);
+  printDouble(1.0);
+  printDouble(-0.5);
+  printDouble(100000000000000000000.0);
+  printDouble(1.0 / 3.0);
+  printDouble(d);
+  printDouble(d * 4.0);
+  printString("done");
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,43 @@
+/* Variables whose lifetimes don't overlap, and ones whose lifetimes do. */
+
+int f(int a) {
+  int b = a * 2;
+  int c = b + 1;
+  int s = 0;
+  int i = 0;
+  while (i < 3) {
+    int t = s + c;
+    s = t;
+    i++;
+  }
+  return s;
+}
+
+int g(int n) {
+  int keep = n;
+  int i;
+  for (i = 0; i < n; i++) {
+    int x = i * i;
+    int y = x + keep;
+    printInt(y);
+  }
+  int z = keep + 1;
+  printInt(z);
+  int w = z * 2;
+  return w + keep;
+}
+
+int main() {
+  printInt(f(5));
+  printInt(g(3));
+  int u = 1;
+  printInt(u);
+  int v = u + 1;
+  printInt(v);
+  int q;
+  q = v + u;
+  printInt(q);
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -0,0 +1,51 @@
+/* Functions called with constant arguments. */
+
+int apply(int mode, int x) {
+  if (mode == 0)
+    return x + 1;
+  else if (mode == 1)
+    return x * 2;
+  else
+    return -x;
+}
+
+int power(int base, int n) {
+  if (n == 0)
+    return 1;
+  return base * power(base, n - 1);
+}
+
+int countdown(int n, boolean verbose) {
+  int steps = 0;
+  while (n > 0) {
+    if (verbose)
+      printInt(n);
+    n--;
+    steps++;
+  }
+  return steps;
+}
+
+double scale(int x, double factor) {
+  return (double) x * factor;
+}
+
+int main() {
+  int i = 0;
+  while (i < 3) {
+    printInt(apply(0, i));
+    printInt(apply(1, i));
+    printInt(apply(2, i));
+    printInt(apply(i, 10));
+    i++;
+  }
+  printInt(power(2, 10));
+  printInt(power(3, 4));
+  printInt(countdown(3, true));
+  printInt(countdown(4, false));
+  printDouble(scale(3, 0.5));
+  printDouble(scale(5, 0.5));
+  return 0;
+}
+
+/* vim:set ts=2 sts=2 sw=2 et ft=c: */
@@ -28,7 +28,11 @@ from syntax import TypeMismatch
 from type import int_t, double_t, boolean_t, void_t
 from builtins import x86_0div_error
 
+from struct import pack
+
 import bp
+import closures
+import py3
 import x86
 
 __all__ = ['expression', 'assignment', 'binary_operator', 'call', 'cast', 'const', 'reference', 'unary_operator']
@@ -44,6 +48,12 @@ class expression(syntax.base):
     def get_var_refs(self):
         raise NotImplementedError()
 
+    def get_children(self):
+        return ()
+
+    def transform(self, function):
+        pass
+
     def validate(self):
         ok = self._validate()
         if self.type is None:
@@ -64,6 +74,29 @@ class expression(syntax.base):
         '''[py] Generate code for type-casting the expression value.'''
         return self.type.py_cast_to(type)
 
+    def py3_evaluate(self):
+        '''[py3] Generate Python AST for evaluating the expression and
+        discarding its value.'''
+        return [py3.node('Expr', self.y, value=self.to_py3())]
+
+    def closure_evaluate(self, env):
+        '''[cl] Compile evaluating the expression and discarding its value.'''
+        return closures.discard(self.to_closure(env))
+
+    def closure_operand(self, env):
+        '''[cl] Compile the expression as an operand for closures.binary():
+        return a (kind, value) pair.'''
+        return 'closure', self.to_closure(env)
+
+    def py_branch(self, label, jump_if):
+        '''[py] Generate code that jumps to the label if the (boolean) expression
+        value is equal to 'jump_if', and falls through otherwise.
+        The value is not left on the stack.'''
+        if jump_if:
+            return self.to_py() + bp.pop_jump_if_true(label)
+        else:
+            return self.to_py() + bp.pop_jump_if_false(label)
+
     def x86_asm_push(self, env):
         '''[x86] Generate code for pushing the expression value on the stack.'''
         return self.to_x86_asm(env) + self.type.x86_asm_push(env)
@@ -86,9 +119,13 @@ class expression(syntax.base):
         return self.type == void_t
 
     _doc = {
-        'is_evaluatable': 'Return whether the expression can be used in an evaluation statement,\neven without an explicit type-cast to <void>.'
+        'is_evaluatable': 'Return whether the expression can be used in an evaluation statement,\neven without an explicit type-cast to <void>.',
+        'py3_evaluate': '[py3] Generate Python AST for evaluating the expression and\ndiscarding its value.',
+        'closure_evaluate': '[cl] Compile evaluating the expression and discarding its value.',
+        'closure_operand': '[cl] Compile the expression as an operand for closures.binary():\nreturn a (kind, value) pair.',
+        'py_branch': "[py] Generate code that jumps to the label if the (boolean) expression\nvalue is equal to 'jump_if', and falls through otherwise.\nThe value is not left on the stack."
     }
-    for _method in ('validate', 'to_py', 'to_x86_asm', 'get_var_refs', 'check_var_usage'):
+    for _method in ('validate', 'to_py', 'to_py3', 'to_closure', 'to_x86_asm', 'get_var_refs', 'get_children', 'transform', 'check_var_usage'):
         _doc[_method] = syntax.base._doc[_method]
     del _method
 
@@ -117,6 +154,33 @@ class const(expression):
             (bp.LOAD_CONST, self.value)
         ]
 
+    def to_py3(self):
+        value = self.value
+        if self.type == double_t:
+            value = float(value)
+            if value - value != 0:
+                # Infinity or NaN, which have no literals:
+                return py3.call('*float', [py3.constant(repr(value))], self.y)
+        return py3.constant(value)
+
+    def closure_operand(self, env):
+        value = self.value
+        if self.type == double_t:
+            value = float(value)
+        return 'const', value
+
+    def to_closure(self, env):
+        return closures.const(self.closure_operand(env)[1])
+
+    def py_branch(self, label, jump_if):
+        if bool(self.value) == jump_if:
+            return [
+                (bp.SetLineno, self.y),
+                (bp.JUMP_ABSOLUTE, label)
+            ]
+        else:
+            return []
+
     def to_x86_asm(self, env):
         return self.type.x86_asm_const(self.value, env)
 
@@ -138,15 +202,52 @@ _py_binary_numeric_op = {
     '%': bp.BINARY_MODULO,
 }
 
+_py3_binary_numeric_op = {
+    '+': 'Add',
+    '-': 'Sub',
+    '*': 'Mult',
+    ('/', int_t): 'FloorDiv',
+    ('/', double_t): 'Div',
+    '%': 'Mod',
+}
+
+_py3_binary_logical_op = {
+    '&&': 'And',
+    '||': 'Or',
+}
+
+_py3_compare_op = {
+    '<': 'Lt',
+    '<=': 'LtE',
+    '>': 'Gt',
+    '>=': 'GtE',
+    '==': 'Eq',
+    '!=': 'NotEq',
+}
+
+_closure_binary_op = {
+    '+': '+',
+    '-': '-',
+    '*': '*',
+    ('/', int_t): '//',
+    ('/', double_t): '/',
+    '%': '%',
+    '&&': 'and',
+    '||': 'or',
+}
+for _op in _inequality_ops | _equality_ops:
+    _closure_binary_op[_op] = _op
+del _op
+
 _py_binary_logical_op = {
     '&&': bp.jump_if_false,
     '||': bp.jump_if_true,
 }
 
 _x86_binary_int_op = {
-    '+': ['add eax, ecx'],
-    '-': ['sub eax, ecx'],
-    '*': ['imul ecx'],
+    '+': [x86.Instruction('add', 'eax', 'ecx')],
+    '-': [x86.Instruction('sub', 'eax', 'ecx')],
+    '*': [x86.Instruction('imul', 'ecx')],
 }
 
 _x86_binary_double_op = {
@@ -156,6 +257,13 @@ _x86_binary_double_op = {
     '/': 'divr'
 }
 
+_x86_sse2_binary_op = {
+    '+': 'addsd',
+    '-': 'subsd',
+    '*': 'mulsd',
+    '/': 'divsd'
+}
+
 _x86_inequality_int_op = {
     '<': 'l',
     '<=': 'le',
@@ -179,6 +287,138 @@ _x86_binary_logical_op = {
     '||': 'nz'
 }
 
+# Inequality operators with their operands swapped:
+_x86_swapped_inequality_op = {
+    '<': '>',
+    '<=': '>=',
+    '>=': '<=',
+    '>': '<',
+    '==': '==',
+    '!=': '!=',
+}
+
+def _x86_is_immediate(operand):
+    return isinstance(operand, (int, long))
+
+def _x86_operand(node):
+    '''[x86] Return the operand (an immediate, a register or a memory
+    reference) that holds the value of the node, if it is a constant or a
+    variable of a dword type. Otherwise, return None.'''
+    if isinstance(node, const) and node.type in (int_t, boolean_t):
+        return int(node.value)
+    if isinstance(node, reference) and isinstance(node.type, type.x86_dword_type):
+        return node.bind.x86_operand()
+    return None
+
+def _x86_assigns(node, var):
+    '''[x86] Return whether evaluation of the node assigns to the variable.'''
+    if isinstance(node, assignment) and node.lvalue.bind is var:
+        return True
+    for child in node.get_children():
+        if _x86_assigns(child, var):
+            return True
+    return False
+
+def _x86_divide(op, operand):
+    '''[x86] Generate code for dividing eax by the operand (not eax or edx),
+    leaving the quotient or the remainder in eax.'''
+    result = []
+    if _x86_is_immediate(operand):
+        if operand == 0:
+            result += x86.Instruction('jmp', x86_0div_error),
+        # idiv takes no immediates:
+        const = x86.Const(pack('<i', operand))
+        result += const,
+        operand = '[%s]' % const
+    elif x86.is_memory(operand):
+        result += [
+            x86.Instruction('cmp', x86.dword(operand), 0),
+            x86.Instruction('jz', x86_0div_error)
+        ]
+    else:
+        result += [
+            x86.Instruction('test', operand, operand),
+            x86.Instruction('jz', x86_0div_error)
+        ]
+    result += [
+        x86.Instruction('cdq'),
+        x86.Instruction('idiv', x86.dword(operand))
+    ]
+    if op == '%':
+        # The remainder takes the sign of the divisor:
+        label = x86.Label()
+        result += [
+            x86.Instruction('mov', 'eax', 'edx'),
+            x86.Instruction('test', 'eax', 'eax'),
+            x86.Instruction('jz', label),
+            x86.Instruction('xor', 'edx', operand),
+            x86.Instruction('jns', label),
+            x86.Instruction('add', 'eax', operand),
+            label,
+        ]
+    return result
+
+def _x86_double_remainder():
+    '''[x86] Generate code for replacing st0 = a, st1 = b with the remainder
+    of a divided by b (which has the sign of b).'''
+    label = x86.Label()
+    const = x86.Const('touch:\0')
+    return [
+        const,
+        x86.Instruction('fprem1'),
+        x86.Instruction('fldz'),                # st0 = 0,     st1 = r,    st2 = b
+        x86.Instruction('fucomi', 'st0', 'st1'),
+        x86.Instruction('je', label),
+        x86.Instruction('seta', 'al'),
+        x86.Instruction('fucomi', 'st0', 'st2'),
+        x86.Instruction('seta', 'dl'),
+        x86.Instruction('cmp', 'al', 'dl'),
+        x86.Instruction('je', label),
+        x86.Instruction('fxch', 'st1'),         # st0 = r,     st1 = 0,    st2 = b
+        x86.Instruction('fadd', 'st2'),         # st0 = r + b, st1 = 0
+        x86.Instruction('fxch', 'st1'),         #              st1 = r + b
+        label,
+        x86.Instruction('fstp', 'st0'),
+        x86.Instruction('ffree', 'st1')
+    ]
+
+def _x86_sse2_operand(node):
+    '''[x86] Return the memory operand that holds value of the double
+    expression, together with the constants it refers to, if the expression
+    needs no code to be evaluated; or None.'''
+    if isinstance(node, const):
+        constant = x86.Const(pack('<d', node.value))
+        return [constant], 'QWORD [%s]' % constant
+    if isinstance(node, reference):
+        return [], node.bind.uid.sized('QWORD')
+    return None
+
+def _x86_int_op(op, operand):
+    '''[x86] Generate code for the operation on eax and the operand (eax op
+    operand), leaving the result in eax.'''
+    if op == '+':
+        return [x86.Instruction('add', 'eax', operand)]
+    elif op == '-':
+        return [x86.Instruction('sub', 'eax', operand)]
+    elif op == '*':
+        if _x86_is_immediate(operand):
+            return [x86.Instruction('imul', 'eax', 'eax', operand)]
+        return [x86.Instruction('imul', 'eax', operand)]
+    elif op in _x86_inequality_int_op:
+        return [
+            x86.Instruction('cmp', 'eax', operand),
+            x86.Instruction('set%s' % _x86_inequality_int_op[op], 'al'),
+            x86.Instruction('and', 'eax', 1)
+        ]
+    return _x86_divide(op, operand)
+
+def _x86_swapped_int_op(op, operand):
+    '''[x86] Generate code for the operation on the operand and eax (operand
+    op eax), leaving the result in eax. Divisions are not supported.'''
+    if op == '-':
+        return [x86.Instruction('neg', 'eax'), x86.Instruction('add', 'eax', operand)]
+    return _x86_int_op(_x86_swapped_inequality_op.get(op, op), operand)
+
 class binary_operator(expression):
 
     __doc__ = '\n'.join([
@@ -205,6 +445,13 @@ class binary_operator(expression):
             result += self.right.get_var_refs()
         return result
 
+    def get_children(self):
+        return self.left, self.right
+
+    def transform(self, function):
+        self.left = function(self.left)
+        self.right = function(self.right)
+
     def _validate(self):
         ok = self.left.validate()
         ok &= self.right.validate()
@@ -283,6 +530,49 @@ class binary_operator(expression):
             raise NotImplementedError('Python code for binary operator %s' % op)
         return lpy + rpy + [(bp.SetLineno, self.y)] + result
 
+    def to_py3(self):
+        left = self.left.to_py3()
+        right = self.right.to_py3()
+        op = self.operator
+        if op in _binary_logical_ops:
+            return py3.node('BoolOp', self.y, op=py3.node(_py3_binary_logical_op[op]), values=[left, right])
+        elif op in _binary_numeric_ops:
+            pyop = _py3_binary_numeric_op.get(op) or _py3_binary_numeric_op.get((op, self.type))
+            if pyop is None:
+                raise NotImplementedError('Python 3 code for binary operator %s' % op)
+            return py3.node('BinOp', self.y, left=left, op=py3.node(pyop), right=right)
+        elif op in _inequality_ops | _equality_ops:
+            return py3.node('Compare', self.y, left=left, ops=[py3.node(_py3_compare_op[op])], comparators=[right])
+        else:
+            raise NotImplementedError('Python 3 code for binary operator %s' % op)
+
+    def to_closure(self, env):
+        op = self.operator
+        pyop = _closure_binary_op.get(op) or _closure_binary_op.get((op, self.type))
+        if pyop is None:
+            raise NotImplementedError('Closure for binary operator %s' % op)
+        return closures.binary(pyop, self.left.closure_operand(env), self.right.closure_operand(env))
+
+    def py_branch(self, label, jump_if):
+        op = self.operator
+        if op not in _binary_logical_ops:
+            return expression.py_branch(self, label, jump_if)
+        # The right operand decides only if the left one is true (for '&&')
+        # or false (for '||'):
+        decisive = op == '&&'
+        result = []
+        if jump_if == decisive:
+            label_skip = bp.Label()
+            result += self.left.py_branch(label_skip, not decisive)
+            result += (bp.SetLineno, self.y),
+            result += self.right.py_branch(label, jump_if)
+            result += (label_skip, None),
+        else:
+            result += self.left.py_branch(label, jump_if)
+            result += (bp.SetLineno, self.y),
+            result += self.right.py_branch(label, jump_if)
+        return result
+
     def to_x86_asm(self, env):
         op = self.operator
         if op in _binary_logical_ops:
@@ -291,85 +581,157 @@ class binary_operator(expression):
             result = []
             result += self.left.to_x86_asm(env)
             result += [
-                'or eax, eax',
-                'j%s %s' % (condition, label),
+                x86.Instruction('or', 'eax', 'eax'),
+                x86.Instruction('j%s' % condition, label),
             ]
             result += self.left.x86_asm_discard(env)
             result += self.right.to_x86_asm(env)
             result += label,
             return result
+        if isinstance(self.left.type, type.x86_dword_type) and env.registers is not None:
+            return self._x86_asm_registers(env)
+        if self.left.type == double_t and env.sse2:
+            return self._x86_asm_sse2(env)
         lx = self.left.x86_asm_push(env)
         rx = self.right.to_x86_asm(env)
         if isinstance(self.left.type, type.x86_dword_type):
-            result = lx + rx + ['pop ecx']
+            result = lx + rx + [x86.Instruction('pop', 'ecx')]
             if op in _x86_inequality_int_op:
                 result += [
-                    'cmp ecx, eax',
-                    'set%s al' % _x86_inequality_int_op[op],
-                    'and eax, 1'
+                    x86.Instruction('cmp', 'ecx', 'eax'),
+                    x86.Instruction('set%s' % _x86_inequality_int_op[op], 'al'),
+                    x86.Instruction('and', 'eax', 1)
                 ]
                 return result
             if op not in _commutative_binary_ops:
-                result += 'xchg eax, ecx',
+                result += x86.Instruction('xchg', 'eax', 'ecx'),
             if op in _x86_binary_int_op:
                 result += _x86_binary_int_op[op]
                 return result
             if op in ('%', '/'):
                 result += [
-                    'or ecx, ecx',
-                    'jz %s' % x86_0div_error,
-                    'cdq',
-                    'idiv ecx'
+                    x86.Instruction('or', 'ecx', 'ecx'),
+                    x86.Instruction('jz', x86_0div_error),
+                    x86.Instruction('cdq'),
+                    x86.Instruction('idiv', 'ecx')
                 ]
                 if op == '%':
                     label = x86.Label()
                     result += [
-                        'mov eax, edx',
-                        'or eax, eax',
-                        'jz %s' % label,
-                        'mov edx, ecx',
-                        'xor ecx, eax',
-                        'jns %s' % label,
-                        'add eax, edx',
+                        x86.Instruction('mov', 'eax', 'edx'),
+                        x86.Instruction('or', 'eax', 'eax'),
+                        x86.Instruction('jz', label),
+                        x86.Instruction('mov', 'edx', 'ecx'),
+                        x86.Instruction('xor', 'ecx', 'eax'),
+                        x86.Instruction('jns', label),
+                        x86.Instruction('add', 'eax', 'edx'),
                         label,
                     ]
                 return result
         elif self.left.type == double_t:
-            result = lx + rx + ['fld QWORD [esp]', x86.AddESP(8)]
+            result = lx + rx + [x86.Instruction('fld', 'QWORD [esp]'), x86.AddESP(8)]
             if op in _x86_binary_double_op:
-                return result + ['f%sp st1' % _x86_binary_double_op[op]]
+                return result + [x86.Instruction('f%sp' % _x86_binary_double_op[op], 'st1')]
             elif op == '%':
-                label = x86.Label()
-                const = x86.Const('touch:\0')
-                result += [
-                    const,
-                    'fprem1',
-                    'fldz',            # st0 = 0,     st1 = r,    st2 = b
-                    'fucomi st0, st1',
-                    'je %s' % label,
-                    'seta al',
-                    'fucomi st0, st2',
-                    'seta dl',
-                    'cmp al, dl',
-                    'je %s' % label,
-                    'fxch st1',        # st0 = r,     st1 = 0,    st2 = b
-                    'fadd st2',        # st0 = r + b, st1 = 0
-                    'fxch st1',        #              st1 = r + b
-                    label,
-                    'fstp st0',
-                    'ffree st1'
-                ]
+                result += _x86_double_remainder()
                 return result
             elif op in _x86_inequality_double_op:
                 result += [
-                    'fucomip st1',
-                    'set%s al' % _x86_inequality_double_op[op],
-                    'and eax, 1',
+                    x86.Instruction('fucomip', 'st1'),
+                    x86.Instruction('set%s' % _x86_inequality_double_op[op], 'al'),
+                    x86.Instruction('and', 'eax', 1),
                 ]
                 result += double_t.x86_asm_discard(env) * 2
                 return result
         raise NotImplementedError('X86 code for binary operator <%s> %s <%s>' % (self.left.type, self.operator, self.right.type))
 
+    def _x86_asm_sse2(self, env):
+        '''[x86] Generate code for an operation on doubles, computed in xmm0
+        (with xmm1 as a scratch register).'''
+        op = self.operator
+        if op == '%':
+            # SSE2 has no remainder instruction, so the x87 one is used:
+            result = self.left.x86_asm_push(env)
+            result += self.right.x86_asm_push(env)
+            result += [
+                x86.Instruction('fld', 'QWORD [esp]'),
+                x86.Instruction('fld', 'QWORD [esp + 8]'),
+            ]
+            result += _x86_double_remainder()
+            result += [
+                x86.Instruction('fstp', 'QWORD [esp]'),
+                x86.Instruction('movsd', 'xmm0', 'QWORD [esp]'),
+                x86.AddESP(16)
+            ]
+            return result
+        operand = _x86_sse2_operand(self.right)
+        if operand is not None:
+            consts, operand = operand
+            result = self.left.to_x86_asm(env) + consts
+        else:
+            operand = _x86_sse2_operand(self.left)
+            if operand is not None and (isinstance(self.left, const) or not _x86_assigns(self.right, self.left.bind)):
+                consts, operand = operand
+                result = self.right.to_x86_asm(env) + consts
+                if op not in _commutative_binary_ops:
+                    result += [
+                        x86.Instruction('movapd', 'xmm1', 'xmm0'),
+                        x86.Instruction('movsd', 'xmm0', operand)
+                    ]
+                    operand = 'xmm1'
+            else:
+                result = self.left.x86_asm_push(env)
+                result += self.right.to_x86_asm(env)
+                result += [
+                    x86.Instruction('movapd', 'xmm1', 'xmm0'),
+                    x86.Instruction('movsd', 'xmm0', 'QWORD [esp]'),
+                    x86.AddESP(8)
+                ]
+                operand = 'xmm1'
+        if op in _x86_sse2_binary_op:
+            result += x86.Instruction(_x86_sse2_binary_op[op], 'xmm0', operand),
+            return result
+        elif op in _x86_inequality_double_op:
+            result += [
+                x86.Instruction('ucomisd', 'xmm0', operand),
+                x86.Instruction('set%s' % _x86_inequality_double_op[op], 'al'),
+                x86.Instruction('and', 'eax', 1)
+            ]
+            return result
+        raise NotImplementedError('X86 code for binary operator <%s> %s <%s>' % (self.left.type, self.operator, self.right.type))
+
+    def _x86_asm_registers(self, env):
+        '''[x86] Generate code for an operation on dwords, with operands taken
+        from their variables, or kept in a temporary register.'''
+        op = self.operator
+        division = op in ('/', '%')
+        operand = _x86_operand(self.right)
+        if operand is not None:
+            return self.left.to_x86_asm(env) + _x86_int_op(op, operand)
+        operand = _x86_operand(self.left)
+        if operand is not None and not division and (isinstance(self.left, const) or not _x86_assigns(self.right, self.left.bind)):
+            return self.right.to_x86_asm(env) + _x86_swapped_int_op(op, operand)
+        result = self.left.to_x86_asm(env)
+        temporary = env.registers.temporary(self.right, exclude=division and ('edx',) or ())
+        if temporary is None:
+            # No register is free; the left operand is kept on the stack:
+            result += x86.Instruction('push', 'eax'),
+            operand = '[esp]'
+        else:
+            result += x86.Instruction('mov', temporary, 'eax'),
+            operand = temporary
+        result += self.right.to_x86_asm(env)
+        if division:
+            result += x86.Instruction('xchg', 'eax', operand),
+            result += _x86_int_op(op, operand)
+        else:
+            result += _x86_swapped_int_op(op, operand)
+        if temporary is None:
+            result += x86.AddESP(4),
+        else:
+            env.registers.release(temporary)
+        return result
+
     def __str__(self):
         return '(%s %s %s)' % (self.left, self.operator, self.right)
 
@@ -382,14 +744,32 @@ _py_unary_op = {
     '-': bp.UNARY_NEGATIVE
 }
 
+_py3_unary_op = {
+    '!': 'Not',
+    '+': 'UAdd',
+    '-': 'USub'
+}
+
+_closure_unary_op = {
+    '!': 'not',
+    '+': '+',
+    '-': '-'
+}
+
 _x86_unary_dword_op = {
-    '!': ['xor eax, 1'],
+    '!': [x86.Instruction('xor', 'eax', 1)],
     '+': [],
-    '-': ['neg eax']
+    '-': [x86.Instruction('neg', 'eax')]
 }
 
 _x86_unary_double_op = {
-    '-': ['fldz', 'fsubrp st1'],
+    '-': [x86.Instruction('fldz'), x86.Instruction('fsubrp', 'st1')],
+    '+': []
+}
+
+# Like the x87 code above, negation computes 0 - x (so that -0.0 is 0.0):
+_x86_sse2_unary_double_op = {
+    '-': [x86.Instruction('movapd', 'xmm1', 'xmm0'), x86.Instruction('xorpd', 'xmm0', 'xmm0'), x86.Instruction('subsd', 'xmm0', 'xmm1')],
     '+': []
 }
 
@@ -414,6 +794,12 @@ class unary_operator(expression):
         else:
             return ()
 
+    def get_children(self):
+        return self.left,
+
+    def transform(self, function):
+        self.left = function(self.left)
+
     def _validate(self):
         return self.left.validate()
 
@@ -444,10 +830,23 @@ class unary_operator(expression):
     def to_py(self):
         return self.left.to_py() + [(bp.SetLineno, self.y), (_py_unary_op[self.operator], None)]
 
+    def to_py3(self):
+        return py3.node('UnaryOp', self.y, op=py3.node(_py3_unary_op[self.operator]), operand=self.left.to_py3())
+
+    def to_closure(self, env):
+        return closures.unary(_closure_unary_op[self.operator], self.left.closure_operand(env))
+
+    def py_branch(self, label, jump_if):
+        if self.operator == '!':
+            return self.left.py_branch(label, not jump_if)
+        return expression.py_branch(self, label, jump_if)
+
     def to_x86_asm(self, env):
         op = self.operator
         if isinstance(self.left.type, type.x86_dword_type):
             return self.left.to_x86_asm(env) + _x86_unary_dword_op[op]
+        elif self.left.type == double_t and env.sse2:
+            return self.left.to_x86_asm(env) + _x86_sse2_unary_double_op[op]
         elif self.left.type == double_t:
             return self.left.to_x86_asm(env) + _x86_unary_double_op[op]
         raise NotImplementedError('X86 code for unary operator %s <%s>' % (self.operator, self.left.type))
@@ -489,12 +888,29 @@ class reference(expression):
     def to_py(self):
         return self.bind.py_read()
 
+    def to_py3(self):
+        return self.bind.py3_read()
+
+    def closure_operand(self, env):
+        return self.bind.closure_operand(env)
+
+    def to_closure(self, env):
+        kind, value = self.closure_operand(env)
+        if kind == 'slot':
+            return closures.read(value)
+        return value
+
     def py_write(self, **kwargs):
         return self.bind.py_write(**kwargs)
 
     def to_x86_asm(self, env):
         return self.bind.x86_asm_read(env)
 
+    def x86_asm_push(self, env):
+        if self.bind.x86_register is not None:
+            return [x86.Instruction('push', self.bind.x86_register)]
+        return expression.x86_asm_push(self, env)
+
     def x86_asm_write(self, value, env):
         return self.bind.x86_asm_write(value, env)
 
@@ -520,6 +936,13 @@ class call(expression):
             result += argument.get_var_refs()
         return result
 
+    def get_children(self):
+        return [self.function] + self.arguments
+
+    def transform(self, function):
+        self.function = function(self.function)
+        self.arguments = [function(argument) for argument in self.arguments]
+
     def validate(self):
         return expression.validate(self) and self._post_validate()
 
@@ -563,6 +986,9 @@ class call(expression):
         return ok
 
     def to_py(self):
+        result = self.function.bind.py_inline_call(self)
+        if result is not None:
+            return result
         result = []
         result += self.function.to_py()
         for argument in self.arguments:
@@ -573,14 +999,34 @@ class call(expression):
         ]
         return result
 
+    def to_py3(self):
+        result = self.function.bind.py3_inline_call(self)
+        if result is not None:
+            return result
+        return py3.node('Call', self.y,
+            func=self.function.to_py3(),
+            args=[argument.to_py3() for argument in self.arguments]
+        )
+
+    def to_closure(self, env):
+        result = self.function.bind.closure_inline_call(self, env)
+        if result is not None:
+            return result
+        arguments = [argument.to_closure(env) for argument in self.arguments]
+        return closures.call(self.function.bind.closure_cell, arguments)
+
     def to_x86_asm(self, env):
+        result = self.function.bind.x86_inline_call(self, env)
+        if result is not None:
+            return result
         result = []
         size = 0
         for argument in self.arguments[::-1]:
             result += argument.x86_asm_push(env)
             size += argument.x86_size()
-        result += 'call %s' % self.function.bind.x86_name,
+        result += x86.Instruction('call', self.function.bind.x86_name),
         result += x86.AddESP(size),
+        result += self.type.x86_asm_returned(env)
         return result
 
     def __str__(self):
@@ -602,6 +1048,12 @@ class cast(expression):
         else:
             return ()
 
+    def get_children(self):
+        return self.expression,
+
+    def transform(self, function):
+        self.expression = function(self.expression)
+
     def _validate(self):
         return self.expression.validate()
 
@@ -625,6 +1077,12 @@ class cast(expression):
         result += self.expression.py_cast_to(self.cast_type)
         return result
 
+    def to_py3(self):
+        return self.expression.type.py3_cast_to(self.cast_type, self.expression.to_py3())
+
+    def to_closure(self, env):
+        return self.expression.type.closure_cast_to(self.cast_type, self.expression.to_closure(env))
+
     def to_x86_asm(self, env):
         result = self.expression.to_x86_asm(env)
         result += self.expression.x86_asm_cast_to(self.cast_type, env)
@@ -662,6 +1120,13 @@ class assignment(expression):
         result += self.rvalue.get_var_refs()
         return result
 
+    def get_children(self):
+        return self.lvalue, self.rvalue
+
+    def transform(self, function):
+        self.lvalue = function(self.lvalue)
+        self.rvalue = function(self.rvalue)
+
     def check_var_usage(self, lsv, rsv):
         ok = self.rvalue.check_var_usage(lsv, rsv)
         lvar = self.lvalue.bind
@@ -672,6 +1137,18 @@ class assignment(expression):
     def to_py(self):
         return [(bp.SetLineno, self.y)] + self.lvalue.py_write(value=self.rvalue, pop=False)
 
+    def to_py3(self):
+        return self.lvalue.bind.py3_write(value=self.rvalue, pop=False)
+
+    def py3_evaluate(self):
+        return self.lvalue.bind.py3_write(value=self.rvalue, lineno=self.y)
+
+    def to_closure(self, env):
+        return self.lvalue.bind.closure_write(env, value=self.rvalue, pop=False)
+
+    def closure_evaluate(self, env):
+        return self.lvalue.bind.closure_write(env, value=self.rvalue)
+
     def to_x86_asm(self, env):
         return self.lvalue.x86_asm_write(self.rvalue, env)
 
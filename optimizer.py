@@ -0,0 +1,577 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Optimizations of checked Javalette syntax trees.'''
+
+import copy
+import operator
+
+import syntax
+import expression
+import builtins
+import type
+from type import int_t, double_t, boolean_t
+
+__all__ = ['optimize', 'user_functions', 'match_increment', 'make_call_graph', 'fold_constants', 'reduce_strength', 'specialize', 'merge_identical_functions', 'remove_unused_functions', 'clone_function', 'walk', 'rewrite']
+
+_int_min = -(1 << 31)
+_int_max = (1 << 31) - 1
+
+def walk(node):
+    '''Iterate over the node and all its descendants, in pre-order.'''
+    yield node
+    for child in node.get_children():
+        for subnode in walk(child):
+            yield subnode
+
+def rewrite(node, function):
+    '''Replace, bottom-up, every descendant of the node with the result of
+    'function' applied to it. Return the result of 'function' applied to the
+    node itself.'''
+    node.transform(lambda child: rewrite(child, function))
+    return function(node)
+
+def _const(value, position):
+    return expression.const(value, int_t, position)
+
+def _reference(var, position):
+    result = expression.reference(var.name, position)
+    result.bind = var
+    result.type = var.type
+    return result
+
+def _binary_operator(operator, left, right, position):
+    result = expression.binary_operator(operator, left, right, position)
+    result.type = left.type
+    return result
+
+def _increment(var, value, position):
+    rvalue = _binary_operator('+', _reference(var, position), value, position)
+    result = expression.assignment(_reference(var, position), rvalue, position)
+    result.type = var.type
+    return syntax.evaluation(result)
+
+def _is_int_const(node):
+    return isinstance(node, expression.const) and node.type == int_t
+
+def _is_reference(node, vars):
+    return isinstance(node, expression.reference) and node.bind in vars
+
+def match_increment(statement):
+    '''Match a 'v = v + c', 'v = c + v' or 'v = v - c' statement, where 'v' is
+    an int variable and 'c' is an int constant.
+    Return a (v, c) pair (with 'c' negated for subtraction) or None.'''
+    if not isinstance(statement, syntax.evaluation):
+        return
+    node = statement.expression
+    if not isinstance(node, expression.assignment):
+        return
+    var = node.lvalue.bind
+    value = node.rvalue
+    if var is None or var.type != int_t or not isinstance(value, expression.binary_operator):
+        return
+    left, right = value.left, value.right
+    if value.operator == '+' and _is_int_const(left):
+        left, right = right, left
+    if value.operator not in ('+', '-'):
+        return
+    if not (_is_reference(left, (var,)) and _is_int_const(right)):
+        return
+    step = right.value
+    if value.operator == '-':
+        step = -step
+    return var, step
+
+def _match_product(node, ivs, invariants):
+    '''Match a 'v * k' or 'k * v' expression, where 'v' is a basic induction
+    variable and 'k' is an int constant or a loop-invariant int variable.
+    Return a (v, k) pair, with 'k' being either a number or a variable; or None.'''
+    if not isinstance(node, expression.binary_operator):
+        return
+    if node.operator != '*' or node.type != int_t:
+        return
+    for iv, factor in (node.left, node.right), (node.right, node.left):
+        if not _is_reference(iv, ivs):
+            continue
+        if _is_int_const(factor):
+            return iv.bind, factor.value
+        if _is_reference(factor, invariants):
+            return iv.bind, factor.bind
+
+class _loop_info(object):
+
+    '''Facts about a single loop, needed to find its induction variables.'''
+
+    def __init__(self, loop, initialized):
+        self.assigned = {}
+        self.declared = set()
+        for node in walk(loop):
+            if isinstance(node, expression.assignment) and node.lvalue.bind is not None:
+                var = node.lvalue.bind
+                self.assigned[var] = self.assigned.get(var, 0) + 1
+            elif isinstance(node, syntax.variable):
+                self.declared.add(node)
+        self.initialized = initialized
+
+    def is_initialized(self, var):
+        return var in self.initialized or var.value is not None
+
+    def is_invariant(self, var):
+        return \
+            var.type == int_t and \
+            var not in self.assigned and \
+            var not in self.declared and \
+            self.is_initialized(var)
+
+def _reduce_loop(function, parent, loop, initialized, depth):
+    '''Perform strength reduction on the loop, which is a statement of the
+    parent block, and replace the loop with the result.
+    'initialized' is a set of variables that surely have a value when the loop
+    is entered.
+    Return whether the loop was transformed.'''
+    info = _loop_info(loop, initialized)
+    ivs = {}
+    for block in loop.finally_s, loop.then_s:
+        for statement in block.contents:
+            match = match_increment(statement)
+            if match is None:
+                continue
+            var, step = match
+            if info.assigned[var] != 1 or var in info.declared or not info.is_initialized(var):
+                continue
+            ivs[var] = block, statement, step
+    if not ivs:
+        return False
+    invariants = set()
+    for node in walk(loop):
+        if isinstance(node, expression.reference) and node.bind is not None and info.is_invariant(node.bind):
+            invariants.add(node.bind)
+    temps = {}
+    keys = []
+    def reduce(node):
+        match = _match_product(node, ivs, invariants)
+        if match is None:
+            return node
+        var, factor = match
+        step = ivs[var][2]
+        if isinstance(factor, syntax.variable):
+            name = factor.name
+        elif _int_min <= step * factor <= _int_max:
+            name = str(factor)
+        else:
+            return node
+        key = var, factor
+        if key not in temps:
+            # The value is computed before entering the loop, so the code is
+            # attributed to the loop itself rather than to the loop body:
+            position = loop.position
+            if isinstance(factor, syntax.variable):
+                factor_node = _reference(factor, position)
+            else:
+                factor_node = _const(factor, position)
+            init = _binary_operator('*', _reference(var, position), factor_node, position)
+            temps[key] = syntax.variable(int_t, '%s*%s' % (var.name, name), init, position)
+            keys.append(key)
+        return _reference(temps[key], node.position)
+    rewrite(loop, reduce)
+    if not temps:
+        return False
+    declarations = []
+    for key in keys:
+        var, factor = key
+        temp = temps[key]
+        block, statement, step = ivs[var]
+        position = statement.position
+        if isinstance(factor, syntax.variable):
+            if step == 1:
+                value = _reference(factor, position)
+            else:
+                # Compute the increment only once, before entering the loop:
+                increment = syntax.variable(int_t, '%s*%d' % (factor.name, step),
+                    _binary_operator('*', _reference(factor, loop.position), _const(step, loop.position), loop.position),
+                    loop.position
+                )
+                declarations += increment,
+                value = _reference(increment, position)
+        else:
+            value = _const(step * factor, position)
+        declarations += temp,
+        index = block.contents.index(statement)
+        block.contents.insert(index + 1, _increment(temp, value, position))
+    parent.contents[parent.contents.index(loop)] = syntax.block_statement([
+        syntax.declaration(declarations, loop.position),
+        loop
+    ])
+    if depth == 0:
+        # The temporaries are initialized only once, before the loop is
+        # entered, so their initial values don't need later updates:
+        initializers = [temps[key].value for key in keys]
+        _remove_dead_ivs(function, dict((var, ivs[var]) for var, factor in keys), initializers)
+    return True
+
+def _var_reads(node):
+    '''Iterate over references that read a variable in the node and all its
+    descendants. Targets of assignments are not included, but the same
+    reference node may also be an operand (as in 'i++').'''
+    if isinstance(node, expression.assignment):
+        children = [node.rvalue]
+    else:
+        if isinstance(node, expression.reference):
+            yield node
+        children = node.get_children()
+    for child in children:
+        for subnode in _var_reads(child):
+            yield subnode
+
+def _remove_dead_ivs(function, ivs, ignored):
+    '''Remove updates of induction variables that are not read anywhere else in
+    the function, except for the ignored nodes.'''
+    for var, (block, statement, step) in ivs.iteritems():
+        skipped = set(id(node) for node in walk(statement))
+        for node in ignored:
+            skipped.update(id(subnode) for subnode in walk(node))
+        for node in _var_reads(function):
+            if node.bind is var and id(node) not in skipped:
+                break
+        else:
+            block.contents.remove(statement)
+
+def _reduce_block(function, block, depth, initialized):
+    initialized = set(initialized)
+    n = 0
+    for i, statement in enumerate(block.contents):
+        if isinstance(statement, syntax.block):
+            n += _reduce_block(function, statement, depth, initialized)
+            continue
+        if isinstance(statement, (syntax.if_then_else, syntax.while_loop)):
+            # The condition is evaluated before any of the sub-blocks:
+            initialized.update(ref.bind for ref in statement.expression.get_var_refs())
+        is_loop = isinstance(statement, syntax.while_loop)
+        for subblock in statement.get_blocks():
+            n += _reduce_block(function, subblock, depth + is_loop, initialized)
+        if is_loop:
+            n += _reduce_loop(function, block, statement, initialized, depth)
+        elif isinstance(statement, syntax.evaluation) and isinstance(statement.expression, expression.assignment):
+            initialized.add(statement.expression.lvalue.bind)
+    return n
+
+def reduce_strength(function):
+    '''Find basic and derived induction variables in loops of the function.
+    Replace multiplications of induction variables with incremental additions.
+    Remove induction variables that became dead.
+    Return the number of transformed loops.'''
+    arguments = function.value.contents[0].variables
+    return _reduce_block(function, function.value, 0, arguments)
+
+_comparison_ops = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+_int_ops = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+}
+
+def _fold_binary_operator(node):
+    op = node.operator
+    left, right = node.left, node.right
+    if op in ('&&', '||'):
+        if not isinstance(left, expression.const):
+            return node
+        if left.value == (op == '||'):
+            return left
+        return right
+    if not (isinstance(left, expression.const) and isinstance(right, expression.const)):
+        return node
+    x, y = left.value, right.value
+    if op in _comparison_ops:
+        if left.type == boolean_t and op not in ('==', '!='):
+            return node
+        return expression.const(_comparison_ops[op](x, y), boolean_t, node.position)
+    if left.type != int_t:
+        # Double arithmetic is not folded: the x86 back-end computes with
+        # extended precision, so the results could differ.
+        return node
+    if op in _int_ops:
+        value = _int_ops[op](x, y)
+    elif op in ('/', '%') and x >= 0 and y > 0:
+        # The back-ends disagree on rounding of negative operands.
+        if op == '/':
+            value = x // y
+        else:
+            value = x % y
+    else:
+        return node
+    if not _int_min <= value <= _int_max:
+        return node
+    return _const(value, node.position)
+
+def _fold_unary_operator(node):
+    operand = node.left
+    if not isinstance(operand, expression.const):
+        return node
+    op = node.operator
+    if op == '+':
+        return operand
+    elif op == '!':
+        return expression.const(not operand.value, boolean_t, node.position)
+    elif op == '-' and operand.type == int_t and -operand.value <= _int_max:
+        return _const(-operand.value, node.position)
+    elif op == '-' and operand.type == double_t and operand.value != 0.0:
+        # -0.0 is not folded: the x86 back-end would produce +0.0.
+        return expression.const(-operand.value, double_t, node.position)
+    return node
+
+def _fold(node):
+    if isinstance(node, expression.binary_operator):
+        return _fold_binary_operator(node)
+    elif isinstance(node, expression.unary_operator):
+        return _fold_unary_operator(node)
+    elif isinstance(node, syntax.if_then_else) and isinstance(node.expression, expression.const):
+        if node.expression.value:
+            return node.then_s
+        else:
+            return node.else_s
+    elif isinstance(node, syntax.while_loop) and isinstance(node.expression, expression.const):
+        if not node.expression.value:
+            return syntax.block_statement([])
+    return node
+
+def fold_constants(function):
+    '''Evaluate operations on constants in the function.
+    Remove branches of conditional statements that are never taken.
+    Return the number of replaced nodes.'''
+    n = [0]
+    def fold(node):
+        result = _fold(node)
+        n[0] += result is not node
+        return result
+    rewrite(function.value, fold)
+    return n[0]
+
+def user_functions(program):
+    '''Return functions of the program that are not built-in.'''
+    return [function for function in program.contents if not isinstance(function, builtins.pdf_function)]
+
+def _calls(function):
+    '''Iterate over calls of user-defined functions, made in the function.'''
+    for node in walk(function.value):
+        if isinstance(node, expression.call) and not isinstance(node.function.bind, builtins.pdf_function):
+            yield node
+
+def make_call_graph(program):
+    '''Return a dictionary mapping functions of the program to lists of calls
+    made in them.'''
+    return dict(
+        (function, [node for node in walk(function.value) if isinstance(node, expression.call)])
+        for function in program.contents
+    )
+
+def _const_pattern(call):
+    '''Return a key describing constant arguments of the call.'''
+    return tuple(
+        (i, repr(argument.value))
+        for i, argument in enumerate(call.arguments)
+        if isinstance(argument, expression.const)
+    )
+
+def clone_function(program, function, name):
+    '''Return a copy of the function with a new name.
+    References to functions of the program (including the function itself)
+    are not copied.'''
+    memo = dict((id(item), item) for item in program.contents)
+    result = copy.copy(function)
+    result.name = name
+    result.value = copy.deepcopy(function.value, memo)
+    for node in walk(result.value):
+        if isinstance(node, syntax.statement):
+            node.bind_to_function(result)
+    return result
+
+def _specialize_function(program, function, consts, name):
+    '''Return a copy of the function, with arguments listed in 'consts' (a
+    dictionary mapping argument positions to constants) removed and replaced
+    with the constants.'''
+    clone = clone_function(program, function, name)
+    argv = clone.value.contents[0]
+    assigned = set(
+        node.lvalue.bind
+        for node in walk(clone.value)
+        if isinstance(node, expression.assignment)
+    )
+    arguments = []
+    locals = []
+    substitutions = {}
+    for i, var in enumerate(argv.variables):
+        if i not in consts:
+            arguments += var,
+        elif var in assigned:
+            var.value = expression.const(consts[i].value, consts[i].type, clone.position)
+            locals += var,
+        else:
+            substitutions[var] = consts[i]
+    def substitute(node):
+        if isinstance(node, expression.reference) and node.bind in substitutions:
+            const = substitutions[node.bind]
+            return expression.const(const.value, const.type, node.position)
+        return node
+    rewrite(clone.value, substitute)
+    argv.variables = arguments
+    if locals:
+        clone.value.contents.insert(1, syntax.declaration(locals, clone.position))
+    clone.type = type.function_type(function.type.return_type, [var.type for var in arguments])
+    fold_constants(clone)
+    return clone
+
+def specialize(program, budget=8, call_graph=None):
+    '''Clone functions for the most common patterns of constant arguments they
+    are called with, up to 'budget' clones. Propagate the constants into the
+    clones and retarget the matching calls.
+    Return the number of clones.'''
+    if call_graph is None:
+        call_graph = make_call_graph(program)
+    functions = user_functions(program)
+    counts = {}
+    sites = {}
+    for function in functions:
+        for call in call_graph[function]:
+            if isinstance(call.function.bind, builtins.pdf_function):
+                continue
+            pattern = _const_pattern(call)
+            if not pattern:
+                continue
+            key = call.function.bind, pattern
+            if key not in counts:
+                counts[key] = 0
+                sites[key] = len(sites), call
+            counts[key] += 1
+    keys = sorted(counts, key=lambda key: (-counts[key], sites[key][0]))[:budget]
+    clones = {}
+    for n, key in enumerate(keys):
+        function, pattern = key
+        call = sites[key][1]
+        consts = dict((i, call.arguments[i]) for i, value in pattern)
+        clone = _specialize_function(program, function, consts, '%s$%d' % (function.name, n + 1))
+        index = program.contents.index(function) + 1
+        while index < len(program.contents) and program.contents[index] in clones.values():
+            index += 1
+        program.contents.insert(index, clone)
+        clones[key] = clone
+    for function in functions + clones.values():
+        for call in _calls(function):
+            pattern = _const_pattern(call)
+            key = call.function.bind, pattern
+            if key not in clones:
+                continue
+            clone = clones[key]
+            positions = set(i for i, value in pattern)
+            call.arguments = [argument for i, argument in enumerate(call.arguments) if i not in positions]
+            call.function.bind = clone
+            call.function.ident = clone.name
+            call.function.type = clone.type
+    return len(clones)
+
+def remove_unused_functions(program, call_graph=None):
+    '''Remove functions (including built-in ones) that are not reachable from
+    main(). Return the number of removed functions.'''
+    if call_graph is None:
+        call_graph = make_call_graph(program)
+    main = [function for function in program.contents if function.name == 'main']
+    reachable = set(main)
+    pending = list(main)
+    while pending:
+        function = pending.pop()
+        for call in call_graph[function]:
+            callee = call.function.bind
+            if callee not in reachable:
+                reachable.add(callee)
+                pending += callee,
+    n = len(program.contents)
+    program.contents = [function for function in program.contents if function in reachable]
+    return n - len(program.contents)
+
+def _signature(function):
+    '''Return a key describing structure of the function body. Functions with
+    equal keys compute the same thing, although their names, variable names
+    and source positions may differ.'''
+    locals = {}
+    result = [str(function.type)]
+    for node in walk(function.value):
+        item = node.__class__.__name__, len(node.get_children())
+        if isinstance(node, syntax.variable):
+            locals[node] = len(locals)
+            item += str(node.type),
+        elif isinstance(node, expression.reference):
+            if node.bind is function:
+                item += 'self',
+            elif node.bind in locals:
+                item += locals[node.bind],
+            else:
+                item += 'function', id(node.bind)
+        elif isinstance(node, expression.const):
+            item += repr(node.value),
+        elif isinstance(node, (expression.binary_operator, expression.unary_operator)):
+            item += node.operator,
+        if isinstance(node, expression.expression):
+            item += str(node.type),
+        result += item,
+    return tuple(result)
+
+def merge_identical_functions(program):
+    '''Replace functions that have the same bodies as functions defined
+    earlier with the earlier ones. Return the number of removed functions.'''
+    n = len(program.contents)
+    while True:
+        replacements = {}
+        originals = {}
+        for function in user_functions(program):
+            if function.name == 'main':
+                continue
+            key = _signature(function)
+            if key in originals:
+                replacements[function] = originals[key]
+            else:
+                originals[key] = function
+        if not replacements:
+            break
+        program.contents = [function for function in program.contents if function not in replacements]
+        for function in user_functions(program):
+            for call in _calls(function):
+                original = replacements.get(call.function.bind)
+                if original is not None:
+                    call.function.bind = original
+                    call.function.ident = original.name
+    return n - len(program.contents)
+
+def optimize(program, level=2):
+    '''Optimize the checked program in place, running the default pipeline of
+    the optimization level.'''
+    import passes
+    return passes.pass_manager(passes.pipeline(level)).run(program)
+
+# vim:ts=4 sts=4 sw=4 et
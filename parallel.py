@@ -0,0 +1,154 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Parallel processing of functions of Javalette programs.
+
+Functions are split into contiguous chunks, which are handed to a pool of
+forked worker processes. The workers inherit the syntax tree from the main
+process, so only the results have to be sent back. Results are merged in the
+order of functions in the source.'''
+
+import marshal
+import multiprocessing
+import os
+import sys
+from cStringIO import StringIO
+
+import x86
+
+__all__ = ['lower', 'check_and_lower']
+
+# State inherited by the worker processes:
+_program = None
+_bound_names = None
+
+def _partition(n, chunks):
+    '''Split range(n) into (at most) 'chunks' contiguous ranges of similar
+    size. Return a list of (start, stop) pairs.'''
+    size, extra = divmod(n, chunks)
+    result = []
+    start = 0
+    for i in xrange(chunks):
+        stop = start + size + (i < extra)
+        if stop > start:
+            result += (start, stop),
+        start = stop
+    return result
+
+def _run(task):
+    function, args, start, stop = task
+    x86.label_prefix = '%x_' % os.getpid()
+    return [function(item, *args) for item in _program.contents[start:stop]]
+
+def _map(program, function, jobs, *args):
+    '''Apply the function to every item of the program in 'jobs' worker
+    processes. Return the list of results.'''
+    global _program, _bound_names
+    _program = program
+    if program.bind_names:
+        _bound_names = program.py_bound_names()
+    # More chunks than workers, so that the load is balanced even if the
+    # functions differ in size:
+    tasks = [(function, args, start, stop) for start, stop in _partition(len(program.contents), jobs * 4)]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        chunks = pool.map(_run, tasks, 1)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        _program = _bound_names = None
+    result = []
+    for chunk in chunks:
+        result += chunk
+    return result
+
+def _lower(function, target):
+    if target == 'P':
+        code = _program.py_body_to_pyc(function, _bound_names)
+        if _program.peephole:
+            import peephole
+            peephole.optimize(code)
+        return marshal.dumps(code.to_code())
+    elif target == 'P3':
+        return function.to_py3()
+    elif target == 'S':
+        return _program.py_source_lower(function)
+    elif target == 'X':
+        fragment = _program.x86_lower(function)
+        # A single string is much cheaper to send back than many short ones:
+        fragment.lines = ['\n'.join(fragment.lines)]
+        return fragment
+    else:
+        raise NotImplementedError()
+
+def _load(code, target):
+    if target == 'P':
+        return marshal.loads(code)
+    else:
+        return code
+
+def lower(program, target, jobs):
+    '''Generate code for functions of the checked program in 'jobs' worker
+    processes. Return the list of code objects (for the 'P' target), Python
+    ASTs (for the 'P3' and 'S' targets) or rendered x86 fragments (for the 'X'
+    target).'''
+    return [_load(code, target) for code in _map(program, _lower, jobs, target)]
+
+def _check_and_lower(function, target):
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        ok = function.validate()
+        messages = sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+    if ok:
+        code = _lower(function, target)
+    else:
+        code = None
+    return ok, messages, code
+
+def check_and_lower(program, target, jobs):
+    '''Validate functions of the program and generate code for them in 'jobs'
+    worker processes. Print error messages in the order of functions in the
+    source.
+    Return a pair: whether the program is valid, and the list as returned by
+    lower() (or None if the program is not valid).
+
+    Validation annotates the syntax tree with types, but these annotations
+    stay in the worker processes. Use lower() if the program is to be
+    transformed before generating code.'''
+    ok = True
+    lowered = []
+    for function_ok, messages, code in _map(program, _check_and_lower, jobs, target):
+        sys.stderr.write(messages)
+        ok &= function_ok
+        if ok:
+            lowered += _load(code, target),
+    if not ok:
+        lowered = None
+    return ok, lowered
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,104 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'programrightELSEASSIGN BOOLEAN COMMA DEC DIV DOUBLE ELSE EQUAL FOR GE GT IDENT IF INC INT LAND LBRACE LE LOR LPAREN LT MINUS MOD NOT NOTEQ PLUS RBRACE RETURN RPAREN SEMICOLON STRING TIMES TYPE WHILEprogram : fun_def_listfun_def_list :fun_def_list : fun_def_list fun_deffun_def : type IDENT LPAREN arg_list RPAREN complex_i\n            arg_list : arg_list_empty\n                     | arg_list_nonempty\n        arg_list_empty : arg : type IDENTarg_list_nonempty : argarg_list_nonempty : arg_list_nonempty COMMA arg\n            instr : complex_i\n                  | decl_i\n                  | cond_i\n                  | loop_i\n                  | return_i\n                  | expr_i\n        complex_i : LBRACE i_list RBRACEi_list :i_list : i_list instrdecl_i : type decl_list SEMICOLONdecl_list : decldecl_list : decl_list COMMA decldecl : IDENTdecl : IDENT ASSIGN exprassign_e : IDENT INCassign_e : IDENT DECcond_i : IF LPAREN expr RPAREN instr elseelse : ELSE instrelse :loop_i : WHILE LPAREN expr RPAREN instrloop_i : FOR LPAREN assign_e SEMICOLON expr SEMICOLON assign_e RPAREN instrreturn_i : RETURN SEMICOLONreturn_i : RETURN expr SEMICOLONexpr_i : expr SEMICOLONassign_e : IDENT ASSIGN expr\n            expr : assign_e\n            expr : or_e\n            or_e : and_e\n            and_e  : compare_e\n            compare_e : rel_e\n            rel_e : add_e\n            add_e : mul_e\n            mul_e : sa_e\n            sa_e : prefix_e\n            prefix_e : simple_e\n        \n            or_e : or_e LOR and_e\n            and_e : and_e LAND compare_e\n            compare_e : compare_e EQUAL rel_e\n                      | compare_e NOTEQ rel_e\n            rel_e : rel_e LT add_e\n                  | rel_e GT add_e\n                  | rel_e LE add_e\n                  | rel_e GE add_e\n            add_e : add_e PLUS mul_e\n                  | add_e MINUS mul_e\n            mul_e : mul_e TIMES sa_e\n                  | mul_e DIV sa_e\n                  | mul_e MOD sa_e\n\n        \n            sa_e : NOT sa_e\n                 | PLUS sa_e\n                 | MINUS sa_e\n        sa_e : LPAREN type RPAREN sa_eprefix_e : IDENT LPAREN expr_list RPARENprefix_e : IDENT LPAREN RPARENexpr_list : exprexpr_list : expr_list COMMA exprsimple_e : IDENTsimple_e : constsimple_e : LPAREN expr RPARENconst : INTconst : DOUBLEconst : BOOLEANconst : STRINGtype : TYPE'
+    
+_lr_action_items = {'RETURN':([18,19,23,33,36,39,44,45,47,53,54,84,86,93,114,120,121,124,126,127,129,130,131,],[-18,21,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,21,21,-30,-29,-27,21,-28,21,-31,]),'NOTEQ':([20,25,27,30,34,35,40,41,43,46,48,49,50,59,60,62,85,88,90,95,98,99,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-72,-67,-41,-68,74,-40,-70,-45,-42,-44,-67,-61,-60,-59,-69,74,-64,-54,-55,-49,-48,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'EQUAL':([20,25,27,30,34,35,40,41,43,46,48,49,50,59,60,62,85,88,90,95,98,99,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-72,-67,-41,-68,75,-40,-70,-45,-42,-44,-67,-61,-60,-59,-69,75,-64,-54,-55,-49,-48,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'LOR':([20,25,27,28,30,34,35,38,40,41,43,46,48,49,50,59,60,62,85,88,90,95,98,99,102,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-38,-72,-67,-41,73,-68,-39,-40,-70,-45,-42,-44,-67,-61,-60,-59,-69,-47,-64,-54,-55,-46,-49,-48,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'WHILE':([18,19,23,33,36,39,44,45,47,53,54,84,86,93,114,120,121,124,126,127,129,130,131,],[-18,24,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,24,24,-30,-29,-27,24,-28,24,-31,]),'IDENT':([4,5,11,18,19,21,22,23,26,31,32,33,36,39,44,45,47,52,53,54,58,61,66,68,70,71,72,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,92,93,114,118,119,120,121,124,125,126,127,129,130,131,],[-74,6,14,-18,34,34,34,-19,59,59,64,-14,-17,-12,-13,-16,-11,59,-15,-32,34,59,34,34,59,59,100,59,59,59,34,59,59,59,59,59,59,59,-34,-33,59,34,64,-20,34,34,34,34,-30,-29,100,-27,34,-28,34,-31,]),'DIV':([20,25,27,30,34,40,46,48,49,50,59,60,62,85,88,95,98,99,110,111,112,113,117,],[-71,-43,-73,-72,-67,-68,-70,-45,81,-44,-67,-61,-60,-59,-69,-64,81,81,-57,-58,-56,-62,-63,]),'DEC':([34,100,],[67,67,]),'MINUS':([18,19,20,21,22,23,25,26,27,30,31,33,34,35,36,39,40,44,45,46,47,48,49,50,52,53,54,58,59,60,61,62,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,85,86,87,88,91,93,95,98,99,106,107,108,109,110,111,112,113,114,117,118,119,120,121,124,126,127,129,130,131,],[-18,26,-71,26,26,-19,-43,26,-73,-72,26,-14,-67,71,-17,-12,-68,-13,-16,-70,-11,-45,-42,-44,26,-15,-32,26,-67,-61,26,-60,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,-34,-59,-33,26,-69,26,-20,-64,-54,-55,71,71,71,71,-57,-58,-56,-62,26,-63,26,26,26,-30,-29,-27,26,-28,26,-31,]),'STRING':([18,19,21,22,23,26,31,33,36,39,44,45,47,52,53,54,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,93,114,118,119,120,121,124,126,127,129,130,131,],[-18,27,27,27,-19,27,27,-14,-17,-12,-13,-16,-11,27,-15,-32,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,-34,-33,27,27,-20,27,27,27,27,-30,-29,-27,27,-28,27,-31,]),'LE':([20,25,27,30,34,35,40,43,46,48,49,50,59,60,62,85,88,95,98,99,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-72,-67,-41,-68,80,-70,-45,-42,-44,-67,-61,-60,-59,-69,-64,-54,-55,80,80,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'RPAREN':([4,7,8,9,10,12,14,16,20,25,27,28,29,30,34,35,38,40,41,43,46,48,49,50,56,57,59,60,62,66,67,69,85,88,89,90,94,95,96,97,98,99,102,103,104,105,106,107,108,109,110,111,112,113,117,122,128,],[-74,-7,-9,-5,-6,15,-8,-10,-71,-43,-73,-38,-36,-72,-67,-41,-37,-68,-39,-40,-70,-45,-42,-44,87,88,-67,-61,-60,95,-26,-25,-59,-69,114,-47,117,-64,-65,-35,-54,-55,-46,-49,-48,120,-51,-50,-53,-52,-57,-58,-56,-62,-63,-66,130,]),'SEMICOLON':([20,21,25,27,28,29,30,34,35,38,40,41,43,46,48,49,50,51,55,59,60,62,63,64,65,67,69,85,88,90,95,97,98,99,101,102,103,104,106,107,108,109,110,111,112,113,115,116,117,123,],[-71,54,-43,-73,-38,-36,-72,-67,-41,-37,-68,-39,-40,-70,-45,-42,-44,84,86,-67,-61,-60,-21,-23,93,-26,-25,-59,-69,-47,-64,-35,-54,-55,119,-46,-49,-48,-51,-50,-53,-52,-57,-58,-56,-62,-24,-22,-63,125,]),'LT':([20,25,27,30,34,35,40,43,46,48,49,50,59,60,62,85,88,95,98,99,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-72,-67,-41,-68,78,-70,-45,-42,-44,-67,-61,-60,-59,-69,-64,-54,-55,78,78,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'PLUS':([18,19,20,21,22,23,25,26,27,30,31,33,34,35,36,39,40,44,45,46,47,48,49,50,52,53,54,58,59,60,61,62,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,85,86,87,88,91,93,95,98,99,106,107,108,109,110,111,112,113,114,117,118,119,120,121,124,126,127,129,130,131,],[-18,31,-71,31,31,-19,-43,31,-73,-72,31,-14,-67,70,-17,-12,-68,-13,-16,-70,-11,-45,-42,-44,31,-15,-32,31,-67,-61,31,-60,31,31,31,31,31,31,31,31,31,31,31,31,31,31,31,-34,-59,-33,31,-69,31,-20,-64,-54,-55,70,70,70,70,-57,-58,-56,-62,31,-63,31,31,31,-30,-29,-27,31,-28,31,-31,]),'COMMA':([8,10,14,16,20,25,27,28,29,30,34,35,38,40,41,43,46,48,49,50,59,60,62,63,64,65,67,69,85,88,90,94,95,96,97,98,99,102,103,104,106,107,108,109,110,111,112,113,115,116,117,122,],[-9,13,-8,-10,-71,-43,-73,-38,-36,-72,-67,-41,-37,-68,-39,-40,-70,-45,-42,-44,-67,-61,-60,-21,-23,92,-26,-25,-59,-69,-47,118,-64,-65,-35,-54,-55,-46,-49,-48,-51,-50,-53,-52,-57,-58,-56,-62,-24,-22,-63,-66,]),'ASSIGN':([34,64,100,],[68,91,68,]),'$end':([0,1,2,3,17,36,],[-2,0,-1,-3,-4,-17,]),'GT':([20,25,27,30,34,35,40,43,46,48,49,50,59,60,62,85,88,95,98,99,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-72,-67,-41,-68,77,-70,-45,-42,-44,-67,-61,-60,-59,-69,-64,-54,-55,77,77,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'RBRACE':([18,19,23,33,36,39,44,45,47,53,54,84,86,93,121,124,126,129,131,],[-18,36,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,-30,-29,-27,-28,-31,]),'FOR':([18,19,23,33,36,39,44,45,47,53,54,84,86,93,114,120,121,124,126,127,129,130,131,],[-18,37,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,37,37,-30,-29,-27,37,-28,37,-31,]),'TIMES':([20,25,27,30,34,40,46,48,49,50,59,60,62,85,88,95,98,99,110,111,112,113,117,],[-71,-43,-73,-72,-67,-68,-70,-45,83,-44,-67,-61,-60,-59,-69,-64,83,83,-57,-58,-56,-62,-63,]),'GE':([20,25,27,30,34,35,40,43,46,48,49,50,59,60,62,85,88,95,98,99,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,-72,-67,-41,-68,79,-70,-45,-42,-44,-67,-61,-60,-59,-69,-64,-54,-55,79,79,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'LAND':([20,25,27,28,30,34,35,40,41,43,46,48,49,50,59,60,62,85,88,90,95,98,99,102,103,104,106,107,108,109,110,111,112,113,117,],[-71,-43,-73,61,-72,-67,-41,-68,-39,-40,-70,-45,-42,-44,-67,-61,-60,-59,-69,-47,-64,-54,-55,61,-49,-48,-51,-50,-53,-52,-57,-58,-56,-62,-63,]),'LPAREN':([6,18,19,21,22,23,24,26,31,33,34,36,37,39,42,44,45,47,52,53,54,58,59,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,93,114,118,119,120,121,124,126,127,129,130,131,],[7,-18,22,22,22,-19,58,22,22,-14,66,-17,72,-12,76,-13,-16,-11,22,-15,-32,22,66,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,-34,-33,22,22,-20,22,22,22,22,-30,-29,-27,22,-28,22,-31,]),'ELSE':([33,36,39,44,45,47,53,54,84,86,93,121,124,126,129,131,],[-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,-30,127,-27,-28,-31,]),'IF':([18,19,23,33,36,39,44,45,47,53,54,84,86,93,114,120,121,124,126,127,129,130,131,],[-18,42,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,42,42,-30,-29,-27,42,-28,42,-31,]),'LBRACE':([15,18,19,23,33,36,39,44,45,47,53,54,84,86,93,114,120,121,124,126,127,129,130,131,],[18,-18,18,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,18,18,-30,-29,-27,18,-28,18,-31,]),'INT':([18,19,21,22,23,26,31,33,36,39,44,45,47,52,53,54,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,93,114,118,119,120,121,124,126,127,129,130,131,],[-18,46,46,46,-19,46,46,-14,-17,-12,-13,-16,-11,46,-15,-32,46,46,46,46,46,46,46,46,46,46,46,46,46,46,46,46,46,-34,-33,46,46,-20,46,46,46,46,-30,-29,-27,46,-28,46,-31,]),'DOUBLE':([18,19,21,22,23,26,31,33,36,39,44,45,47,52,53,54,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,93,114,118,119,120,121,124,126,127,129,130,131,],[-18,20,20,20,-19,20,20,-14,-17,-12,-13,-16,-11,20,-15,-32,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,-34,-33,20,20,-20,20,20,20,20,-30,-29,-27,20,-28,20,-31,]),'BOOLEAN':([18,19,21,22,23,26,31,33,36,39,44,45,47,52,53,54,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,93,114,118,119,120,121,124,126,127,129,130,131,],[-18,30,30,30,-19,30,30,-14,-17,-12,-13,-16,-11,30,-15,-32,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,30,-34,-33,30,30,-20,30,30,30,30,-30,-29,-27,30,-28,30,-31,]),'NOT':([18,19,21,22,23,26,31,33,36,39,44,45,47,52,53,54,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,84,86,87,91,93,114,118,119,120,121,124,126,127,129,130,131,],[-18,52,52,52,-19,52,52,-14,-17,-12,-13,-16,-11,52,-15,-32,52,52,52,52,52,52,52,52,52,52,52,52,52,52,52,52,52,-34,-33,52,52,-20,52,52,52,52,-30,-29,-27,52,-28,52,-31,]),'INC':([34,100,],[69,69,]),'TYPE':([0,2,3,7,13,17,18,19,22,23,33,36,39,44,45,47,53,54,84,86,93,114,120,121,124,126,127,129,130,131,],[-2,4,-3,4,4,-4,-18,4,4,-19,-14,-17,-12,-13,-16,-11,-15,-32,-34,-33,-20,4,4,-30,-29,-27,4,-28,4,-31,]),'MOD':([20,25,27,30,34,40,46,48,49,50,59,60,62,85,88,95,98,99,110,111,112,113,117,],[-71,-43,-73,-72,-67,-68,-70,-45,82,-44,-67,-61,-60,-59,-69,-64,82,82,-57,-58,-56,-62,-63,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'decl':([32,92,],[63,116,]),'sa_e':([19,21,22,26,31,52,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,87,91,114,118,119,120,127,130,],[25,25,25,60,62,85,25,25,25,25,25,25,25,25,25,25,25,25,25,25,110,111,112,113,25,25,25,25,25,25,25,]),'instr':([19,114,120,127,130,],[23,121,124,129,131,]),'expr_list':([66,],[94,]),'arg':([7,13,],[8,16,]),'prefix_e':([19,21,22,26,31,52,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,87,91,114,118,119,120,127,130,],[50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,50,]),'and_e':([19,21,22,58,66,68,73,76,91,114,118,119,120,127,130,],[28,28,28,28,28,28,102,28,28,28,28,28,28,28,28,]),'const':([19,21,22,26,31,52,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,87,91,114,118,119,120,127,130,],[40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,40,]),'assign_e':([19,21,22,58,66,68,72,76,91,114,118,119,120,125,127,130,],[29,29,29,29,29,29,101,29,29,29,29,29,29,128,29,29,]),'arg_list_empty':([7,],[9,]),'program':([0,],[1,]),'arg_list_nonempty':([7,],[10,]),'type':([2,7,13,19,22,114,120,127,130,],[5,11,11,32,56,32,32,32,32,]),'loop_i':([19,114,120,127,130,],[33,33,33,33,33,]),'add_e':([19,21,22,58,61,66,68,73,74,75,76,77,78,79,80,91,114,118,119,120,127,130,],[35,35,35,35,35,35,35,35,35,35,35,106,107,108,109,35,35,35,35,35,35,35,]),'or_e':([19,21,22,58,66,68,76,91,114,118,119,120,127,130,],[38,38,38,38,38,38,38,38,38,38,38,38,38,38,]),'fun_def_list':([0,],[2,]),'else':([124,],[126,]),'decl_i':([19,114,120,127,130,],[39,39,39,39,39,]),'compare_e':([19,21,22,58,61,66,68,73,76,91,114,118,119,120,127,130,],[41,41,41,41,90,41,41,41,41,41,41,41,41,41,41,41,]),'rel_e':([19,21,22,58,61,66,68,73,74,75,76,91,114,118,119,120,127,130,],[43,43,43,43,43,43,43,43,103,104,43,43,43,43,43,43,43,43,]),'cond_i':([19,114,120,127,130,],[44,44,44,44,44,]),'expr_i':([19,114,120,127,130,],[45,45,45,45,45,]),'complex_i':([15,19,114,120,127,130,],[17,47,47,47,47,47,]),'i_list':([18,],[19,]),'fun_def':([2,],[3,]),'decl_list':([32,],[65,]),'simple_e':([19,21,22,26,31,52,58,61,66,68,70,71,73,74,75,76,77,78,79,80,81,82,83,87,91,114,118,119,120,127,130,],[48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,48,]),'mul_e':([19,21,22,58,61,66,68,70,71,73,74,75,76,77,78,79,80,91,114,118,119,120,127,130,],[49,49,49,49,49,49,49,98,99,49,49,49,49,49,49,49,49,49,49,49,49,49,49,49,]),'expr':([19,21,22,58,66,68,76,91,114,118,119,120,127,130,],[51,55,57,89,96,97,105,115,51,122,123,51,51,51,]),'arg_list':([7,],[12,]),'return_i':([19,114,120,127,130,],[53,53,53,53,53,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> program","S'",1,None,None,None),
+  ('program -> fun_def_list','program',1,'p_program','parser.py',46),
+  ('fun_def_list -> <empty>','fun_def_list',0,'p_fun_def_list_empty','parser.py',50),
+  ('fun_def_list -> fun_def_list fun_def','fun_def_list',2,'p_fun_def_list_nonempty','parser.py',54),
+  ('fun_def -> type IDENT LPAREN arg_list RPAREN complex_i','fun_def',6,'p_fun_def','parser.py',59),
+  ('arg_list -> arg_list_empty','arg_list',1,'p_arg_list','parser.py',64),
+  ('arg_list -> arg_list_nonempty','arg_list',1,'p_arg_list','parser.py',65),
+  ('arg_list_empty -> <empty>','arg_list_empty',0,'p_arg_list_empty','parser.py',70),
+  ('arg -> type IDENT','arg',2,'p_arg','parser.py',74),
+  ('arg_list_nonempty -> arg','arg_list_nonempty',1,'p_arg_list_single','parser.py',78),
+  ('arg_list_nonempty -> arg_list_nonempty COMMA arg','arg_list_nonempty',3,'p_arg_list_nonempty','parser.py',82),
+  ('instr -> complex_i','instr',1,'p_instr','parser.py',88),
+  ('instr -> decl_i','instr',1,'p_instr','parser.py',89),
+  ('instr -> cond_i','instr',1,'p_instr','parser.py',90),
+  ('instr -> loop_i','instr',1,'p_instr','parser.py',91),
+  ('instr -> return_i','instr',1,'p_instr','parser.py',92),
+  ('instr -> expr_i','instr',1,'p_instr','parser.py',93),
+  ('complex_i -> LBRACE i_list RBRACE','complex_i',3,'p_complex_i','parser.py',98),
+  ('i_list -> <empty>','i_list',0,'p_i_list_empty','parser.py',102),
+  ('i_list -> i_list instr','i_list',2,'p_i_list_nonempty','parser.py',106),
+  ('decl_i -> type decl_list SEMICOLON','decl_i',3,'p_decl_i','parser.py',111),
+  ('decl_list -> decl','decl_list',1,'p_decl_list_single','parser.py',117),
+  ('decl_list -> decl_list COMMA decl','decl_list',3,'p_decl_list_multiple','parser.py',121),
+  ('decl -> IDENT','decl',1,'p_decl','parser.py',126),
+  ('decl -> IDENT ASSIGN expr','decl',3,'p_decl_value','parser.py',130),
+  ('assign_e -> IDENT INC','assign_e',2,'p_inc','parser.py',134),
+  ('assign_e -> IDENT DEC','assign_e',2,'p_dec','parser.py',139),
+  ('cond_i -> IF LPAREN expr RPAREN instr else','cond_i',6,'p_if','parser.py',144),
+  ('else -> ELSE instr','else',2,'p_else','parser.py',148),
+  ('else -> <empty>','else',0,'p_no_else','parser.py',152),
+  ('loop_i -> WHILE LPAREN expr RPAREN instr','loop_i',5,'p_while','parser.py',156),
+  ('loop_i -> FOR LPAREN assign_e SEMICOLON expr SEMICOLON assign_e RPAREN instr','loop_i',9,'p_for','parser.py',160),
+  ('return_i -> RETURN SEMICOLON','return_i',2,'p_return_void','parser.py',168),
+  ('return_i -> RETURN expr SEMICOLON','return_i',3,'p_return_value','parser.py',172),
+  ('expr_i -> expr SEMICOLON','expr_i',2,'p_expr_i','parser.py',176),
+  ('assign_e -> IDENT ASSIGN expr','assign_e',3,'p_assign_e','parser.py',180),
+  ('expr -> assign_e','expr',1,'p_e_pass','parser.py',185),
+  ('expr -> or_e','expr',1,'p_e_pass','parser.py',186),
+  ('or_e -> and_e','or_e',1,'p_e_pass','parser.py',187),
+  ('and_e -> compare_e','and_e',1,'p_e_pass','parser.py',188),
+  ('compare_e -> rel_e','compare_e',1,'p_e_pass','parser.py',189),
+  ('rel_e -> add_e','rel_e',1,'p_e_pass','parser.py',190),
+  ('add_e -> mul_e','add_e',1,'p_e_pass','parser.py',191),
+  ('mul_e -> sa_e','mul_e',1,'p_e_pass','parser.py',192),
+  ('sa_e -> prefix_e','sa_e',1,'p_e_pass','parser.py',193),
+  ('prefix_e -> simple_e','prefix_e',1,'p_e_pass','parser.py',194),
+  ('or_e -> or_e LOR and_e','or_e',3,'p_binary_e','parser.py',200),
+  ('and_e -> and_e LAND compare_e','and_e',3,'p_binary_e','parser.py',201),
+  ('compare_e -> compare_e EQUAL rel_e','compare_e',3,'p_binary_e','parser.py',202),
+  ('compare_e -> compare_e NOTEQ rel_e','compare_e',3,'p_binary_e','parser.py',203),
+  ('rel_e -> rel_e LT add_e','rel_e',3,'p_binary_e','parser.py',204),
+  ('rel_e -> rel_e GT add_e','rel_e',3,'p_binary_e','parser.py',205),
+  ('rel_e -> rel_e LE add_e','rel_e',3,'p_binary_e','parser.py',206),
+  ('rel_e -> rel_e GE add_e','rel_e',3,'p_binary_e','parser.py',207),
+  ('add_e -> add_e PLUS mul_e','add_e',3,'p_binary_e','parser.py',208),
+  ('add_e -> add_e MINUS mul_e','add_e',3,'p_binary_e','parser.py',209),
+  ('mul_e -> mul_e TIMES sa_e','mul_e',3,'p_binary_e','parser.py',210),
+  ('mul_e -> mul_e DIV sa_e','mul_e',3,'p_binary_e','parser.py',211),
+  ('mul_e -> mul_e MOD sa_e','mul_e',3,'p_binary_e','parser.py',212),
+  ('sa_e -> NOT sa_e','sa_e',2,'p_sa_e','parser.py',219),
+  ('sa_e -> PLUS sa_e','sa_e',2,'p_sa_e','parser.py',220),
+  ('sa_e -> MINUS sa_e','sa_e',2,'p_sa_e','parser.py',221),
+  ('sa_e -> LPAREN type RPAREN sa_e','sa_e',4,'p_cast_e','parser.py',226),
+  ('prefix_e -> IDENT LPAREN expr_list RPAREN','prefix_e',4,'p_call_e','parser.py',230),
+  ('prefix_e -> IDENT LPAREN RPAREN','prefix_e',3,'p_call_e_noargs','parser.py',234),
+  ('expr_list -> expr','expr_list',1,'p_expr_list_single','parser.py',238),
+  ('expr_list -> expr_list COMMA expr','expr_list',3,'p_expr_list_multiple','parser.py',242),
+  ('simple_e -> IDENT','simple_e',1,'p_ident_e','parser.py',247),
+  ('simple_e -> const','simple_e',1,'p_const_e','parser.py',251),
+  ('simple_e -> LPAREN expr RPAREN','simple_e',3,'p_paren_e','parser.py',255),
+  ('const -> INT','const',1,'p_const_int','parser.py',259),
+  ('const -> DOUBLE','const',1,'p_const_double','parser.py',263),
+  ('const -> BOOLEAN','const',1,'p_const_boolean','parser.py',267),
+  ('const -> STRING','const',1,'p_const_string','parser.py',271),
+  ('type -> TYPE','type',1,'p_type','parser.py',275),
+]
@@ -0,0 +1,183 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Pass manager for optimizations of checked Javalette syntax trees.'''
+
+import syntax
+import expression
+import optimizer
+from error import JtError
+
+__all__ = ['pass_manager', 'pipeline', 'verify', 'analyses', 'passes', 'codegen_passes', 'levels', 'VerificationError']
+
+class analysis(object):
+
+    '''An analysis of the whole program.
+    Its result is cached until a transformation reports changes.'''
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+
+class transformation(object):
+
+    '''A transformation of the program (or, if 'per_function' is true, of
+    every user-defined function separately).
+    The function implementing it returns the number of changes it made.
+    Results of analyses listed in 'requires' are passed to it as keyword
+    arguments.'''
+
+    def __init__(self, name, function, requires=(), per_function=False):
+        self.name = name
+        self.function = function
+        self.requires = requires
+        self.per_function = per_function
+
+analyses = dict((item.name, item) for item in [
+    analysis('call-graph', optimizer.make_call_graph),
+])
+
+_passes = [
+    transformation('specialize', optimizer.specialize, requires=['call-graph']),
+    transformation('fold-constants', optimizer.fold_constants, per_function=True),
+    transformation('reduce-strength', optimizer.reduce_strength, per_function=True),
+    transformation('merge-functions', optimizer.merge_identical_functions),
+    transformation('remove-unused-functions', optimizer.remove_unused_functions, requires=['call-graph']),
+]
+passes = dict((item.name, item) for item in _passes)
+
+# Passes that are run by the back-ends while generating code, rather than by
+# the pass manager:
+codegen_passes = ['bind-names', 'allocate-locals', 'buffer-io', 'lazy-load', 'peephole', 'allocate-registers', 'sse2']
+
+levels = {
+    0: [],
+    1: ['fold-constants', 'merge-functions', 'remove-unused-functions', 'bind-names', 'allocate-locals', 'buffer-io', 'peephole', 'allocate-registers'],
+    # Lazy loading pays off only for large programs, and SSE2 isn't available
+    # on every i386 CPU, so neither is ever enabled by default:
+    2: [item.name for item in _passes] + [name for name in codegen_passes if name not in ('lazy-load', 'sse2')],
+}
+
+def pipeline(level, enabled=(), disabled=()):
+    '''Return the list of names of passes to run at the optimization level.
+    Passes listed in 'enabled' are added to it; passes listed in 'disabled' are
+    removed from it. Passes are always run in the canonical order.'''
+    for name in list(enabled) + list(disabled):
+        if name not in passes and name not in codegen_passes:
+            raise KeyError(name)
+    selected = set(levels[level]) | set(enabled)
+    selected -= set(disabled)
+    return [name for name in [item.name for item in _passes] + codegen_passes if name in selected]
+
+class VerificationError(JtError):
+    pass
+
+def _verify_function(program, function, functions):
+    variables = set()
+    for node in optimizer.walk(function.value):
+        if isinstance(node, syntax.variable):
+            variables.add(node)
+        elif isinstance(node, syntax.return_statement) and node.function is not function:
+            raise VerificationError(node.position, "Return statement bound to a wrong function")
+    for node in optimizer.walk(function.value):
+        if isinstance(node, expression.reference):
+            if isinstance(node.bind, syntax.function):
+                if node.bind not in functions:
+                    raise VerificationError(node.position, "Reference to a removed function '%s'" % node.ident)
+            elif node.bind not in variables:
+                raise VerificationError(node.position, "Reference to an undeclared variable '%s'" % node.ident)
+        elif isinstance(node, expression.call):
+            callee_type = node.function.bind.type
+            if [argument.type for argument in node.arguments] != list(callee_type.arg_type_list):
+                raise VerificationError(node.position, "Arguments do not match type of function '%s'" % node.function.ident)
+            if node.type != callee_type.return_type:
+                raise VerificationError(node.position, "Wrong return type of call of function '%s'" % node.function.ident)
+
+def verify(program):
+    '''Check if bindings and types in the program are consistent.
+    Raise VerificationError if they are not.'''
+    functions = set(program.contents)
+    names = set()
+    for function in program.contents:
+        if function.name in names:
+            raise VerificationError(function.position, "Redefinition of function '%s'" % function.name)
+        names.add(function.name)
+    if 'main' not in names:
+        raise VerificationError(None, "Missing function 'main'")
+    for function in optimizer.user_functions(program):
+        _verify_function(program, function, functions)
+    if not program.validate():
+        raise VerificationError(None, 'Validation failed')
+
+class pass_manager(object):
+
+    '''Runs a pipeline of transformations, caching results of analyses.'''
+
+    def __init__(self, names, verify_each=False):
+        self.pipeline = [passes[name] for name in names if name in passes]
+        self.verify_each = verify_each
+        self._cache = {}
+
+    def get_analysis(self, name, program):
+        '''Return result of the analysis, computing it if needed.'''
+        if name not in self._cache:
+            self._cache[name] = analyses[name].function(program)
+        return self._cache[name]
+
+    def invalidate(self):
+        '''Forget results of all analyses.'''
+        self._cache.clear()
+
+    def _run_pass(self, item, program):
+        if item.per_function:
+            units = optimizer.user_functions(program)
+        else:
+            units = [program]
+        n = 0
+        for unit in units:
+            kwargs = dict(
+                (name.replace('-', '_'), self.get_analysis(name, program))
+                for name in item.requires
+            )
+            changes = item.function(unit, **kwargs)
+            if changes:
+                self.invalidate()
+                n += changes
+        return n
+
+    def run(self, program):
+        '''Run the pipeline over the program, in place.
+        Return a dictionary mapping names of passes to numbers of changes they
+        made.'''
+        if self.verify_each:
+            verify(program)
+        result = {}
+        for item in self.pipeline:
+            result[item.name] = self._run_pass(item, program)
+            if self.verify_each:
+                try:
+                    verify(program)
+                except VerificationError, error:
+                    raise VerificationError(None, "Pass '%s' broke the program: %s" % (item.name, error))
+        return result
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,175 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Peephole optimizer for Python bytecode listings.'''
+
+import bp
+
+__all__ = ['optimize', 'count']
+
+_unconditional_jumps = frozenset([bp.JUMP_ABSOLUTE, bp.JUMP_FORWARD])
+_terminators = _unconditional_jumps | frozenset([bp.RETURN_VALUE, bp.RAISE_VARARGS])
+_stores = frozenset([bp.STORE_FAST, bp.STORE_GLOBAL, bp.STORE_NAME])
+_short_tails = frozenset([bp.LOAD_CONST, bp.LOAD_FAST])
+
+def _is_label(op):
+    return isinstance(op, bp.Label)
+
+def _next_instruction(listing, i):
+    '''Return index of the first instruction at or after position i, skipping
+    labels and line markers.'''
+    while i < len(listing) and not bp.isopcode(listing[i][0]):
+        i += 1
+    return i
+
+def _tail(listing, i):
+    '''If the code at position i returns immediately (possibly after loading
+    a variable or a constant), return the instructions that do it.'''
+    i = _next_instruction(listing, i)
+    if i < len(listing) and listing[i][0] == bp.RETURN_VALUE:
+        return listing[i:i + 1]
+    if i < len(listing) and listing[i][0] in _short_tails:
+        j = _next_instruction(listing, i + 1)
+        if j < len(listing) and listing[j][0] == bp.RETURN_VALUE:
+            return [listing[i], listing[j]]
+
+def _thread_jump(listing, labels, i):
+    '''Follow the chain of unconditional jumps starting at the target of the
+    jump at position i. Return the final label.'''
+    op, label = listing[i]
+    seen = set([label])
+    while True:
+        j = _next_instruction(listing, labels[label])
+        if j >= len(listing) or listing[j][0] not in _unconditional_jumps:
+            return label
+        target = listing[j][1]
+        if target in seen:
+            # An infinite loop; leave it alone.
+            return label
+        if op in bp.hasjrel and op != bp.JUMP_FORWARD and labels[target] <= i:
+            # Other relative jumps cannot go backwards.
+            return label
+        seen.add(target)
+        label = target
+
+def _sweep(listing):
+    '''Apply every rule once. Return the new listing and whether anything
+    changed.'''
+    labels = {}
+    referenced = set()
+    for i, (op, arg) in enumerate(listing):
+        if _is_label(op):
+            labels[op] = i
+        elif op in bp.hasjump:
+            referenced.add(arg)
+    result = []
+    changed = False
+    i = 0
+    n = len(listing)
+    while i < n:
+        op, arg = listing[i]
+        if _is_label(op) and op not in referenced:
+            # Unused label:
+            changed = True
+            i += 1
+            continue
+        if result and result[-1][0] in _terminators and not _is_label(op):
+            # Dead code:
+            changed = True
+            i += 1
+            continue
+        if op == bp.DUP_TOP and i + 2 < n and listing[i + 1][0] in _stores and listing[i + 2][0] == bp.POP_TOP:
+            # DUP_TOP; STORE_xxx; POP_TOP -> STORE_xxx
+            result += listing[i + 1],
+            changed = True
+            i += 3
+            continue
+        if op == bp.LOAD_CONST and i + 1 < n and listing[i + 1][0] == bp.POP_TOP:
+            # LOAD_CONST; POP_TOP -> (nothing)
+            changed = True
+            i += 2
+            continue
+        if op in bp.hasjump:
+            label = _thread_jump(listing, labels, i)
+            if label is not arg:
+                if op == bp.JUMP_FORWARD and labels[label] <= i:
+                    op = bp.JUMP_ABSOLUTE
+                arg = label
+                changed = True
+        if op in _unconditional_jumps:
+            if _next_instruction(listing, labels[arg]) == _next_instruction(listing, i + 1):
+                # A jump to the next instruction:
+                changed = True
+                i += 1
+                continue
+            tail = _tail(listing, labels[arg])
+            if tail is not None:
+                # A jump to a return:
+                result += tail
+                changed = True
+                i += 1
+                continue
+        result += (op, arg),
+        i += 1
+    return result, changed
+
+def _merge_line_markers(listing, lineno):
+    '''Remove line markers that are immediately overridden by another line
+    marker, or that do not change the current line number.'''
+    result = []
+    pending = None
+    for op, arg in listing:
+        if op is bp.SetLineno:
+            pending = arg
+            continue
+        if pending is not None and bp.isopcode(op):
+            if pending != lineno:
+                result += (bp.SetLineno, pending),
+                lineno = pending
+            pending = None
+        result += (op, arg),
+    return result
+
+def optimize(code):
+    '''Optimize the listing of the code object (a bp.Code), and of every code
+    object nested in it, in place.'''
+    listing = code.code
+    changed = True
+    while changed:
+        listing, changed = _sweep(listing)
+    code.code[:] = _merge_line_markers(listing, code.firstlineno)
+    for op, arg in code.code:
+        if isinstance(arg, bp.Code):
+            optimize(arg)
+
+def count(code):
+    '''Return the number of instructions in the code object (a bp.Code), and
+    in every code object nested in it.'''
+    n = 0
+    for op, arg in code.code:
+        if bp.isopcode(op):
+            n += 1
+        if isinstance(arg, bp.Code):
+            n += count(arg)
+    return n
+
+# vim:ts=4 sts=4 sw=4 et
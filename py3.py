@@ -0,0 +1,180 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Python 3 code generation.
+
+The compiler runs on Python 2, so it can't build Python 3 code objects by
+itself. Instead, syntax trees are lowered to (version-neutral) Python abstract
+syntax trees, which are then compiled by the target Python 3 interpreter, so
+that the result has the right header, wordcode and opcodes for it.
+
+A Python AST node is represented by a (class name, line number, fields) tuple.
+Line number can be None, in which case it is inherited from the parent node.
+Fields that are not provided default to None, or to [] for list fields.
+
+This module is also a script that is run by the Python 3 interpreter: it reads
+the module to compile from stdin and writes the bytecode file to stdout.'''
+
+import os
+import sys
+
+__all__ = ['node', 'name', 'call', 'constant', 'assign', 'function_name', 'compile_pyc']
+
+def node(_name, _lineno=None, **fields):
+    '''Create a Python AST node.'''
+    return (_name, _lineno, fields)
+
+def name(ident, store=False):
+    '''Create a node for a variable reference.'''
+    return node('Name', id=ident, ctx=node(store and 'Store' or 'Load'))
+
+def call(function, args, lineno=None):
+    '''Create a node for a call of the function with the provided name.'''
+    return node('Call', lineno, func=name(function), args=args)
+
+def constant(value):
+    '''Create a node for a constant.'''
+    return node('Constant', value=value)
+
+def assign(target, value, lineno=None):
+    '''Create a node for an assignment statement.'''
+    return node('Assign', lineno, targets=[name(target, store=True)], value=value)
+
+# Identifiers which can't be bound in Python 3, even in a generated AST:
+_reserved_names = set(('None', 'True', 'False', '__debug__'))
+
+def function_name(ident):
+    '''Return the Python name for a function with the provided identifier.'''
+    if ident in _reserved_names:
+        # The prefix can't appear in a Javalette identifier:
+        return '*' + ident
+    return ident
+
+def _dump(obj):
+    '''Serialize a Python AST to a Python literal. Unlike repr(), this does
+    not produce Python 2-specific syntax, such as long integer suffixes.'''
+    if isinstance(obj, tuple):
+        if len(obj) == 1:
+            return '(%s,)' % _dump(obj[0])
+        return '(%s)' % ', '.join(_dump(item) for item in obj)
+    elif isinstance(obj, list):
+        return '[%s]' % ', '.join(_dump(item) for item in obj)
+    elif isinstance(obj, dict):
+        return '{%s}' % ', '.join('%s: %s' % (_dump(key), _dump(value)) for key, value in sorted(obj.items()))
+    elif isinstance(obj, bool) or obj is None:
+        return repr(obj)
+    elif isinstance(obj, (int, long)):
+        return str(obj)
+    elif isinstance(obj, float):
+        # Non-finite numbers have no literal syntax, and the code generator
+        # must not produce them:
+        assert obj - obj == 0
+        return repr(obj)
+    elif isinstance(obj, str):
+        return repr(obj.decode('UTF-8', 'replace'))
+    elif isinstance(obj, unicode):
+        return repr(obj)
+    raise TypeError(obj)
+
+def interpreter():
+    '''Return the command name of the target Python 3 interpreter.'''
+    return os.getenv('PYTHON3') or 'python3'
+
+def compile_pyc(module, runtime, filename, runtime_filename, output_file):
+    '''Compile the module (a list of Python AST statements) into a Python 3
+    bytecode file. 'runtime' is the source code of the run-time support
+    module, which is executed before the module.'''
+    import subprocess as ipc
+    data = _dump((module, runtime, filename, runtime_filename))
+    # Don't let an unrelated PYTHONPATH break the compiler script:
+    child = ipc.Popen(
+        [interpreter(), '-E', '-S', os.path.abspath(__file__.replace('.pyc', '.py'))],
+        stdin=ipc.PIPE, stdout=ipc.PIPE
+    )
+    pyc, _ = child.communicate(data)
+    if child.returncode != 0:
+        raise Python3Error(None, '%s failed to compile the program' % interpreter())
+    output_file.write(pyc)
+
+# The rest of this module runs on Python 3.
+
+_list_fields = frozenset(['args', 'body', 'comparators', 'decorator_list', 'defaults', 'elts', 'keywords', 'kw_defaults', 'kwonlyargs', 'ops', 'orelse', 'posonlyargs', 'targets', 'type_ignores', 'type_params', 'values'])
+
+def _build(obj, lineno):
+    '''Build the Python AST from the representation.'''
+    import ast
+    if isinstance(obj, list):
+        return [_build(item, lineno) for item in obj]
+    if not isinstance(obj, tuple) or len(obj) != 3 or not isinstance(obj[2], dict):
+        return obj
+    name, node_lineno, fields = obj
+    cls = getattr(ast, name)
+    if node_lineno is not None:
+        lineno = node_lineno
+    kwargs = {}
+    for field in cls._fields:
+        if field in fields:
+            value = _build(fields[field], lineno)
+        elif field in _list_fields:
+            value = []
+        else:
+            value = None
+        kwargs[field] = value
+    result = cls(**kwargs)
+    if 'lineno' in cls._attributes:
+        result.lineno = result.end_lineno = lineno
+        # There is no Python source, so there are no meaningful columns:
+        result.col_offset = result.end_col_offset = -1
+    return result
+
+def _main():
+    import ast
+    import importlib.util
+    import marshal
+    data = sys.stdin.read()
+    module, runtime, filename, runtime_filename = ast.literal_eval(data)
+    runtime = compile(runtime, runtime_filename, 'exec')
+    # The runtime support code is kept in a separate code object, so that it
+    # doesn't mess up line numbers of the program:
+    stub = ast.parse('exec(__import__("marshal").loads(...), globals())').body
+    stub[0].value.args[0].args[0] = ast.Constant(marshal.dumps(runtime))
+    body = stub + _build(module, 1)
+    tree = ast.Module(body=body, type_ignores=[])
+    ast.fix_missing_locations(tree)
+    code = compile(tree, filename, 'exec', dont_inherit=True)
+    output = sys.stdout.buffer
+    output.write(importlib.util.MAGIC_NUMBER)
+    # Flags, and modification time and size of the source. There is no
+    # source, and they are not checked when the file is run directly:
+    output.write(b'\0\0\0\0' * 3)
+    marshal.dump(code, output)
+
+from error import JtError
+
+class Python3Error(JtError):
+    '''The Python 3 interpreter failed to compile the program.'''
+    pass
+
+if __name__ == '__main__':
+    _main()
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,413 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Python source code generation.
+
+The Python ASTs made by the to_py3() methods (see the py3 module) are turned
+into source code that runs on both Python 2 and Python 3:
+
+- Helper names, which start with '*', get a '_' prefix instead. Javalette
+  identifiers start with a letter, so neither can clash with them.
+
+- Assignment expressions are split off into assignment statements, keeping the
+  order of evaluation.'''
+
+import re
+
+import py3
+
+__all__ = ['generate', 'identifier', 'name_variables']
+
+_identifier_re = re.compile('^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+# Keywords of either Python 2 or Python 3, with the exception of 'print', which
+# is not a keyword with the print_function future statement:
+_keywords = frozenset('''
+False None True and as assert async await break class continue def del elif
+else except exec finally for from global if import in is lambda nonlocal not or
+pass raise return try while with yield
+'''.split())
+
+def identifier(name):
+    '''Return the source code identifier for the name of a Python AST.'''
+    if name.startswith('*'):
+        return '_' + name[1:]
+    if name in _keywords:
+        return '_' + name
+    if not _identifier_re.match(name):
+        # A function or variable made up by the optimizer, e.g. 'f$1':
+        return '_' + re.sub('[^a-zA-Z0-9_]', '_', name)
+    return name
+
+def name_variables(function, global_names):
+    '''Name the variables of the function (a syntax.function) after their
+    identifiers, so that the generated Python AST is readable. Variables
+    which would clash with others or with any of 'global_names' (source code
+    identifiers) are given unique names.'''
+    import syntax
+    from optimizer import walk
+    taken = set(global_names)
+    for node in walk(function.value):
+        if not isinstance(node, syntax.variable):
+            continue
+        name = identifier(node.name)
+        candidate = name
+        n = 0
+        while candidate in taken:
+            n += 1
+            candidate = '_%s_%d' % (name.lstrip('_'), n)
+        taken.add(candidate)
+        node.uid = candidate
+
+def _kind(expr):
+    return expr[0]
+
+def _fields(expr):
+    return expr[2]
+
+def _replace(expr, **fields):
+    name, lineno, old_fields = expr
+    new_fields = dict(old_fields)
+    new_fields.update(fields)
+    return (name, lineno, new_fields)
+
+def _has_assignment(obj):
+    '''Check if the Python AST contains an assignment expression.'''
+    if isinstance(obj, list):
+        for item in obj:
+            if _has_assignment(item):
+                return True
+    elif isinstance(obj, tuple) and len(obj) == 3 and isinstance(obj[2], dict):
+        if obj[0] == 'NamedExpr':
+            return True
+        return _has_assignment(obj[2].values())
+    return False
+
+class _flattener(object):
+
+    '''Splitting assignment expressions off the statements of a function.'''
+
+    def __init__(self):
+        self.ntemps = 0
+
+    def temp(self):
+        '''Return a name for a new temporary variable.'''
+        self.ntemps += 1
+        return '*t%d' % self.ntemps
+
+    def sequence(self, exprs):
+        '''Flatten the expressions, which are evaluated in the order of the
+        list. Return a pair: the list of statements to run first, and the list
+        of expressions.'''
+        stmts = []
+        result = []
+        for expr in exprs:
+            expr_stmts, expr = self.expression(expr)
+            if expr_stmts:
+                # The statements could change the values of the preceding
+                # expressions, so these must be evaluated first:
+                for i, prev in enumerate(result):
+                    if _kind(prev) == 'Constant':
+                        continue
+                    temp = self.temp()
+                    stmts += py3.assign(temp, prev),
+                    result[i] = py3.name(temp)
+                stmts += expr_stmts
+            result += expr,
+        return stmts, result
+
+    def expression(self, expr):
+        '''Flatten the expression. Return a pair: the list of statements to
+        run first, and the expression without assignments.'''
+        if not _has_assignment(expr):
+            return [], expr
+        kind = _kind(expr)
+        fields = _fields(expr)
+        if kind == 'NamedExpr':
+            stmts, value = self.expression(fields['value'])
+            target = fields['target'][2]['id']
+            stmts += py3.assign(target, value),
+            return stmts, py3.name(target)
+        elif kind == 'BoolOp':
+            [left, right] = fields['values']
+            stmts, left = self.expression(left)
+            right_stmts, right = self.expression(right)
+            if not right_stmts:
+                return stmts, _replace(expr, values=[left, right])
+            temp = self.temp()
+            test = py3.name(temp)
+            if _kind(fields['op']) == 'Or':
+                test = py3.node('UnaryOp', op=py3.node('Not'), operand=test)
+            stmts += [
+                py3.assign(temp, left),
+                py3.node('If', test=test, body=right_stmts + [py3.assign(temp, right)])
+            ]
+            return stmts, py3.name(temp)
+        elif kind == 'IfExp':
+            stmts, test = self.expression(fields['test'])
+            body_stmts, body = self.expression(fields['body'])
+            orelse_stmts, orelse = self.expression(fields['orelse'])
+            if not body_stmts and not orelse_stmts:
+                return stmts, _replace(expr, test=test)
+            temp = self.temp()
+            stmts += py3.node('If',
+                test=test,
+                body=body_stmts + [py3.assign(temp, body)],
+                orelse=orelse_stmts + [py3.assign(temp, orelse)]
+            ),
+            return stmts, py3.name(temp)
+        elif kind == 'BinOp':
+            stmts, [left, right] = self.sequence([fields['left'], fields['right']])
+            return stmts, _replace(expr, left=left, right=right)
+        elif kind == 'Compare':
+            stmts, [left, right] = self.sequence([fields['left']] + fields['comparators'])
+            return stmts, _replace(expr, left=left, comparators=[right])
+        elif kind == 'UnaryOp':
+            stmts, operand = self.expression(fields['operand'])
+            return stmts, _replace(expr, operand=operand)
+        elif kind == 'Call':
+            stmts, args = self.sequence(fields['args'])
+            return stmts, _replace(expr, args=args)
+        raise NotImplementedError('Flattening of %s' % kind)
+
+    def statements(self, stmts):
+        '''Flatten the statements.'''
+        result = []
+        for stmt in stmts:
+            result += self.statement(stmt)
+        return result
+
+    def statement(self, stmt):
+        '''Flatten the statement. Return a list of statements.'''
+        kind = _kind(stmt)
+        fields = _fields(stmt)
+        if kind == 'FunctionDef':
+            return [_replace(stmt, body=_flattener().statements(fields['body']))]
+        elif kind == 'Expr':
+            stmts, value = self.expression(fields['value'])
+            if _kind(value) not in ('Name', 'Constant'):
+                stmts += _replace(stmt, value=value),
+            return stmts
+        elif kind in ('Assign', 'Return'):
+            stmts, value = self.expression(fields['value'])
+            return stmts + [_replace(stmt, value=value)]
+        elif kind == 'If':
+            stmts, test = self.expression(fields['test'])
+            return stmts + [_replace(stmt,
+                test=test,
+                body=self.statements(fields['body']),
+                orelse=self.statements(fields.get('orelse', []))
+            )]
+        elif kind == 'While':
+            stmts, test = self.expression(fields['test'])
+            body = self.statements(fields['body'])
+            if stmts:
+                # The condition is evaluated at the top of the loop body:
+                stmts += py3.node('If',
+                    test=py3.node('UnaryOp', op=py3.node('Not'), operand=test),
+                    body=[py3.node('Break')]
+                ),
+                body = stmts + body
+                test = py3.constant(True)
+            return [_replace(stmt, test=test, body=body)]
+        elif kind == 'For':
+            stmts, iter = self.expression(fields['iter'])
+            return stmts + [_replace(stmt, iter=iter, body=self.statements(fields['body']))]
+        return [stmt]
+
+# Operator symbols, and precedences of the expressions:
+_binary_ops = {
+    'Add': ('+', 10),
+    'Sub': ('-', 10),
+    'Mult': ('*', 11),
+    'Div': ('/', 11),
+    'FloorDiv': ('//', 11),
+    'Mod': ('%', 11),
+}
+
+_unary_ops = {
+    'UAdd': ('+', 12),
+    'USub': ('-', 12),
+    'Not': ('not ', 4),
+}
+
+_compare_ops = {
+    'Eq': '==',
+    'NotEq': '!=',
+    'Lt': '<',
+    'LtE': '<=',
+    'Gt': '>',
+    'GtE': '>=',
+}
+
+_bool_ops = {
+    'And': ('and', 3),
+    'Or': ('or', 2),
+}
+
+_compare_precedence = 5
+_ifexp_precedence = 1
+_atom_precedence = 14
+
+def _string(value):
+    '''Return the literal for the string. Non-ASCII characters are left as
+    they are, so that the literal is a byte string of the same bytes in
+    Python 2, and a Unicode string of the same characters in Python 3.'''
+    if isinstance(value, unicode):
+        value = value.encode('UTF-8')
+    result = []
+    for ch in value:
+        if ch in '\\\'':
+            ch = '\\' + ch
+        elif ord(ch) < 0x20 or ord(ch) == 0x7F:
+            ch = repr(ch)[1:-1]
+        result += ch,
+    return "'%s'" % ''.join(result)
+
+def _constant(value):
+    '''Return the literal for the constant, and its precedence.'''
+    if isinstance(value, (str, unicode)):
+        return _string(value), _atom_precedence
+    elif isinstance(value, bool) or value is None:
+        return repr(value), _atom_precedence
+    elif isinstance(value, float):
+        text = repr(value)
+    else:
+        text = str(value)
+    if text.startswith('-'):
+        return text, _unary_ops['USub'][1]
+    return text, _atom_precedence
+
+def _expression(expr):
+    '''Return the source code for the expression, and its precedence.'''
+    kind = _kind(expr)
+    fields = _fields(expr)
+    if kind == 'Name':
+        return identifier(fields['id']), _atom_precedence
+    elif kind == 'Constant':
+        return _constant(fields['value'])
+    elif kind == 'Call':
+        args = ', '.join(expression(arg) for arg in fields['args'])
+        return '%s(%s)' % (expression(fields['func'], _atom_precedence), args), _atom_precedence
+    elif kind == 'List':
+        return '[%s]' % ', '.join(expression(item) for item in fields['elts']), _atom_precedence
+    elif kind == 'BinOp':
+        op, precedence = _binary_ops[_kind(fields['op'])]
+        left = expression(fields['left'], precedence)
+        right = expression(fields['right'], precedence + 1)
+        return '%s %s %s' % (left, op, right), precedence
+    elif kind == 'UnaryOp':
+        op, precedence = _unary_ops[_kind(fields['op'])]
+        return op + expression(fields['operand'], precedence), precedence
+    elif kind == 'Compare':
+        [op] = fields['ops']
+        [right] = fields['comparators']
+        # Comparisons don't nest without parentheses, as they would chain:
+        left = expression(fields['left'], _compare_precedence + 1)
+        right = expression(right, _compare_precedence + 1)
+        return '%s %s %s' % (left, _compare_ops[_kind(op)], right), _compare_precedence
+    elif kind == 'BoolOp':
+        op, precedence = _bool_ops[_kind(fields['op'])]
+        [left, right] = fields['values']
+        left = expression(left, precedence)
+        right = expression(right, precedence + 1)
+        return '%s %s %s' % (left, op, right), precedence
+    elif kind == 'IfExp':
+        precedence = _ifexp_precedence
+        return '%s if %s else %s' % (
+            expression(fields['body'], precedence + 1),
+            expression(fields['test'], precedence + 1),
+            expression(fields['orelse'], precedence)
+        ), precedence
+    raise NotImplementedError('Source code for %s' % kind)
+
+def expression(expr, precedence=0):
+    '''Return the source code for the expression, parenthesized if it binds
+    less tightly than the provided precedence.'''
+    text, expr_precedence = _expression(expr)
+    if expr_precedence < precedence:
+        text = '(%s)' % text
+    return text
+
+def _block(stmts, indent):
+    if not stmts:
+        return [indent + 'pass']
+    result = []
+    for stmt in stmts:
+        result += _statement(stmt, indent)
+    return result
+
+def _statement(stmt, indent):
+    '''Return the list of source code lines for the statement.'''
+    kind = _kind(stmt)
+    fields = _fields(stmt)
+    inner = indent + '    '
+    if kind == 'FunctionDef':
+        args = ', '.join(identifier(arg[2]['arg']) for arg in fields['args'][2]['args'])
+        return ['', '', '%sdef %s(%s):' % (indent, identifier(fields['name']), args)] + _block(fields['body'], inner)
+    elif kind == 'Assign':
+        targets = ''.join(expression(target) + ' = ' for target in fields['targets'])
+        return [indent + targets + expression(fields['value'])]
+    elif kind == 'Expr':
+        return [indent + expression(fields['value'])]
+    elif kind == 'Return':
+        if fields.get('value') is None:
+            return [indent + 'return']
+        return [indent + 'return ' + expression(fields['value'])]
+    elif kind == 'If':
+        result = ['%sif %s:' % (indent, expression(fields['test']))]
+        result += _block(fields['body'], inner)
+        orelse = fields.get('orelse')
+        while orelse:
+            if len(orelse) == 1 and _kind(orelse[0]) == 'If':
+                # else: if ... -> elif ...
+                elif_fields = _fields(orelse[0])
+                result += '%selif %s:' % (indent, expression(elif_fields['test'])),
+                result += _block(elif_fields['body'], inner)
+                orelse = elif_fields.get('orelse')
+            else:
+                result += indent + 'else:',
+                result += _block(orelse, inner)
+                break
+        return result
+    elif kind == 'While':
+        result = ['%swhile %s:' % (indent, expression(fields['test']))]
+        return result + _block(fields['body'], inner)
+    elif kind == 'For':
+        result = ['%sfor %s in %s:' % (indent, expression(fields['target']), expression(fields['iter']))]
+        return result + _block(fields['body'], inner)
+    elif kind in ('Pass', 'Break'):
+        return [indent + kind.lower()]
+    raise NotImplementedError('Source code for %s' % kind)
+
+def generate(module, runtime):
+    '''Return the source code of a Python module: the run-time support code,
+    followed by the module (a list of Python AST statements).'''
+    module = _flattener().statements(module)
+    lines = []
+    for stmt in module:
+        if _kind(stmt) != 'FunctionDef' and lines and lines[-1].startswith(' '):
+            lines += '', ''
+        lines += _statement(stmt, '')
+    return runtime + '\n'.join(lines) + '\n'
+
+# vim:ts=4 sts=4 sw=4 et
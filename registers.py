@@ -0,0 +1,270 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Allocation of x86 registers to variables and temporaries.
+
+Nodes of a function are numbered in pre-order, so that every node covers a
+contiguous range of positions: its span. The live interval of a variable
+extends from its first to its last occurrence. An interval that meets a loop
+covers the whole loop if the variable is declared outside of it (or without a
+value), so that values carried between iterations are never clobbered.
+
+Intervals are assigned registers by linear scan. When no register is left,
+the interval with the lowest spill weight (occurrences, each weighted by its
+loop depth) is kept in memory. Calls and divisions clobber some registers:
+those are never given to intervals that contain them. Callee-saved registers
+are preserved by the function itself, in its prologue and epilogue.
+
+While the code is generated, registers that are free in the span of an operand
+hold temporaries (see Allocation.temporary()). The set of callee-saved
+registers is fixed by then, as the stack frame lies below them, so temporaries
+never take a callee-saved register that no variable has.'''
+
+import expression
+import optimizer
+import syntax
+import type
+
+__all__ = ['Allocation', 'allocate', 'callee_saved', 'caller_saved', 'is_allocatable']
+
+callee_saved = ('ebx', 'esi', 'edi')
+caller_saved = ('ecx', 'edx')
+
+# Caller-saved registers go first, as they cost nothing to use:
+_registers = caller_saved + callee_saved
+
+# Registers that the code clobbers, besides eax:
+_call_clobbers = frozenset(caller_saved)
+_division_clobbers = frozenset(['edx'])
+
+# Loop depth beyond which occurrences don't weigh more:
+_max_depth = 4
+
+def is_allocatable(var):
+    '''Return whether the variable can be kept in a register.'''
+    return not isinstance(var, syntax.function) and isinstance(var.type, type.x86_dword_type)
+
+def _clobbers(node):
+    if isinstance(node, expression.call):
+        return _call_clobbers
+    if isinstance(node, expression.binary_operator) and node.operator in ('/', '%'):
+        # idiv, and the fix-up of remainders of doubles, use edx:
+        return _division_clobbers
+    return ()
+
+def _late_use(node):
+    # The left operand of a binary operator may be used once the right one is
+    # evaluated; the target of an assignment is written once its value is:
+    if isinstance(node, expression.binary_operator):
+        target = node.left
+    elif isinstance(node, expression.assignment):
+        target = node.lvalue
+    else:
+        return None
+    if isinstance(target, expression.reference) and isinstance(target.bind, syntax.variable):
+        return target.bind
+    return None
+
+class _Interval(object):
+
+    def __init__(self, var):
+        self.var = var
+        self.start = None
+        self.end = None
+        self.weight = 0
+        self.register = None
+
+    def add(self, start, end=None):
+        if end is None:
+            end = start
+        if self.start is None or start < self.start:
+            self.start = start
+        if self.end is None or end > self.end:
+            self.end = end
+
+    def overlaps(self, start, end):
+        return self.start <= end and start <= self.end
+
+class Allocation(object):
+
+    '''Registers of the variables of a function, and of temporaries.'''
+
+    def __init__(self, function):
+        # Spans of the nodes, indexed by their ids:
+        self.spans = {}
+        self.intervals = {}
+        # The same intervals, in the order of first occurrences of their
+        # variables, so that the allocation doesn't depend on dict order:
+        self._intervals = []
+        # (position, registers) pairs:
+        self.clobbers = []
+        # Callee-saved registers that the function uses, in the order they are
+        # pushed by its prologue. The list is complete once scan() returns.
+        self.saved = []
+        self._temporaries = set()
+        self._analyze(function)
+
+    def span(self, node):
+        '''Return the (start, end) span of the node.'''
+        return self.spans[id(node)]
+
+    def _analyze(self, function):
+        loops = []
+        declarations = {}
+        occurrences = []
+        # Uses that happen when evaluation of a node ends (see _late_use()):
+        late = []
+        counter = [0]
+        def number(node, depth):
+            start = counter[0]
+            counter[0] += 1
+            if isinstance(node, syntax.while_loop):
+                depth += 1
+            for child in node.get_children():
+                number(child, depth)
+            end = counter[0] - 1
+            self.spans[id(node)] = start, end
+            if isinstance(node, syntax.while_loop):
+                loops.append((start, end))
+            elif isinstance(node, syntax.variable):
+                declarations[node] = start
+                occurrences.append((node, start, depth))
+            elif isinstance(node, expression.reference) and isinstance(node.bind, syntax.variable):
+                occurrences.append((node.bind, start, depth))
+            for register in _clobbers(node):
+                self.clobbers.append((end, register))
+            var = _late_use(node)
+            if var is not None:
+                late.append((var, end))
+        number(function.value, 0)
+        for var, position, depth in occurrences:
+            if not is_allocatable(var):
+                continue
+            interval = self.intervals.get(var)
+            if interval is None:
+                interval = self.intervals[var] = _Interval(var)
+                self._intervals.append(interval)
+            interval.add(position)
+            interval.weight += 10 ** min(depth, _max_depth)
+        for var, position in late:
+            if var in self.intervals:
+                self.intervals[var].add(position)
+        [argv] = [line for line in function.value.contents if isinstance(line, syntax.argv)]
+        for var in argv.variables:
+            if var in self.intervals:
+                # Arguments are loaded to registers on entry:
+                self.intervals[var].add(0)
+        for start, end in loops:
+            for var, position, depth in occurrences:
+                if not start <= position <= end or var not in self.intervals:
+                    continue
+                declaration = declarations[var]
+                if not start <= declaration <= end or (var.value is None and var not in argv.variables):
+                    self.intervals[var].add(start, end)
+
+    def _is_clobbered(self, register, start, end):
+        for position, item in self.clobbers:
+            if item == register and start <= position <= end:
+                return True
+        return False
+
+    def _is_occupied(self, register, start, end):
+        for interval in self.intervals.itervalues():
+            if interval.register == register and interval.overlaps(start, end):
+                return True
+        return False
+
+    def _use(self, register):
+        if register in callee_saved and register not in self.saved:
+            self.saved.append(register)
+
+    def scan(self):
+        '''Assign registers to the intervals, by linear scan.'''
+        active = []
+        intervals = sorted(self._intervals, key=lambda interval: (interval.start, interval.end))
+        for interval in intervals:
+            active = [item for item in active if item.end >= interval.start]
+            used = set(item.register for item in active)
+            usable = [
+                register for register in _registers
+                if not self._is_clobbered(register, interval.start, interval.end)
+            ]
+            free = [register for register in usable if register not in used]
+            if free:
+                interval.register = free[0]
+                active.append(interval)
+                continue
+            # Spill the lightest interval that holds a usable register:
+            candidates = [item for item in active if item.register in usable]
+            if not candidates:
+                continue
+            victim = min(candidates, key=lambda item: item.weight)
+            if victim.weight >= interval.weight:
+                continue
+            interval.register = victim.register
+            victim.register = None
+            active.remove(victim)
+            active.append(interval)
+        for interval in intervals:
+            if interval.register is not None:
+                self._use(interval.register)
+
+    def register(self, var):
+        '''Return the register of the variable, or None if it is kept in
+        memory.'''
+        interval = self.intervals.get(var)
+        if interval is None:
+            return None
+        return interval.register
+
+    def temporary(self, node, exclude=()):
+        '''Return a register that can hold a temporary while the node is
+        evaluated, or None if there is none. The register must be released
+        with release().'''
+        start, end = self.span(node)
+        for register in _registers:
+            if register in exclude or register in self._temporaries:
+                continue
+            if register in callee_saved and register not in self.saved:
+                # The prologue doesn't preserve it:
+                continue
+            if self._is_clobbered(register, start, end) or self._is_occupied(register, start, end):
+                continue
+            self._temporaries.add(register)
+            return register
+        return None
+
+    def release(self, register):
+        '''Release the register of a temporary.'''
+        self._temporaries.remove(register)
+
+def allocate(function):
+    '''Allocate registers for the function. Set the x86_register attribute of
+    its variables. Return the allocation.'''
+    allocation = Allocation(function)
+    allocation.scan()
+    for node in optimizer.walk(function.value):
+        if isinstance(node, syntax.variable):
+            node.x86_register = allocation.register(node)
+    return allocation
+
+# vim:ts=4 sts=4 sw=4 et
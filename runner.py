@@ -0,0 +1,75 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''In-process execution of compiled Javalette programs.
+
+A program compiled with the Python bytecode back-end is a code object of a
+module, so it can be run inside the compiler process, rather than written to a
+file and loaded by a new interpreter. The code object can be run any number of
+times, each time in a fresh module namespace.'''
+
+import sys
+import traceback
+
+__all__ = ['compile_program', 'execute']
+
+def compile_program(program, lowered=None):
+    '''Compile the checked program into a Python code object.
+    If provided, 'lowered' is a list of code objects for bodies of the
+    functions.'''
+    return program.to_pyc(lowered).to_code()
+
+def _exit_status(code):
+    '''Return the exit status that the interpreter would use for the
+    SystemExit code.'''
+    if code is None:
+        return 0
+    if isinstance(code, (int, long)):
+        return code
+    print >>sys.stderr, code
+    return 1
+
+def execute(code):
+    '''Run the compiled program as the __main__ module, with the current
+    sys.stdin and sys.stdout. Return the exit status of the program.
+    Exceptions raised by the program are reported on stderr, as the
+    interpreter would report them.'''
+    namespace = {'__name__': '__main__'}
+    try:
+        try:
+            exec code in namespace
+        except SystemExit, exception:
+            return _exit_status(exception.code)
+        except Exception:
+            (exc_type, exc_value, exc_traceback) = sys.exc_info()
+            # Omit the frame of this function:
+            traceback.print_exception(exc_type, exc_value, exc_traceback.tb_next)
+            return 1
+        return 0
+    finally:
+        sys.exc_clear()
+        # Release the program's objects now, so that its buffered output, if
+        # any, is flushed:
+        namespace.clear()
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,160 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Allocation of fast local variables (slots) in Python bytecode listings.
+
+Every variable declaration gets its own fast local. Variables whose values are
+never needed at the same time can share a slot instead, which makes frames
+smaller.'''
+
+import bp
+
+__all__ = ['allocate']
+
+_fast_ops = frozenset([bp.LOAD_FAST, bp.STORE_FAST, bp.DELETE_FAST])
+_terminators = frozenset([bp.JUMP_ABSOLUTE, bp.JUMP_FORWARD, bp.RETURN_VALUE, bp.RAISE_VARARGS])
+
+def _basic_blocks(listing):
+    '''Split the listing into basic blocks.
+    Return a list of (start, stop) pairs, and a list of lists of successors
+    of each block.'''
+    starts = set([0])
+    labels = {}
+    for i, (op, arg) in enumerate(listing):
+        if isinstance(op, bp.Label):
+            labels[op] = i
+            starts.add(i)
+        elif op in bp.hasjump or op in _terminators:
+            starts.add(i + 1)
+    starts = sorted(start for start in starts if start < len(listing))
+    bounds = zip(starts, starts[1:] + [len(listing)])
+    block_of = dict((start, n) for n, start in enumerate(starts))
+    successors = []
+    for n, (start, stop) in enumerate(bounds):
+        result = []
+        op, arg = listing[stop - 1]
+        if op not in _terminators and n + 1 < len(bounds):
+            result += n + 1,
+        if op in bp.hasjump:
+            # SETUP_LOOP is included: its target is reachable via BREAK_LOOP.
+            result += block_of[labels[arg]],
+        successors += result,
+    return bounds, successors
+
+def _liveness(listing, bounds, successors):
+    '''Return the set of variables live at the exit of every block.'''
+    uses = []
+    defs = []
+    for start, stop in bounds:
+        use = set()
+        def_ = set()
+        for op, arg in listing[start:stop]:
+            if op == bp.LOAD_FAST:
+                if arg not in def_:
+                    use.add(arg)
+            elif op in _fast_ops:
+                def_.add(arg)
+        uses += use,
+        defs += def_,
+    live_in = [set() for item in bounds]
+    live_out = [set() for item in bounds]
+    changed = True
+    while changed:
+        changed = False
+        for n in xrange(len(bounds) - 1, -1, -1):
+            out = set()
+            for m in successors[n]:
+                out |= live_in[m]
+            in_ = uses[n] | (out - defs[n])
+            if in_ != live_in[n] or out != live_out[n]:
+                live_in[n] = in_
+                live_out[n] = out
+                changed = True
+    return live_in, live_out
+
+def _interference(listing, args):
+    '''Return a dictionary mapping every variable to the set of variables that
+    it must not share a slot with.'''
+    graph = dict((arg, set(args)) for arg in args)
+    for arg in args:
+        graph[arg].discard(arg)
+    def add(var, live):
+        graph.setdefault(var, set())
+        for other in live:
+            if other != var:
+                graph[var].add(other)
+                graph.setdefault(other, set()).add(var)
+    bounds, successors = _basic_blocks(listing)
+    live_in, live_out = _liveness(listing, bounds, successors)
+    for n, (start, stop) in enumerate(bounds):
+        live = set(live_out[n])
+        for op, arg in reversed(listing[start:stop]):
+            if op == bp.LOAD_FAST:
+                graph.setdefault(arg, set())
+                live.add(arg)
+            elif op in _fast_ops:
+                add(arg, live)
+                live.discard(arg)
+    if bounds:
+        # The arguments are assigned on entry:
+        for arg in args:
+            add(arg, live_in[0])
+    return graph
+
+def allocate(code):
+    '''Let variables of the code object (a bp.Code) share slots where it is
+    safe, in place. Return the number of slots saved.'''
+    listing = code.code
+    graph = _interference(listing, code.args)
+    order = list(code.args)
+    seen = set(order)
+    for op, arg in listing:
+        if op in _fast_ops and arg not in seen:
+            order += arg,
+            seen.add(arg)
+    slots = []
+    slot_of = {}
+    for var in order:
+        if var in code.args:
+            n = len(slots)
+        else:
+            for n, occupants in enumerate(slots):
+                if not (occupants & graph[var]):
+                    break
+            else:
+                n = len(slots)
+        if n == len(slots):
+            slots += set(),
+        slots[n].add(var)
+        slot_of[var] = n
+    # Every slot is named after its first occupant:
+    names = [None] * len(slots)
+    for var in reversed(order):
+        names[slot_of[var]] = var
+    code.code = [
+        op in _fast_ops and (op, names[slot_of[arg]]) or (op, arg)
+        for op, arg in listing
+    ]
+    return len(order) - len(slots)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -26,9 +26,11 @@ _type = type
 import type
 
 import bp
+import closures
+import py3
 import x86
 
-__all__ = ['argv', 'base', 'block', 'block_statement', 'declaration', 'error', 'evaluation', 'function', 'if_then_else', 'program', 'return_statement', 'statement', 'variable', 'while_loop']
+__all__ = ['argv', 'base', 'block', 'block_statement', 'declaration', 'error', 'evaluation', 'function', 'if_then_else', 'program', 'py_bind_names', 'return_statement', 'statement', 'variable', 'while_loop']
 
 class base(object):
 
@@ -47,10 +49,14 @@ class base(object):
     _doc = {
         'validate': 'Look for type mismatches.\nCheck for proper variable usage.',
         'to_py': '[py] Generate code.',
+        'to_py3': '[py3] Generate Python AST.',
+        'to_closure': '[cl] Compile into a closure.',
         'to_x86_asm': '[x86] Generate code.',
         'bind_to_function': 'Bind the statement to the function in which it appears.',
         'get_blocks': 'Return a sequence of sub-blocks.',
         'get_var_refs': 'Return a sequence of referenced variables.',
+        'get_children': 'Return a sequence of direct sub-nodes.',
+        'transform': "Replace every direct sub-node with the result of 'function' applied to it.",
         'check_var_usage': "Check for proper variable usage.\n'lsv' - set of declared variables\n'rsv' - set of used variables.\nBoth sets are updated."
     }
 
@@ -74,6 +80,12 @@ class block(base):
             ok &= line.validate()
         return ok
 
+    def get_children(self):
+        return self.contents
+
+    def transform(self, function):
+        self.contents = [function(line) for line in self.contents]
+
     def __str__(self):
         if len(self.contents) == 0:
             return block.indent('skip')
@@ -90,6 +102,12 @@ class statement(base):
     def get_var_refs(self):
         return ()
 
+    def get_children(self):
+        return ()
+
+    def transform(self, function):
+        pass
+
     def check_var_usage(self, lsv, rsv):
         raise NotImplementedError()
 
@@ -126,6 +144,15 @@ class block_statement(block, statement):
             result += line.to_py()
         return result
 
+    def to_py3(self):
+        result = []
+        for line in self.contents:
+            result += line.to_py3()
+        return result
+
+    def to_closure(self, env):
+        return closures.block([line.to_closure(env) for line in self.contents])
+
     def to_x86_asm(self, env):
         env2 = env.clone()
         result = []
@@ -138,23 +165,148 @@ class program(block):
 
     '''A program.'''
 
+    # Whether to run the peephole optimizer on the generated bytecode, or x86
+    # code:
+    peephole = False
+
+    # Whether to bind callees and runtime helpers to constants of the function
+    # bodies, rather than look them up as globals on every use:
+    bind_names = False
+
+    # Whether to let variables share fast-local slots of the function bodies:
+    allocate_locals = False
+
+    # Whether the generated code should buffer its input and output:
+    buffer_io = False
+
+    # Whether to import the built-ins and runtime helpers from the shared
+    # runtime module, rather than embed them in the program:
+    shared_runtime = False
+
+    # Whether to load bodies of functions (other than main) lazily, from
+    # marshalled data, on their first call:
+    lazy_load = False
+
+    # Whether to keep variables and temporaries of the x86 code in registers:
+    allocate_registers = False
+
+    # Whether the x86 code should do floating-point arithmetic with SSE2
+    # instructions, rather than with the x87 FPU:
+    sse2 = False
+
     def __str__(self):
         return '\n\n'.join(str(item) for item in self.contents)
 
-    def to_py(self):
-        from builtins import py_stub_pre, py_stub_post
+    def py_bound_names(self):
+        '''[py] Return the set of global names that are bound to constants in
+        the binding mode.'''
+        from builtins import py_helper_names
+        return set(item.name for item in self.contents) | set(py_helper_names)
+
+    def py_body_to_pyc(self, function, bound_names=None):
+        '''[py] Generate bytecode for body of the function, and apply the
+        enabled code generation passes (except for the peephole optimizer) to
+        it. 'bound_names' is the result of py_bound_names().'''
+        code = function.body_to_pyc(self.filename)
+        if self.bind_names:
+            py_bind_names(code, bound_names)
+        if self.allocate_locals:
+            import slots
+            slots.allocate(code)
+        return code
+
+    def py_runtime_names(self):
+        '''[py] Return the global names that the program takes from the shared
+        runtime module.'''
+        from builtins import pdf_function, py_helper_names
+        names = set(item.name for item in self.contents if isinstance(item, pdf_function))
+        names.update(py_helper_names)
+        if self.bind_names:
+            names.add('*bind')
+        if self.lazy_load:
+            names.add('*lazy')
+        return sorted(names)
+
+    def py_runtime_function(self, name, code):
+        '''[py] Generate code that pushes the runtime function: the global
+        from the shared runtime module, or a new function with the code.'''
+        if self.shared_runtime:
+            return [(bp.LOAD_GLOBAL, name)]
+        return [
+            (bp.LOAD_CONST, code),
+            (bp.MAKE_FUNCTION, 0)
+        ]
+
+    def py_is_lazy(self, function):
+        '''[py] Return whether the body of the function is loaded lazily.'''
+        from builtins import pdf_function
+        return self.lazy_load and function.name != 'main' and not isinstance(function, pdf_function)
+
+    def py_lazy_data(self, body_code):
+        '''[py] Return the marshalled code object of a lazily loaded function
+        body. 'body_code' is the result of py_body_to_pyc(), or its assembled
+        code object.'''
+        import marshal
+        if isinstance(body_code, bp.Code):
+            if self.peephole:
+                import peephole
+                peephole.optimize(body_code)
+            body_code = body_code.to_code()
+        return marshal.dumps(body_code)
+
+    def to_py(self, lowered=None):
+        from builtins import pdf_function, py_stub_pre, py_io_stub, py_runtime_stub, py_stub_post, py_bind_code, py_lazy_code
         listing = []
-        listing += py_stub_pre
-        for item in self.contents:
-            listing += item.to_py(self.filename)
+        if self.shared_runtime:
+            listing += py_runtime_stub(self.buffer_io, self.py_runtime_names())
+        else:
+            listing += py_stub_pre
+            listing += py_io_stub(self.buffer_io)
+        if self.lazy_load:
+            listing += self.py_runtime_function('*lazy', py_lazy_code)
+            if self.bind_names:
+                listing += self.py_runtime_function('*bind', py_bind_code)
+            else:
+                listing += (bp.LOAD_CONST, None),
+            listing += [
+                (bp.CALL_FUNCTION, 1),
+                (bp.STORE_GLOBAL, '*load')
+            ]
+        if lowered is None:
+            lowered = [None] * len(self.contents)
+        names = None
+        if self.bind_names:
+            names = self.py_bound_names()
+        # Functions that are loaded eagerly:
+        functions = []
+        for item, body_code in zip(self.contents, lowered):
+            if self.shared_runtime and isinstance(item, pdf_function):
+                continue
+            if body_code is None:
+                body_code = self.py_body_to_pyc(item, names)
+            if self.py_is_lazy(item):
+                listing += item.py_lazy_to_py(self.filename, self.py_lazy_data(body_code))
+                continue
+            listing += item.to_py(self.filename, body_code)
+            functions += item,
+        if self.bind_names:
+            listing += self.py_runtime_function('*bind', py_bind_code)
+            listing += [item.py_read()[0] for item in functions]
+            listing += [
+                (bp.BUILD_LIST, len(functions)),
+                (bp.CALL_FUNCTION, 1),
+                (bp.POP_TOP, None)
+            ]
         listing += py_stub_post
         return listing
 
-    def to_pyc(self):
-        '''[py] Generate bytecode for the program.'''
+    def to_pyc(self, lowered=None):
+        '''[py] Generate bytecode for the program.
+        If provided, 'lowered' is a list of code objects for bodies of the
+        functions.'''
         from builtins import this_module_file_name as builtins_module_file_name
-        listing = self.to_py()
-        return bp.Code(
+        listing = self.to_py(lowered)
+        code = bp.Code(
             code=listing,
             freevars=[],
             args=[],
@@ -165,27 +317,98 @@ class program(block):
             filename=builtins_module_file_name,
             firstlineno=0,
             docstring=None)
+        if self.peephole:
+            import peephole
+            peephole.optimize(code)
+        return code
 
-    def compile_pyc(self, output_file):
+    def compile_pyc(self, output_file, lowered=None):
         '''[py] Compile the program into a Python bytecode file.'''
         import imp
         import marshal
         output_file.write(imp.get_magic())
         output_file.write('\x00\x00\x00\x00')
-        pyc = self.to_pyc()
+        pyc = self.to_pyc(lowered)
         pyo = pyc.to_code()
         marshal.dump(pyo, output_file)
 
-    def to_x86_asm(self):
+    def to_py3(self, lowered=None):
+        from builtins import py3_stub_post
+        if lowered is None:
+            lowered = [item.to_py3() for item in self.contents]
+        result = []
+        for item in lowered:
+            result += item
+        result += py3_stub_post
+        return result
+
+    def to_closure(self):
+        '''[cl] Compile the program into closures. Return the cell of its
+        main function (see closures.call()).'''
+        # Calls refer to the functions through cells, so that they can be
+        # compiled before their callees:
+        for item in self.contents:
+            item.closure_cell = []
+        for item in self.contents:
+            body, size = item.to_closure()
+            closures.define(item.closure_cell, body, len(item.type.arg_type_list), size)
+        [main] = [item for item in self.contents if item.name == 'main']
+        return main.closure_cell
+
+    def compile_py3(self, output_file, lowered=None):
+        '''[py3] Compile the program into a Python 3 bytecode file.
+        If provided, 'lowered' is a list of Python ASTs for the functions.'''
+        from builtins import py3_runtime, this_module_file_name as builtins_module_file_name
+        module = self.to_py3(lowered)
+        py3.compile_pyc(module, py3_runtime, self.filename, builtins_module_file_name, output_file)
+
+    def py_source_lower(self, function):
+        '''[py] Generate Python AST for the function, with the variables named
+        after their identifiers.'''
+        import pysource
+        pysource.name_variables(function, [pysource.identifier(item.py3_name) for item in self.contents])
+        return function.to_py3()
+
+    def to_py_source(self, lowered=None):
+        '''[py] Generate Python source code for the program.
+        If provided, 'lowered' is a list of Python ASTs for the functions.'''
+        import pysource
+        from builtins import py_source_runtime
+        if lowered is None:
+            lowered = [self.py_source_lower(item) for item in self.contents]
+        return pysource.generate(self.to_py3(lowered), py_source_runtime)
+
+    def compile_py_source(self, output_file, lowered=None):
+        '''[py] Compile the program into a Python source file.'''
+        output_file.write(self.to_py_source(lowered))
+
+    def x86_lower(self, function):
+        '''[x86] Generate code for the function, optimize it, and render it
+        into a fragment.'''
+        listing = function.to_x86_asm(self.allocate_registers, self.sse2)
+        if self.peephole:
+            import x86peephole
+            x86peephole.optimize(listing)
+        return x86.render(listing)
+
+    def to_x86_asm(self, lowered=None):
         from builtins import x86_stub
         listing = list(x86_stub)
-        for item in self.contents:
-            listing += item.to_x86_asm()
+        if lowered is not None:
+            listing += lowered
+        else:
+            # Functions are rendered one at a time, so that few instructions
+            # are alive at once; the garbage collector would traverse them
+            # all, again and again.
+            for item in self.contents:
+                listing += self.x86_lower(item),
         return listing
 
-    def compile_x86(self, output_file):
-        '''[x86] Compile the program into an ELF executable.'''
-        x86_asm = self.to_x86_asm()
+    def compile_x86(self, output_file, lowered=None):
+        '''[x86] Compile the program into an ELF executable.
+        If provided, 'lowered' is a list of rendered fragments for the
+        functions.'''
+        x86_asm = self.to_x86_asm(lowered)
         x86.build(x86_asm, output_file)
 
     # Just to change the docstring
@@ -194,6 +417,20 @@ class program(block):
 
     validate.__doc__ = base._doc['validate'] + '\nCheck if every function returns.'
 
+def py_bind_names(code, names):
+    '''[py] Make the code (a bp.Code) read the listed names from placeholder
+    constants rather than from globals. The stub replaces the placeholders once
+    all the functions are created.'''
+    from builtins import py_bound_name
+    listing = []
+    for op, arg in code.code:
+        if op == bp.LOAD_GLOBAL and arg in names:
+            op, arg = bp.LOAD_CONST, py_bound_name(arg)
+        listing += (op, arg),
+    # Bodies of the built-in functions share their listings; don't modify
+    # them in place:
+    code.code = listing
+
 class error(base):
 
     '''An error indicator.'''
@@ -216,6 +453,9 @@ class variable(base):
         self.position = position
         self.uid = '&%x' % id(self)
 
+    # [x86] Register that holds the variable, or None if it is kept in memory:
+    x86_register = None
+
     def get_var_refs(self):
         from expression import expression
         if isinstance(self.value, expression):
@@ -223,6 +463,16 @@ class variable(base):
         else:
             return ()
 
+    def get_children(self):
+        if self.value is None:
+            return ()
+        else:
+            return self.value,
+
+    def transform(self, function):
+        if self.value is not None:
+            self.value = function(self.value)
+
     def check_var_usage(self, lsv, rsv):
         ok = True
         if self.value is not None:
@@ -260,6 +510,39 @@ class variable(base):
         '''[py] Generate code for reading the variables.'''
         return [(bp.LOAD_FAST, self.uid)]
 
+    def py3_write(self, value=None, pop=True, lineno=None):
+        '''[py3] Generate Python AST for storing the value to the variable:
+        an assignment statement, or an assignment expression if 'pop' is
+        false.'''
+        if value is None:
+            value = self.value
+        if value is None:
+            return []
+        elif pop:
+            return [py3.assign(self.uid, value.to_py3(), lineno)]
+        else:
+            return py3.node('NamedExpr', target=py3.name(self.uid, store=True), value=value.to_py3())
+
+    def py3_read(self):
+        '''[py3] Generate Python AST for reading the variable.'''
+        return py3.name(self.uid)
+
+    def closure_write(self, env, value=None, pop=True):
+        '''[cl] Compile storing the value (by default, the initial one) to the
+        variable. If 'pop' is false, the closure evaluates to the value.'''
+        if value is None:
+            value = self.value
+        if pop:
+            return closures.store(env.slot(self), value.to_closure(env))
+        else:
+            return closures.assign(env.slot(self), value.to_closure(env))
+
+    def closure_operand(self, env):
+        '''[cl] Return the variable as an operand for closures.binary().'''
+        if self in env.unassigned:
+            return 'closure', closures.read_checked(env.slot(self), self.name)
+        return 'slot', env.slot(self)
+
     def x86_asm_write(self, expression, env):
         '''[x86] Generate code for storing value of the expression to the variable.'''
         if expression is None:
@@ -271,6 +554,13 @@ class variable(base):
         '''[x86] Generate code for loading value of the variable.'''
         return self.type.x86_asm_read(self, env)
 
+    def x86_operand(self):
+        '''[x86] Return the operand (a register or a memory reference) that
+        holds the variable.'''
+        if self.x86_register is not None:
+            return self.x86_register
+        return self.uid
+
     def __str__(self):
         return 'var $%s : %s = %s' % (self.name, self.type, self.value)
 
@@ -295,8 +585,9 @@ class function(variable):
 
     validate.__doc__ = base._doc['validate'] + '\nCheck if the function returns.'
 
-    def to_py(self, filename):
-        body_code = self.body_to_pyc(filename)
+    def to_py(self, filename, body_code=None):
+        if body_code is None:
+            body_code = self.body_to_pyc(filename)
         return [
             (bp.LOAD_CONST, body_code),
             (bp.MAKE_FUNCTION, 0),
@@ -307,6 +598,48 @@ class function(variable):
         '''[py] Generate code for reading the function address.'''
         return [(bp.LOAD_GLOBAL, self.name)]
 
+    @property
+    def py3_name(self):
+        '''[py3] Name of the function in the Python module.'''
+        return py3.function_name(self.name)
+
+    def to_py3(self):
+        body = self.value.to_py3()
+        args = [py3.node('arg', arg='_%d' % n) for n in xrange(len(self.type.arg_type_list))]
+        return [
+            py3.node('FunctionDef', self.y,
+                name=self.py3_name,
+                args=py3.node('arguments', args=args),
+                body=body or [py3.node('Pass')]
+            )
+        ]
+
+    def py3_read(self):
+        '''[py3] Generate Python AST for reading the function address.'''
+        return py3.name(self.py3_name)
+
+    def py3_inline_call(self, call):
+        '''[py3] Generate Python AST for the call of the function, to be used
+        in place of a real call. Return None if the call can't be inlined.'''
+        return None
+
+    def to_closure(self):
+        '''[cl] Compile the function body into a closure. Return the closure
+        and the size of its frame.'''
+        env = closures.Env()
+        body = self.value.to_closure(env)
+        return body, env.size
+
+    def closure_inline_call(self, call, env):
+        '''[cl] Compile the call of the function into a closure, to be used in
+        place of a real call. Return None if the call can't be inlined.'''
+        return None
+
+    def py_inline_call(self, call):
+        '''[py] Generate code for the call of the function, to be used in
+        place of a real call. Return None if the call can't be inlined.'''
+        return None
+
     def body_to_pyc(self, filename):
         '''[py] Generate bytecode for function body.'''
         code = bp.Code(
@@ -322,17 +655,70 @@ class function(variable):
             docstring=None)
         return code
 
+    def py_lazy_to_py(self, filename, body_data):
+        '''[py] Generate code for a stub of the function, which loads the
+        function body from the marshalled data on the first call. Loading
+        replaces the code of the stub, so that later calls (and references
+        bound to the stub) run the function body directly.'''
+        args = ['_%d' % n for n in xrange(len(self.type.arg_type_list))]
+        listing = [
+            (bp.SetLineno, self.y),
+            (bp.LOAD_GLOBAL, '*load'),
+            (bp.LOAD_GLOBAL, self.name),
+            (bp.LOAD_CONST, body_data),
+            (bp.CALL_FUNCTION, 2),
+        ]
+        listing += [(bp.LOAD_FAST, arg) for arg in args]
+        listing += [
+            (bp.CALL_FUNCTION, len(args)),
+            (bp.RETURN_VALUE, None)
+        ]
+        code = bp.Code(
+            code=listing,
+            freevars=[],
+            args=args,
+            varargs=False,
+            varkwargs=False,
+            newlocals=True,
+            name=self.name,
+            filename=filename,
+            firstlineno=self.y,
+            docstring=None)
+        return [
+            (bp.LOAD_CONST, code),
+            (bp.MAKE_FUNCTION, 0),
+            (bp.STORE_GLOBAL, self.name)
+        ]
+
     @property
     def x86_name(self):
         '''[x86] Mangled function name.'''
         return '_f_%s' % self.name
 
-    def to_x86_asm(self):
+    def x86_inline_call(self, call, env):
+        '''[x86] Generate code for the call of the function, to be used in
+        place of a real call. Return None if the call can't be inlined.'''
+        return None
+
+    def to_x86_asm(self, allocate_registers=False, sse2=False):
+        '''[x86] Generate code. If 'allocate_registers' is true, keep variables
+        and temporaries in registers where possible. If 'sse2' is true, compute
+        doubles with SSE2 instructions; they are still passed to and returned
+        from functions as the calling convention requires (the latter in
+        st0).'''
         result = [
             x86.SyncESP(),
-            '%s:' % self.x86_name,
+            x86.Label(self.x86_name),
         ]
-        result += self.value.to_x86_asm(x86.Env())
+        env = x86.Env(sse2=sse2)
+        if allocate_registers:
+            import registers
+            env.registers = registers.allocate(self)
+            # Callee-saved registers used by the body, restored by x86.Return.
+            # Local variables are kept below them:
+            result += [x86.Instruction('push', register) for register in env.registers.saved]
+            env.vsp = 4 * len(env.registers.saved)
+        result += self.value.to_x86_asm(env)
         result += x86.SyncESP(),
         return result
 
@@ -360,6 +746,12 @@ class evaluation(statement):
     def get_var_refs(self):
         return self.expression.get_var_refs()
 
+    def get_children(self):
+        return self.expression,
+
+    def transform(self, function):
+        self.expression = function(self.expression)
+
     def check_var_usage(self, lsv, rsv):
         return self.expression.check_var_usage(lsv, rsv)
 
@@ -367,6 +759,12 @@ class evaluation(statement):
         result = self.expression.to_py() + [(bp.POP_TOP, None)]
         return result
 
+    def to_py3(self):
+        return self.expression.py3_evaluate()
+
+    def to_closure(self, env):
+        return self.expression.closure_evaluate(env)
+
     def to_x86_asm(self, env):
         return \
             self.expression.to_x86_asm(env) + \
@@ -396,6 +794,12 @@ class declaration(statement):
             result += variable.get_var_refs()
         return result
 
+    def get_children(self):
+        return self.variables
+
+    def transform(self, function):
+        self.variables = [function(variable) for variable in self.variables]
+
     def check_var_usage(self, lsv, rsv):
         ok = True
         for variable in self.variables:
@@ -408,13 +812,29 @@ class declaration(statement):
             result += var.py_write()
         return result
 
+    def to_py3(self):
+        result = []
+        for var in self.variables:
+            result += var.py3_write(lineno=self.y)
+        return result
+
+    def to_closure(self, env):
+        result = []
+        for var in self.variables:
+            env.declare(var, assigned=var.value is not None)
+            if var.value is not None:
+                result += var.closure_write(env),
+        return closures.block(result)
+
     def to_x86_asm(self, env):
         salloc = 0
         for var in self.variables:
+            if var.x86_register is not None:
+                continue
             size = var.type.x86_size()
             env.vsp += size
             salloc += size
-            var.uid = '##(-%d)' % env.vsp
+            var.uid = x86.Frame(-env.vsp)
         result = [x86.SubESP(salloc)]
         for var in self.variables:
             result += var.x86_asm_write(var.value, env)
@@ -445,10 +865,23 @@ class argv(declaration):
             var.uid = '_%d' % no
         return []
 
+    to_py3 = to_py
+
+    def to_closure(self, env):
+        for var in self.variables:
+            env.declare(var)
+        return closures.block([])
+
     def to_x86_asm(self, env):
-        for i, var in enumerate(self.variables):
-            var.uid = '##(%d)' % (4 * (i + 1))
-        return []
+        result = []
+        # Arguments are pushed in the reverse order, above the return address:
+        offset = 4
+        for var in self.variables:
+            var.uid = x86.Frame(offset)
+            offset += var.type.x86_size()
+            if var.x86_register is not None:
+                result += x86.Instruction('mov', var.x86_register, var.uid),
+        return result
 
     def __str__(self):
         return 'argv: ' + ', '.join(str(var) for var in self.variables)
@@ -484,6 +917,14 @@ class if_then_else(statement):
     def get_var_refs(self):
         return self.expression.get_var_refs()
 
+    def get_children(self):
+        return self.expression, self.then_s, self.else_s
+
+    def transform(self, function):
+        self.expression = function(self.expression)
+        self.then_s = function(self.then_s)
+        self.else_s = function(self.else_s)
+
     def check_var_usage(self, lsv, rsv):
         ok = self.expression.check_var_usage(lsv, rsv)
         lsv_if = set(lsv)
@@ -501,31 +942,48 @@ class if_then_else(statement):
         label_else = bp.Label()
         label_endif = bp.Label()
         result = [(bp.SetLineno, self.y)]
-        result += self.expression.to_py()
-        result += bp.jump_if_false(label_else)
+        result += self.expression.py_branch(label_else, False)
         result += self.then_s.to_py()
         result += [
             (bp.JUMP_FORWARD, label_endif),
-            (label_else, None),
-            (bp.POP_TOP, None)
+            (label_else, None)
         ]
         result += self.else_s.to_py()
         result += (label_endif, None),
         return result
 
+    def to_py3(self):
+        return [
+            py3.node('If', self.y,
+                test=self.expression.to_py3(),
+                body=self.then_s.to_py3() or [py3.node('Pass')],
+                orelse=self.else_s.to_py3()
+            )
+        ]
+
+    def to_closure(self, env):
+        returns = [block.contents[0] for block in (self.then_s, self.else_s) if len(block.contents) == 1]
+        if len(returns) == 2 and all(isinstance(line, return_statement) and line.expression is not None for line in returns):
+            return closures.if_return(*[item.to_closure(env) for item in [self.expression] + [line.expression for line in returns]])
+        return closures.if_then_else(
+            self.expression.to_closure(env),
+            self.then_s.to_closure(env),
+            self.else_s.to_closure(env)
+        )
+
     def to_x86_asm(self, env):
         label_else = x86.Label()
         label_endif = x86.Label()
         result = []
         result += self.expression.to_x86_asm(env)
         result += [
-            'or eax, eax',
-            'jz %s' % label_else
+            x86.Instruction('or', 'eax', 'eax'),
+            x86.Instruction('jz', label_else)
         ]
         result += self.expression.x86_asm_discard(env)
         result += self.then_s.to_x86_asm(env)
         result += [
-            'jmp %s' % label_endif,
+            x86.Instruction('jmp', label_endif),
             label_else
         ]
         result += self.else_s.to_x86_asm(env)
@@ -535,6 +993,22 @@ class if_then_else(statement):
     def __str__(self):
         return 'if %s:\n%s\nelse:\n%s\nendif' % (self.expression, self.then_s, self.else_s)
 
+# For counted loops: (sign of the step, adjustment of the bound) for each
+# comparison operator of the loop condition:
+_py_counted_ops = {
+    '<': (1, 0),
+    '<=': (1, 1),
+    '>': (-1, 0),
+    '>=': (-1, -1),
+}
+
+_py_swapped_ops = {
+    '<': '>',
+    '<=': '>=',
+    '>': '<',
+    '>=': '<=',
+}
+
 class while_loop(statement):
 
     '''A loop.'''
@@ -566,13 +1040,127 @@ class while_loop(statement):
     def get_var_refs(self):
         return self.expression.get_var_refs()
 
+    def get_children(self):
+        return self.expression, self.then_s, self.finally_s
+
+    def transform(self, function):
+        self.expression = function(self.expression)
+        self.then_s = function(self.then_s)
+        self.finally_s = function(self.finally_s)
+
     def check_var_usage(self, lsv, rsv):
         ok = self.expression.check_var_usage(lsv, rsv)
         ok &= self.then_s.check_var_usage(set(lsv), rsv)
         ok &= self.finally_s.check_var_usage(set(lsv), rsv)
         return ok
 
+    def _py_match_counted(self):
+        '''[py] Check if the loop is a counted one, i.e. it increments an int
+        variable by a constant, until it reaches a loop-invariant bound.
+        Return a (variable, step, bound, adjustment) tuple or None.'''
+        import expression
+        from optimizer import match_increment, walk
+        if len(self.finally_s.contents) != 1:
+            return
+        match = match_increment(self.finally_s.contents[0])
+        if match is None:
+            return
+        var, step = match
+        condition = self.expression
+        if not isinstance(condition, expression.binary_operator):
+            return
+        op = condition.operator
+        bound = condition.right
+        if isinstance(condition.left, expression.reference) and condition.left.bind is var:
+            pass
+        elif isinstance(condition.right, expression.reference) and condition.right.bind is var:
+            op = _py_swapped_ops.get(op)
+            bound = condition.left
+        else:
+            return
+        if op not in _py_counted_ops:
+            return
+        sign, adjustment = _py_counted_ops[op]
+        if step * sign <= 0:
+            return
+        assigned = set()
+        for node in walk(self):
+            if isinstance(node, expression.assignment):
+                assigned.add(node.lvalue.bind)
+            elif isinstance(node, variable):
+                assigned.add(node)
+        for node in walk(self.then_s):
+            if isinstance(node, expression.assignment) and node.lvalue.bind is var:
+                return
+        for node in walk(bound):
+            if isinstance(node, expression.const):
+                continue
+            elif isinstance(node, expression.reference):
+                if isinstance(node.bind, function) or node.bind in assigned:
+                    return
+            elif isinstance(node, expression.binary_operator) and node.operator in ('+', '-', '*'):
+                continue
+            elif isinstance(node, expression.unary_operator) and node.operator == '-':
+                continue
+            else:
+                return
+            if node.type != type.int_t:
+                return
+        return var, step, bound, adjustment
+
+    def _py_counted_to_py(self, var, step, bound, adjustment):
+        '''[py] Generate code for a counted loop, iterating over an xrange.'''
+        loop_label = bp.Label()
+        exhausted_label = bp.Label()
+        end_label = bp.Label()
+        result = [
+            (bp.SetLineno, self.y),
+            (bp.SETUP_LOOP, end_label),
+            (bp.LOAD_GLOBAL, '*xrange')
+        ]
+        result += var.py_read()
+        result += bound.to_py()
+        if adjustment:
+            result += [
+                (bp.LOAD_CONST, adjustment),
+                (bp.BINARY_ADD, None)
+            ]
+        result += [
+            (bp.LOAD_CONST, step),
+            (bp.CALL_FUNCTION, 3),
+            (bp.GET_ITER, None)
+        ]
+        # The variable is set to (last value + step) after the loop. If the
+        # loop body is never executed, the variable must retain its initial
+        # value, so start with (initial value - step):
+        result += var.py_read()
+        result += [
+            (bp.LOAD_CONST, step),
+            (bp.BINARY_SUBTRACT, None),
+            (bp.STORE_FAST, var.uid),
+            (loop_label, None),
+            (bp.FOR_ITER, exhausted_label),
+            (bp.STORE_FAST, var.uid)
+        ]
+        result += self.then_s.to_py()
+        result += [
+            (bp.JUMP_ABSOLUTE, loop_label),
+            (exhausted_label, None),
+            (bp.POP_BLOCK, None),
+            (end_label, None)
+        ]
+        result += var.py_read()
+        result += [
+            (bp.LOAD_CONST, step),
+            (bp.BINARY_ADD, None),
+            (bp.STORE_FAST, var.uid)
+        ]
+        return result
+
     def to_py(self):
+        counted = self._py_match_counted()
+        if counted is not None:
+            return self._py_counted_to_py(*counted)
         loop_label = bp.Label()
         finally_label = bp.Label()
         end_label = bp.Label()
@@ -583,21 +1171,59 @@ class while_loop(statement):
         ]
         result += self.finally_s.to_py()
         result += (loop_label, None),
-        result += self.expression.to_py()
-        result += bp.jump_if_false(end_label)
+        result += self.expression.py_branch(end_label, False)
         result += self.then_s.to_py()
         result += [
             (bp.JUMP_ABSOLUTE, finally_label),
-            (end_label, None),
-            (bp.POP_TOP, None)
+            (end_label, None)
         ]
         return result
 
+    def _py3_counted_to_py3(self, var, step, bound, adjustment):
+        '''[py3] Generate Python AST for a counted loop, iterating over a
+        range.'''
+        stop = bound.to_py3()
+        if adjustment:
+            stop = py3.node('BinOp', left=stop, op=py3.node('Add'), right=py3.constant(adjustment))
+        start = py3.node('BinOp', left=var.py3_read(), op=py3.node('Add'), right=py3.constant(step))
+        # See _py_counted_to_py() for why the variable is first decremented:
+        return [
+            py3.assign(var.uid, py3.node('BinOp', left=var.py3_read(), op=py3.node('Sub'), right=py3.constant(step)), self.y),
+            py3.node('For', self.y,
+                target=py3.name(var.uid, store=True),
+                iter=py3.call('*range', [start, stop, py3.constant(step)]),
+                body=self.then_s.to_py3() or [py3.node('Pass')]
+            ),
+            py3.assign(var.uid, py3.node('BinOp', left=var.py3_read(), op=py3.node('Add'), right=py3.constant(step)), self.y)
+        ]
+
+    def to_py3(self):
+        counted = self._py_match_counted()
+        if counted is not None:
+            return self._py3_counted_to_py3(*counted)
+        return [
+            py3.node('While', self.y,
+                test=self.expression.to_py3(),
+                body=(self.then_s.to_py3() + self.finally_s.to_py3()) or [py3.node('Pass')]
+            )
+        ]
+
+    def to_closure(self, env):
+        counted = self._py_match_counted()
+        if counted is not None:
+            var, step, bound, adjustment = counted
+            return closures.counted_loop(env.slot(var), step, bound.to_closure(env), adjustment, self.then_s.to_closure(env))
+        return closures.while_loop(
+            self.expression.to_closure(env),
+            self.then_s.to_closure(env),
+            self.finally_s.to_closure(env)
+        )
+
     def to_x86_asm(self, env):
         loop_label = x86.Label()
         condition_label = x86.Label()
         result = [
-            'jmp %s' % condition_label,
+            x86.Instruction('jmp', condition_label),
         ]
         result += loop_label,
         result += self.then_s.to_x86_asm(env)
@@ -605,8 +1231,8 @@ class while_loop(statement):
         result += condition_label,
         result += self.expression.to_x86_asm(env)
         result += [
-            'or eax, eax',
-            'jnz %s' % loop_label,
+            x86.Instruction('or', 'eax', 'eax'),
+            x86.Instruction('jnz', loop_label),
         ]
         return result
 
@@ -652,6 +1278,16 @@ class return_statement(statement):
         else:
             return self.expression.get_var_refs()
 
+    def get_children(self):
+        if self.expression is None:
+            return ()
+        else:
+            return self.expression,
+
+    def transform(self, function):
+        if self.expression is not None:
+            self.expression = function(self.expression)
+
     def check_var_usage(self, lsv, rsv):
         if self.expression is None:
             return True
@@ -671,11 +1307,27 @@ class return_statement(statement):
         result += (bp.RETURN_VALUE, None),
         return result
 
+    def to_py3(self):
+        value = None
+        if self.expression is not None:
+            value = self.expression.to_py3()
+        return [py3.node('Return', self.y, value=value)]
+
+    def to_closure(self, env):
+        value = None
+        if self.expression is not None:
+            value = self.expression.to_closure(env)
+        return closures.return_value(value)
+
     def to_x86_asm(self, env):
         result = []
         if self.expression is not None:
             result += self.expression.to_x86_asm(env)
-        result += x86.Return(),
+            result += self.expression.type.x86_asm_return(env)
+        if env.registers is not None:
+            result += x86.Return(env.registers.saved),
+        else:
+            result += x86.Return(),
         return result
 
     def __str__(self):
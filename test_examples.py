@@ -21,6 +21,7 @@
 # SOFTWARE.
 
 from nose.tools import assert_equal, assert_not_equal
+from nose.plugins.skip import SkipTest
 
 try:
     from nose.tools import assert_multi_line_equal
@@ -29,6 +30,8 @@ except ImportError:
 
 import os
 import glob
+import json
+import shutil
 import stat
 import tempfile
 import subprocess as ipc
@@ -37,6 +40,7 @@ class test_examples:
 
     abstract = True
     python = os.getenv('PYTHON') or 'python'
+    python3 = os.getenv('PYTHON3') or 'python3'
 
     def _compile(self, filename, output_filename=None):
         if output_filename is None:
@@ -117,4 +121,545 @@ class test_python(test_examples):
     jtc_args = ['-P']
     runner = [test_examples.python]
 
+class test_x86_optimized(test_examples):
+
+    abstract = False
+    jtc_args = ['-X', '-O']
+    runner = []
+
+class test_python_optimized(test_examples):
+
+    abstract = False
+    jtc_args = ['-P', '-O', '--verify-each']
+    runner = [test_examples.python]
+
+class test_python_optimized_o1(test_examples):
+
+    abstract = False
+    jtc_args = ['-P', '-O1', '--verify-each']
+    runner = [test_examples.python]
+
+class test_x86_parallel(test_examples):
+
+    abstract = False
+    jtc_args = ['-X', '-j', '2']
+    runner = []
+
+class test_x86_allocate_registers(test_examples):
+
+    abstract = False
+    jtc_args = ['-X', '--enable-pass=allocate-registers', '-j', '2']
+    runner = []
+
+class test_x86_peephole(test_examples):
+
+    abstract = False
+    jtc_args = ['-X', '--enable-pass=peephole']
+    runner = []
+
+class test_x86_sse2(test_examples):
+
+    abstract = False
+    jtc_args = ['-X', '--sse2']
+    runner = []
+
+class test_x86_sse2_optimized(test_examples):
+
+    abstract = False
+    jtc_args = ['-X', '-O', '--enable-pass=sse2']
+    runner = []
+
+class test_python_parallel(test_examples):
+
+    abstract = False
+    jtc_args = ['-P', '-j', '2']
+    runner = [test_examples.python]
+
+class test_python_optimized_parallel(test_examples):
+
+    abstract = False
+    jtc_args = ['-P', '-O', '-j', '2']
+    runner = [test_examples.python]
+
+class test_python_lazy_load(test_examples):
+
+    abstract = False
+    jtc_args = ['-P', '-O', '--enable-pass=lazy-load']
+    runner = [test_examples.python]
+
+class test_python_shared_runtime(test_examples):
+
+    abstract = False
+    jtc_args = ['-P', '--shared-runtime']
+    runner = [test_examples.python]
+
+    def setup(self):
+        # The runtime module is installed next to the executable:
+        self.directory = tempfile.mkdtemp(prefix='jtc-testsuite.')
+        self.executable = os.path.join(self.directory, 'program')
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stale_runtime(self):
+        if self.abstract:
+            return
+        runtime_filename = os.path.join(self.directory, 'jtc_runtime.pyc')
+        with open(runtime_filename, 'wb') as runtime_file:
+            runtime_file.write(b'stale')
+        self._test_good('examples/good/core001.jl')
+
+    def test_without_sources(self):
+        # The compiler needs only the bytecode of its modules:
+        if self.abstract:
+            return
+        import py_compile
+        source_filename = os.path.abspath('examples/good/core001.jl')
+        # Make sure that the parser tables are generated:
+        rc = ipc.call([self.python, './jtc', '-T', source_filename, '-o', os.devnull])
+        assert_equal(rc, 0)
+        compiler_directory = os.path.join(self.directory, 'compiler')
+        os.mkdir(compiler_directory)
+        for filename in glob.glob('*.py'):
+            if filename != 'test_examples.py':
+                py_compile.compile(filename, os.path.join(compiler_directory, filename + 'c'), doraise=True)
+        shutil.copy('jtc', compiler_directory)
+        rc = ipc.call([self.python, 'jtc'] + self.jtc_args + [source_filename, '-o', self.executable], cwd=compiler_directory)
+        assert_equal(rc, 0)
+        child = ipc.Popen(self.runner + [self.executable], stdin=ipc.PIPE, stdout=ipc.PIPE)
+        stdout = child.communicate()[0]
+        assert_equal(child.returncode, 0)
+        with open('examples/good/core001.output', 'rb') as output_file:
+            assert_equal(stdout, output_file.read())
+
+class test_python_shared_runtime_optimized(test_python_shared_runtime):
+
+    abstract = False
+    jtc_args = ['-P', '-O', '--shared-runtime']
+
+class test_run_examples(test_examples):
+
+    '''Examples run with "jtc run".'''
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def _compile(self, filename, output_filename=None):
+        # Good programs are compiled when they are run:
+        self.executable = filename
+        if output_filename is None:
+            return 0, b''
+        with open(os.devnull, 'rb') as input_file:
+            child = ipc.Popen(self.runner + [filename], stdin=input_file, stderr=ipc.PIPE)
+            stderr = child.stderr.read()
+            rc = child.wait()
+        return rc, stderr
+
+class test_run(test_run_examples):
+
+    abstract = False
+    runner = [test_examples.python, './jtc', 'run']
+
+    def test_repeat(self):
+        fd, source_filename = tempfile.mkstemp(prefix='jtc-testsuite.', suffix='.jl')
+        os.write(fd, b'int main() { int n = readInt(); printInt(n * 2); return n; }')
+        os.close(fd)
+        fd, executable = tempfile.mkstemp(prefix='jtc-testsuite.')
+        os.close(fd)
+        script = (
+            'import marshal, sys, StringIO, runner\n'
+            'code = marshal.loads(open(sys.argv[1], "rb").read()[8:])\n'
+            'for text in sys.argv[2:]:\n'
+            '    sys.stdin = StringIO.StringIO(text)\n'
+            '    sys.stdout = StringIO.StringIO()\n'
+            '    status = runner.execute(code)\n'
+            '    output = sys.stdout.getvalue()\n'
+            '    sys.stdout = sys.__stdout__\n'
+            '    print("%d %r" % (status, output))\n'
+        )
+        try:
+            rc = ipc.call([test_examples.python, './jtc', '-P', '-O', source_filename, '-o', executable])
+            assert_equal(rc, 0)
+            child = ipc.Popen([test_examples.python, '-c', script, executable, '3\n', '4\n'], stdout=ipc.PIPE)
+            stdout = child.stdout.read()
+            assert_equal(child.wait(), 0)
+            assert_equal(stdout.decode().splitlines(), ["3 '6\\n'", "4 '8\\n'"])
+        finally:
+            os.unlink(source_filename)
+            os.unlink(executable)
+
+class test_run_optimized(test_run_examples):
+
+    abstract = False
+    runner = [test_examples.python, './jtc', 'run', '-O']
+
+class test_closures(test_run_examples):
+
+    abstract = False
+    runner = [test_examples.python, './jtc', 'run', '-C']
+
+class test_closures_optimized(test_run_examples):
+
+    abstract = False
+    runner = [test_examples.python, './jtc', 'run', '-C', '-O']
+
+class test_closures_errors:
+
+    '''Runtime errors of programs run with the closure engine, which must be
+    the same as with Python bytecode.'''
+
+    def _run(self, source, jtc_args, input):
+        fd, source_filename = tempfile.mkstemp(prefix='jtc-testsuite.', suffix='.jl')
+        os.write(fd, source.encode())
+        os.close(fd)
+        try:
+            child = ipc.Popen([test_examples.python, './jtc', 'run'] + jtc_args + [source_filename],
+                stdin=ipc.PIPE,
+                stdout=ipc.PIPE,
+                stderr=ipc.PIPE
+            )
+            stdout, stderr = child.communicate(input.encode())
+            stderr = stderr.decode().splitlines()[-1]
+            return stdout, stderr, child.returncode
+        finally:
+            os.unlink(source_filename)
+
+    def _test(self, source, input=''):
+        expected = self._run(source, [], input)
+        assert_equal(expected[2], 1)
+        result = self._run(source, ['-C'], input)
+        assert_equal(result, expected)
+
+    def test_error(self):
+        self._test('int main() { printInt(1); error(); return 0; }')
+
+    def test_zero_division(self):
+        self._test('int main() { printInt(1); printInt(1 / readInt()); return 0; }', '0\n')
+
+    def test_double_zero_division(self):
+        self._test('int main() { printDouble(1.0 / readDouble()); return 0; }', '0\n')
+
+    def test_eof(self):
+        self._test('int main() { printInt(readInt()); printInt(readInt()); return 0; }', '1\n')
+
+    def test_invalid_input(self):
+        self._test('int main() { printInt(readInt()); return 0; }', 'x\n')
+
+    def test_recursion(self):
+        self._test('int f(int n) { return f(n + 1); } int main() { return f(0); }')
+
+class test_options:
+
+    '''Parsing of the -O and -P3 options.'''
+
+    def _run(self, jtc_args):
+        fd, source_filename = tempfile.mkstemp(prefix='jtc-testsuite.', suffix='.jl')
+        os.write(fd, b'int main() { printInt(2 + 3); return 0; }')
+        os.close(fd)
+        try:
+            child = ipc.Popen([test_examples.python, './jtc'] + jtc_args + [source_filename],
+                stdin=ipc.PIPE,
+                stdout=ipc.PIPE,
+                stderr=ipc.PIPE
+            )
+            stdout, stderr = child.communicate()
+            return stdout.decode(), child.returncode
+        finally:
+            os.unlink(source_filename)
+
+    def _test_folded(self, jtc_args, folded):
+        stdout, rc = self._run(jtc_args)
+        assert_equal(rc, 0)
+        assert_equal('$printInt(5)' in stdout, folded)
+        assert_equal('$printInt((2 + 3))' in stdout, not folded)
+
+    def test_pretty_print(self):
+        self._test_folded(['-T'], False)
+
+    def test_pretty_print_optimized(self):
+        # The tree is printed after the optimization passes:
+        self._test_folded(['-T', '-O'], True)
+        self._test_folded(['-O', '-T'], True)
+        self._test_folded(['-T', '-O2'], True)
+        self._test_folded(['-TO'], True)
+        self._test_folded(['-T', '-O2', '-O0'], False)
+
+    def test_python3(self):
+        stdout, rc = self._run(['-P3', '-T'])
+        assert_equal(rc, 0)
+
+    def test_invalid(self):
+        for jtc_args in ['-3'], ['-O3'], ['-Ox'], ['-P', '-O', '2']:
+            stdout, rc = self._run(['-T'] + jtc_args)
+            assert_equal(rc, 1)
+
+class test_batch:
+
+    '''Running a compiled program over many inputs with jtc batch.'''
+
+    source = b'int main() { int n = readInt(); if (n < 0) error(); printInt(n * 2); return 0; }'
+    inputs = ['1\n', '-1\n', '', '2\n']
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp(prefix='jtc-testsuite.')
+        self.source_filename = os.path.join(self.directory, 'program.jl')
+        with open(self.source_filename, 'wb') as file:
+            file.write(self.source)
+        self.input_filenames = []
+        for n, input in enumerate(self.inputs):
+            filename = os.path.join(self.directory, '%d.input' % n)
+            with open(filename, 'w') as file:
+                file.write(input)
+            self.input_filenames += filename,
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def _test(self, jtc_args, batch_args):
+        executable = os.path.join(self.directory, 'program')
+        rc = ipc.call([test_examples.python, './jtc'] + jtc_args + [self.source_filename, '-o', executable])
+        assert_equal(rc, 0)
+        output_directory = os.path.join(self.directory, 'output')
+        os.mkdir(output_directory)
+        child = ipc.Popen(
+            [test_examples.python, './jtc', 'batch', '-d', output_directory] + batch_args + [executable] + self.input_filenames,
+            stdout=ipc.PIPE
+        )
+        stdout = child.stdout.read()
+        assert_equal(child.wait(), 0)
+        results = json.loads(stdout.decode())
+        assert_equal([result['input'] for result in results], self.input_filenames)
+        assert_equal([result['status'] for result in results], [0, 1, 1, 0])
+        outputs = []
+        for result in results:
+            with open(result['stdout'], 'rb') as file:
+                outputs += file.read(),
+        assert_equal(outputs, [b'2\n', b'', b'', b'4\n'])
+        with open(results[1]['stderr'], 'rb') as file:
+            assert_equal(file.read().splitlines()[-1], b'RuntimeError')
+
+    def test_python(self):
+        self._test(['-P'], [])
+
+    def test_python_jobs(self):
+        self._test(['-P', '-O'], ['-j', '3'])
+
+    def test_x86(self):
+        self._test(['-X'], ['-j', '2'])
+
+class test_vectorize:
+
+    '''Batched evaluation of Javalette functions with NumPy.'''
+
+    source = '''
+        int collatz(int n) {
+            int steps = 0;
+            while (n != 1) {
+                if (n % 2 == 0) n = n / 2; else n = 3 * n + 1;
+                steps++;
+            }
+            return steps;
+        }
+        int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+        int divmod(int a, int b) { if (a / b < 100) return a / b * 1000 + a % b; return 0; }
+        int safe_divmod(int a, int b) { if (b != 0) return divmod(a, b); return 0; }
+        int mul(int a, int b) { return a * b; }
+        double mean(double a, double b) { return (a + b) / 2.0; }
+        int unassigned(int a) { int x; if (a > 0) x = a; return x; }
+        int main() { printInt(fib(10)); return 0; }
+    '''
+
+    def setup(self):
+        rc = ipc.call([test_examples.python, '-c', 'import numpy'], stderr=ipc.PIPE)
+        if rc != 0:
+            raise SkipTest('NumPy is not installed')
+
+    def _run(self, script):
+        child = ipc.Popen([test_examples.python, '-c',
+            'import numpy, vectorize\n'
+            'program = vectorize.load(%r)\n' % self.source + script
+        ], stdout=ipc.PIPE, stderr=ipc.PIPE)
+        stdout, stderr = child.communicate()
+        assert_equal(stderr.decode(), '')
+        assert_equal(child.returncode, 0)
+        return stdout.decode().splitlines()
+
+    def _test(self, name, arguments, expected):
+        result = self._run('print(vectorize.vectorize(program, %r)(*%r).tolist())' % (name, arguments))
+        assert_equal(result, [repr(expected)])
+
+    def test_while_loop(self):
+        self._test('collatz', [list(range(1, 11))], [0, 1, 7, 2, 5, 8, 16, 3, 19, 6])
+
+    def test_recursion(self):
+        self._test('fib', [list(range(15))], [0, 1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377])
+
+    def test_division(self):
+        # Rounding towards negative infinity; no ZeroDivisionError for lanes
+        # in which the division is not evaluated:
+        self._test('safe_divmod', [[7, -7, 7, -7, 5, 700], [2, 2, -2, -2, 0, 1]], [3001, -3999, -4001, 2999, 0, 0])
+
+    def test_overflow(self):
+        self._test('mul', [[65536, 3], 65536], [0, 196608])
+
+    def test_unassigned(self):
+        self._test('unassigned', [[2, 1]], [2, 1])
+
+    def test_double(self):
+        self._test('mean', [[1, 2.5], 2], [1.5, 2.25])
+
+    def test_broadcast(self):
+        result = self._run('print(vectorize.vectorize(program, "mul")(numpy.arange(3).reshape(3, 1), [1, 10]).tolist())')
+        assert_equal(result, ['[[0, 0], [1, 10], [2, 20]]'])
+
+    def test_errors(self):
+        result = self._run(
+            'for name, arguments in [("unassigned", [[1, 0]]), ("divmod", [[1, 1], [1, 0]])]:\n'
+            '    try:\n'
+            '        vectorize.vectorize(program, name)(*arguments)\n'
+            '    except Exception as exception:\n'
+            '        print(type(exception).__name__)\n'
+            'try:\n'
+            '    vectorize.vectorize(program, "main")\n'
+            'except vectorize.VectorizeError as exception:\n'
+            '    print(exception)\n'
+        )
+        assert_equal(result, [
+            'UnboundLocalError',
+            'ZeroDivisionError',
+            "[16.30] Call of built-in function 'printInt' cannot be vectorized",
+        ])
+
+class test_x86_peephole_rules:
+
+    '''Rules of the x86 peephole optimizer.'''
+
+    def _optimize(self, listing):
+        child = ipc.Popen([test_examples.python, '-c',
+            'import x86, x86peephole\n'
+            'listing = x86.parse(%r)\n' % listing +
+            'x86peephole.optimize(listing)\n'
+            'print("\\n".join(x86.render(listing).lines))\n'
+        ], stdout=ipc.PIPE, stderr=ipc.PIPE)
+        stdout, stderr = child.communicate()
+        assert_equal(stderr.decode(), '')
+        assert_equal(child.returncode, 0)
+        return [line.strip() for line in stdout.decode().splitlines()]
+
+    def test_true(self):
+        result = self._optimize(['xor eax, eax', 'inc eax', 'cmp ecx, 2', 'jz l', 'l:', 'ret'])
+        assert_equal(result, ['mov eax, 1', 'cmp ecx, 2', 'jz l', 'l:', 'ret'])
+
+    def test_true_flags_read(self):
+        # The flags that inc sets are read by a later instruction:
+        listing = ['xor eax, eax', 'inc eax', 'mov ecx, 1', 'jz l', 'l:', 'ret']
+        assert_equal(self._optimize(listing), listing)
+
+    def test_true_label(self):
+        # Code that jumps to the label may read the flags:
+        listing = ['xor eax, eax', 'inc eax', 'l:', 'mov ecx, 1', 'cmp ecx, 2', 'ret']
+        assert_equal(self._optimize(listing), listing)
+
+class test_python3(test_examples):
+
+    abstract = False
+    jtc_args = ['-P3']
+    runner = [test_examples.python3]
+
+class test_python3_optimized(test_examples):
+
+    abstract = False
+    jtc_args = ['-P3', '-O', '--verify-each']
+    runner = [test_examples.python3]
+
+class test_python3_parallel(test_examples):
+
+    abstract = False
+    jtc_args = ['-P3', '-j', '2']
+    runner = [test_examples.python3]
+
+class test_source(test_examples):
+
+    abstract = False
+    jtc_args = ['-S']
+    runner = [test_examples.python]
+
+class test_source_optimized(test_examples):
+
+    abstract = False
+    jtc_args = ['-S', '-O']
+    runner = [test_examples.python]
+
+class test_source_python3(test_examples):
+
+    abstract = False
+    jtc_args = ['-S']
+    runner = [test_examples.python3]
+
+class test_buffered_io:
+
+    '''Runtime errors of programs compiled with and without buffered I/O.'''
+
+    def _run(self, source, jtc_args, input):
+        fd, source_filename = tempfile.mkstemp(prefix='jtc-testsuite.', suffix='.jl')
+        os.write(fd, source.encode())
+        os.close(fd)
+        fd, executable = tempfile.mkstemp(prefix='jtc-testsuite.')
+        os.close(fd)
+        try:
+            rc = ipc.call([test_examples.python, './jtc'] + jtc_args + [source_filename, '-o', executable])
+            assert_equal(rc, 0)
+            child = ipc.Popen([test_examples.python, executable],
+                stdin=ipc.PIPE,
+                stdout=ipc.PIPE,
+                stderr=ipc.PIPE
+            )
+            stdout, stderr = child.communicate(input.encode())
+            stderr = stderr.decode().splitlines()[-1]
+            return stdout, stderr, child.returncode
+        finally:
+            os.unlink(source_filename)
+            os.unlink(executable)
+
+    def _test(self, source, input, expected_stdout, expected_stderr):
+        for jtc_args in ['-P'], ['-P', '--enable-pass=buffer-io']:
+            stdout, stderr, rc = self._run(source, jtc_args, input)
+            assert_equal(stdout, expected_stdout.encode())
+            assert_equal(stderr, expected_stderr)
+            assert_equal(rc, 1)
+
+    def test_error(self):
+        self._test(
+            'int main() { printInt(readInt()); error(); return 0; }',
+            '42\n',
+            '42\n', 'RuntimeError'
+        )
+
+    def test_eof(self):
+        self._test(
+            'int main() { printInt(readInt()); printInt(readInt()); return 0; }',
+            '42',
+            '42\n', 'EOFError: EOF when reading a line'
+        )
+
+    def test_zero_division(self):
+        self._test(
+            'int main() { printString("x"); printInt(1 / (readInt() - 1)); return 0; }',
+            '1\n',
+            'x\n', 'ZeroDivisionError: integer division or modulo by zero'
+        )
+
+class test_assembler:
+
+    def test_byteplay_compatibility(self):
+        try:
+            import byteplay
+        except ImportError:
+            raise SkipTest('byteplay is not installed')
+        rc = ipc.call([test_examples.python, 'tools/bench-assembler', '-n', '0'])
+        assert_equal(rc, 0)
+
 # vim:ts=4 sts=4 sw=4 et
@@ -23,6 +23,8 @@
 '''Types of the Javalette language.'''
 
 import bp
+import closures
+import py3
 import x86
 
 from struct import pack
@@ -51,6 +53,14 @@ class base(object):
         if (self.is_numeric()):
             numeric_types.add(self)
 
+    def __copy__(self):
+        '''Types are immutable, so there is no need to copy them.'''
+        return self
+
+    def __deepcopy__(self, memo):
+        '''Types are immutable, so there is no need to copy them.'''
+        return self
+
     def is_eq_comparable(self):
         return False
 
@@ -73,6 +83,27 @@ class base(object):
         else:
             return NotImplemented
 
+    def py3_cast_to(self, type, value):
+        global void_type
+        if isinstance(type, void_type):
+            # Evaluate the value, but yield None:
+            return py3.node('IfExp', test=value, body=py3.constant(None), orelse=py3.constant(None))
+        else:
+            return NotImplemented
+
+    def closure_cast_to(self, type, value):
+        global void_type
+        if isinstance(type, void_type):
+            return closures.discard(value)
+        else:
+            return NotImplemented
+
+    def x86_asm_return(self, env):
+        return []
+
+    def x86_asm_returned(self, env):
+        return []
+
     _doc = {
         'is_eq_comparable': "Returns whether you can compare values of this type with '==' and '!=' operators.",
         'is_ineq_comparable': "Returns whether you can compare values of this type with '<', '<=', '>' etc. operators.",
@@ -80,8 +111,14 @@ class base(object):
         'is_castable_to': 'Return whether it is legal to cast this type to another type.',
         'py_cast_to': '[py] Generate code for type-casting a value of this type to the provided type.',
         'py_cast_from': '[py] Generate code for type-casting a value of the provided type to this type.',
+        'py3_cast_to': '[py3] Generate Python AST for type-casting the value (a Python AST) of this type to the provided type.',
+        'py3_cast_from': '[py3] Generate Python AST for type-casting the value (a Python AST) of the provided type to this type.',
+        'closure_cast_to': '[cl] Compile type-casting the value (a closure) of this type to the provided type.',
+        'closure_cast_from': '[cl] Compile type-casting the value (a closure) of the provided type to this type.',
         'x86_asm_push': '[x86] Generate code for pushing a value of this type.',
         'x86_asm_discard': '[x86] Generate code for discarding a value of this type.',
+        'x86_asm_return': '[x86] Generate code for moving a value of this type to where functions return it.',
+        'x86_asm_returned': '[x86] Generate code for moving a value of this type, returned by a function, to where expressions compute it.',
         'x86_size': '[x86] Return size of a value of this type.',
         'x86_asm_cast_to': '[x86] Generate code for type-casting a value of this type to the provided type.',
         'x86_asm_read': '[x86] Generate code for loading value of the variable (of this type).',
@@ -115,6 +152,18 @@ class py_simple_type(base):
             result = type.py_cast_from(self)
         return result
 
+    def py3_cast_to(self, type, value):
+        result = base.py3_cast_to(self, type, value)
+        if (result == NotImplemented):
+            result = type.py3_cast_from(self, value)
+        return result
+
+    def closure_cast_to(self, type, value):
+        result = base.closure_cast_to(self, type, value)
+        if (result == NotImplemented):
+            result = type.closure_cast_from(self, value)
+        return result
+
 class void_type(base):
 
     '''The void type'''
@@ -126,6 +175,20 @@ class void_type(base):
         else:
             raise NotImplementedError()
 
+    def py3_cast_to(self, type, value):
+        global void_type
+        if isinstance(type, void_type):
+            return value
+        else:
+            raise NotImplementedError()
+
+    def closure_cast_to(self, type, value):
+        global void_type
+        if isinstance(type, void_type):
+            return value
+        else:
+            raise NotImplementedError()
+
     def __str__(self):
         return 'void'
 
@@ -142,14 +205,14 @@ class x86_dword_type(base):
     def x86_asm_write(self, var, expression, env):
         result = []
         result += expression.to_x86_asm(env)
-        result += 'mov [%s], eax' % var.uid,
+        result += x86.Instruction('mov', var.x86_operand(), 'eax'),
         return result
 
     def x86_asm_read(self, var, env):
-        return ['mov eax, [%s]' % var.uid]
+        return [x86.Instruction('mov', 'eax', var.x86_operand())]
 
     def x86_asm_push(self, env):
-        return ['push eax']
+        return [x86.Instruction('push', 'eax')]
 
     def x86_asm_discard(self, env):
         return []
@@ -175,23 +238,31 @@ class int_type(numeric_type, py_simple_type, x86_dword_type):
             (bp.CALL_FUNCTION, 1)
         ]
 
+    def py3_cast_from(self, type, value):
+        return py3.call('*int', [value])
+
+    def closure_cast_from(self, type, value):
+        return closures.convert(int, value)
+
     def x86_asm_const(self, value, env):
-        return ['mov eax, %d' % value]
+        return [x86.Instruction('mov', 'eax', value)]
 
     def x86_asm_cast_to(self, type, env):
         if isinstance(type, (void_type, int_type)):
             return []
         elif isinstance(type, double_type):
+            if env.sse2:
+                return [x86.Instruction('cvtsi2sd', 'xmm0', 'eax')]
             return [
-                'push eax',
-                'fild DWORD [esp]',
+                x86.Instruction('push', 'eax'),
+                x86.Instruction('fild', 'DWORD [esp]'),
                 x86.AddESP(4)
             ]
         elif isinstance(type, boolean_type):
             return [
-                'or eax, eax',
-                'setnz al',
-                'and eax, 1'
+                x86.Instruction('or', 'eax', 'eax'),
+                x86.Instruction('setnz', 'al'),
+                x86.Instruction('and', 'eax', 1)
             ]
         else:
             raise NotImplementedError()
@@ -210,6 +281,12 @@ class double_type(numeric_type, py_simple_type):
             (bp.CALL_FUNCTION, 1)
         ]
 
+    def py3_cast_from(self, type, value):
+        return py3.call('*float', [value])
+
+    def closure_cast_from(self, type, value):
+        return closures.convert(float, value)
+
     x86_consts = {
         1.0000000000000000000000000000000000: '1',
         3.1415926535897932384626433832795029: 'pi',
@@ -221,62 +298,113 @@ class double_type(numeric_type, py_simple_type):
     }
 
     def x86_asm_const(self, value, env):
+        if env.sse2:
+            data = pack('<d', value)
+            if data == pack('<d', 0.0):
+                # Positive zero only; -0.0 compares equal to it:
+                return [x86.Instruction('xorpd', 'xmm0', 'xmm0')]
+            const = x86.Const(data)
+            return [
+                const,
+                x86.Instruction('movsd', 'xmm0', 'QWORD [%s]' % const)
+            ]
         if value in double_type.x86_consts:
-            return ['fld%s' % double_type.x86_consts[value]]
+            return [x86.Instruction('fld%s' % double_type.x86_consts[value])]
         const = x86.Const(pack('<d', value))
         return [
             const,
-            'fld QWORD [%s]' % const
+            x86.Instruction('fld', 'QWORD [%s]' % const)
         ]
 
     def x86_asm_read(self, var, env):
-        return ['fld QWORD [%s]' % var.uid]
+        if env.sse2:
+            return [x86.Instruction('movsd', 'xmm0', var.uid.sized('QWORD'))]
+        return [x86.Instruction('fld', var.uid.sized('QWORD'))]
 
     def x86_asm_write(self, var, expression, env):
         result = []
         result += expression.to_x86_asm(env)
-        result += 'fstp QWORD [%s]' % var.uid,
+        if env.sse2:
+            result += x86.Instruction('movsd', var.uid.sized('QWORD'), 'xmm0'),
+        else:
+            result += x86.Instruction('fstp', var.uid.sized('QWORD')),
         return result
 
     def x86_asm_push(self, env):
+        if env.sse2:
+            return [
+                x86.SubESP(8),
+                x86.Instruction('movsd', 'QWORD [esp]', 'xmm0')
+            ]
         return [
             x86.SubESP(8),
-            'fstp QWORD [esp]'
+            x86.Instruction('fstp', 'QWORD [esp]')
         ]
 
     def x86_asm_discard(self, env):
-        return ['fstp st0']
+        if env.sse2:
+            return []
+        return [x86.Instruction('fstp', 'st0')]
+
+    def x86_asm_returned(self, env):
+        if env.sse2:
+            return [
+                x86.SubESP(8),
+                x86.Instruction('fstp', 'QWORD [esp]'),
+                x86.Instruction('movsd', 'xmm0', 'QWORD [esp]'),
+                x86.AddESP(8)
+            ]
+        return []
+
+    def x86_asm_return(self, env):
+        if env.sse2:
+            return [
+                x86.SubESP(8),
+                x86.Instruction('movsd', 'QWORD [esp]', 'xmm0'),
+                x86.Instruction('fld', 'QWORD [esp]'),
+                x86.AddESP(8)
+            ]
+        return []
 
     def x86_size(self):
         return 8
 
     def x86_asm_cast_to(self, type, env):
         if isinstance(type, void_type):
-            return ['fstp st0']
+            return self.x86_asm_discard(env)
         elif isinstance(type, double_type):
             return []
         elif isinstance(type, int_type):
+            if env.sse2:
+                return [x86.Instruction('cvttsd2si', 'eax', 'xmm0')]
             return [
                 x86.SubESP(12),
-                'fnstcw [esp + 4]',
-                'mov eax, [esp + 4]',
-                'and eax, 0xf3ff',
-                'or eax, 0x0400',
-                'mov [esp + 8], eax',
-                'fldcw [esp + 8]',
-                'fistp DWORD [esp]',
-                'fldcw [esp + 4]',
-                'pop eax',
+                x86.Instruction('fnstcw', '[esp + 4]'),
+                x86.Instruction('mov', 'eax', '[esp + 4]'),
+                x86.Instruction('and', 'eax', '0xf3ff'),
+                x86.Instruction('or', 'eax', '0x0c00'),
+                x86.Instruction('mov', '[esp + 8]', 'eax'),
+                x86.Instruction('fldcw', '[esp + 8]'),
+                x86.Instruction('fistp', 'DWORD [esp]'),
+                x86.Instruction('fldcw', '[esp + 4]'),
+                x86.Instruction('pop', 'eax'),
                 x86.AddESP(8)
             ]
         elif isinstance(type, boolean_type):
+            if env.sse2:
+                return [
+                    x86.Instruction('xorpd', 'xmm1', 'xmm1'),
+                    x86.Instruction('ucomisd', 'xmm0', 'xmm1'),
+                    x86.Instruction('setne', 'al'),
+                    x86.Instruction('and', 'eax', 1)
+                ]
             return [
-                'fldz',
-                'fucomi st0, st1',
-                'setne al',
-                'and eax, 1',
-                'fstp st0',
-                'fstp st0'
+                x86.Instruction('fldz'),
+                x86.Instruction('fucomi', 'st0', 'st1'),
+                x86.Instruction('setne', 'al'),
+                x86.Instruction('and', 'eax', 1),
+                x86.Instruction('fstp', 'st0'),
+                x86.Instruction('fstp', 'st0')
             ]
         else:
             raise NotImplementedError()
@@ -292,7 +420,7 @@ class string_type(x86_dword_type):
         const = x86.Const(value, '\0')
         return [
             const,
-            'mov eax, %s' % const
+            x86.Instruction('mov', 'eax', const)
         ]
 
     def x86_asm_cast_to(self, type, env):
@@ -312,8 +440,14 @@ class boolean_type(py_simple_type, x86_dword_type):
             (bp.CALL_FUNCTION, 1)
         ]
 
+    def py3_cast_from(self, type, value):
+        return py3.call('*bool', [value])
+
+    def closure_cast_from(self, type, value):
+        return closures.convert(bool, value)
+
     def x86_asm_const(self, value, env):
-        return ['xor eax, eax'] + ['inc eax'] * value
+        return [x86.Instruction('xor', 'eax', 'eax')] + [x86.Instruction('inc', 'eax')] * value
 
     def x86_asm_cast_to(self, type, env):
         if isinstance(type, (void_type, int_type, boolean_type)):
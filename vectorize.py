@@ -0,0 +1,407 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Batched evaluation of pure numeric functions with NumPy.
+
+A function whose arguments and result are numbers (or truth values), and which
+calls no built-in functions, directly or through other functions, can be
+compiled into NumPy operations over arrays of arguments. A single call of the
+compiled function computes the results for all the tuples of arguments (lanes)
+at once:
+
+- An expression is compiled into a function that takes the frame and the mask
+  of active lanes, and returns an array (or a scalar) of values. Values in the
+  inactive lanes are unspecified.
+- A statement is compiled into a function that takes the frame and the mask of
+  active lanes, and returns the mask of lanes that haven't returned yet.
+- A condition statement runs both of its branches, each under its own mask.
+  A loop is iterated until its condition is false in every lane.
+- A call runs the callee on the active lanes only.
+
+Values of the int type are 32-bit integers, which wrap around on overflow (as
+with the x86 back-end). Division rounds towards negative infinity, and errors
+(division by zero, reading a variable before assigning to it) are raised as
+with the Python back-end, if they happen in any active lane.'''
+
+from __future__ import division
+
+import numpy
+
+import builtins
+import closures
+import context
+import expression
+import syntax
+from error import JtError
+from type import int_t, double_t, boolean_t, void_t
+
+__all__ = ['VectorizeError', 'load', 'vectorize']
+
+class VectorizeError(JtError):
+    pass
+
+_dtypes = {
+    int_t: numpy.int32,
+    double_t: numpy.float64,
+    boolean_t: numpy.bool_,
+}
+
+def _dtype(type, position):
+    try:
+        return _dtypes[type]
+    except KeyError:
+        raise VectorizeError(position, 'Values of type <%s> cannot be vectorized' % type)
+
+class _Frame(object):
+
+    '''State of a vectorized call of a function.'''
+
+    def __init__(self, size, lanes, dtype):
+        # Values of the variables (None before the first assignment):
+        self.values = [None] * size
+        # Lanes in which the variables have been assigned to (only for
+        # variables that are not assigned to where they are declared):
+        self.assigned = [None] * size
+        self.result = numpy.zeros(lanes, dtype)
+
+def _read(slot):
+    def evaluate(frame, mask):
+        return frame.values[slot]
+    return evaluate
+
+def _read_checked(slot, name):
+    def evaluate(frame, mask):
+        assigned = frame.assigned[slot]
+        if assigned is None or (mask & ~assigned).any():
+            raise UnboundLocalError('local variable %r referenced before assignment' % name)
+        return frame.values[slot]
+    return evaluate
+
+def _write(slot, dtype, value, checked):
+    '''Return a closure that assigns the value to the variable in the active
+    lanes. If 'checked' is true, the lanes are recorded (see _read_checked()).'''
+    def evaluate(frame, mask):
+        result = value(frame, mask)
+        old = frame.values[slot]
+        if old is None:
+            old = numpy.zeros(len(mask), dtype)
+        frame.values[slot] = numpy.where(mask, result, old)
+        if checked:
+            assigned = frame.assigned[slot]
+            if assigned is not None:
+                mask = mask | assigned
+            frame.assigned[slot] = mask
+        return result
+    return evaluate
+
+def _const(value):
+    def evaluate(frame, mask):
+        return value
+    return evaluate
+
+def _operator(function, left, right):
+    def evaluate(frame, mask):
+        return function(left(frame, mask), right(frame, mask))
+    return evaluate
+
+def _division(function, message, left, right):
+    def evaluate(frame, mask):
+        dividend = left(frame, mask)
+        divisor = right(frame, mask)
+        if (mask & (divisor == 0)).any():
+            raise ZeroDivisionError(message)
+        return function(dividend, divisor)
+    return evaluate
+
+def _and(left, right):
+    def evaluate(frame, mask):
+        value = left(frame, mask)
+        return value & right(frame, mask & value)
+    return evaluate
+
+def _or(left, right):
+    def evaluate(frame, mask):
+        value = left(frame, mask)
+        return value | right(frame, mask & ~value)
+    return evaluate
+
+def _unary(function, operand):
+    def evaluate(frame, mask):
+        return function(operand(frame, mask))
+    return evaluate
+
+def _truncate(value, mask):
+    '''Convert doubles into ints (wrapping around), as int() would.'''
+    value = numpy.asarray(value)
+    invalid = mask & ~numpy.isfinite(value)
+    if invalid.any():
+        if numpy.isnan(value[invalid]).any():
+            raise ValueError('cannot convert float NaN to integer')
+        raise OverflowError('cannot convert float infinity to integer')
+    return numpy.fmod(numpy.trunc(value), 2.0 ** 32).astype(numpy.int64).astype(numpy.int32)
+
+def _cast(function, operand):
+    def evaluate(frame, mask):
+        return function(operand(frame, mask), mask)
+    return evaluate
+
+def _call(cell, dtype, arguments):
+    def evaluate(frame, mask):
+        values = [argument(frame, mask) for argument in arguments]
+        lanes = numpy.flatnonzero(mask)
+        if len(lanes) == len(mask):
+            return cell[0]([numpy.broadcast_to(value, mask.shape) for value in values], len(lanes))
+        result = numpy.zeros(len(mask), dtype)
+        if len(lanes) > 0:
+            values = [numpy.broadcast_to(value, mask.shape)[lanes] for value in values]
+            result[lanes] = cell[0](values, len(lanes))
+        return result
+    return evaluate
+
+def _evaluation(value):
+    def run(frame, mask):
+        value(frame, mask)
+        return mask
+    return run
+
+def _block(statements):
+    def run(frame, mask):
+        for statement in statements:
+            if not mask.any():
+                break
+            mask = statement(frame, mask)
+        return mask
+    return run
+
+def _if_then_else(test, then, orelse):
+    def run(frame, mask):
+        condition = test(frame, mask)
+        return then(frame, mask & condition) | orelse(frame, mask & ~condition)
+    return run
+
+def _while_loop(test, body, finally_):
+    def run(frame, mask):
+        # Lanes in which the condition has been false:
+        finished = numpy.zeros_like(mask)
+        while True:
+            condition = test(frame, mask)
+            finished |= mask & ~condition
+            mask = mask & condition
+            if not mask.any():
+                return finished
+            mask = finally_(frame, body(frame, mask))
+    return run
+
+def _return_value(value):
+    def run(frame, mask):
+        frame.result = numpy.where(mask, value(frame, mask), frame.result)
+        return numpy.zeros_like(mask)
+    return run
+
+def _function(body, size, dtype):
+    def call(arguments, lanes):
+        frame = _Frame(size, lanes, dtype)
+        frame.values[:len(arguments)] = arguments
+        body(frame, numpy.ones(lanes, bool))
+        return frame.result
+    return call
+
+_arithmetic_ops = {
+    '+': numpy.add,
+    '-': numpy.subtract,
+    '*': numpy.multiply,
+    '<': numpy.less,
+    '<=': numpy.less_equal,
+    '>': numpy.greater,
+    '>=': numpy.greater_equal,
+    '==': numpy.equal,
+    '!=': numpy.not_equal,
+}
+
+_division_ops = {
+    ('/', int_t): (numpy.floor_divide, 'integer division or modulo by zero'),
+    ('%', int_t): (numpy.remainder, 'integer division or modulo by zero'),
+    ('/', double_t): (numpy.true_divide, 'float division by zero'),
+    ('%', double_t): (numpy.remainder, 'float modulo'),
+}
+
+_unary_ops = {
+    '+': lambda value: value,
+    '-': numpy.negative,
+    '!': numpy.logical_not,
+}
+
+_casts = {
+    (int_t, int_t): lambda value, mask: value,
+    (double_t, int_t): _truncate,
+    (boolean_t, int_t): lambda value, mask: numpy.asarray(value, numpy.int32),
+    (int_t, double_t): lambda value, mask: numpy.asarray(value, numpy.float64),
+    (double_t, double_t): lambda value, mask: value,
+    (boolean_t, double_t): lambda value, mask: numpy.asarray(value, numpy.float64),
+}
+for _type in _dtypes:
+    _casts[_type, boolean_t] = lambda value, mask: value != 0
+del _type
+
+class _Compiler(object):
+
+    '''Compiler of a function and of the functions it calls.'''
+
+    def __init__(self):
+        # Cells of the compiled functions, so that calls can be compiled
+        # before their callees (see _call()):
+        self.cells = {}
+
+    def function(self, function):
+        '''Compile the function. Return the cell of its compiled form.'''
+        try:
+            return self.cells[function]
+        except KeyError:
+            pass
+        cell = self.cells[function] = [None]
+        if isinstance(function, builtins.pdf_function):
+            raise VectorizeError(function.position, "Built-in function '%s' cannot be vectorized" % function.name)
+        dtype = _dtype(function.type.return_type, function.position)
+        env = closures.Env()
+        body = self.statement(function.value, env)
+        cell[0] = _function(body, env.size, dtype)
+        return cell
+
+    def statement(self, node, env):
+        if isinstance(node, syntax.block):
+            return _block([self.statement(line, env) for line in node.contents])
+        elif isinstance(node, syntax.declaration):
+            result = []
+            for var in node.variables:
+                _dtype(var.type, var.position)
+                env.declare(var, assigned=var.value is not None or isinstance(node, syntax.argv))
+                if var.value is not None:
+                    result += _evaluation(self.write(var, var.value, env)),
+            return _block(result)
+        elif isinstance(node, syntax.evaluation):
+            return _evaluation(self.expression(node.expression, env))
+        elif isinstance(node, syntax.if_then_else):
+            return _if_then_else(
+                self.expression(node.expression, env),
+                self.statement(node.then_s, env),
+                self.statement(node.else_s, env)
+            )
+        elif isinstance(node, syntax.while_loop):
+            return _while_loop(
+                self.expression(node.expression, env),
+                self.statement(node.then_s, env),
+                self.statement(node.finally_s, env)
+            )
+        elif isinstance(node, syntax.return_statement):
+            return _return_value(self.expression(node.expression, env))
+        raise NotImplementedError()
+
+    def write(self, var, value, env):
+        return _write(env.slot(var), _dtype(var.type, var.position), self.expression(value, env), var in env.unassigned)
+
+    def expression(self, node, env):
+        if isinstance(node, expression.const):
+            return _const(_dtype(node.type, node.position)(node.value))
+        elif isinstance(node, expression.reference):
+            var = node.bind
+            if var in env.unassigned:
+                return _read_checked(env.slot(var), var.name)
+            return _read(env.slot(var))
+        elif isinstance(node, expression.assignment):
+            return self.write(node.lvalue.bind, node.rvalue, env)
+        elif isinstance(node, expression.binary_operator):
+            op = node.operator
+            left = self.expression(node.left, env)
+            right = self.expression(node.right, env)
+            if op == '&&':
+                return _and(left, right)
+            elif op == '||':
+                return _or(left, right)
+            elif op in _arithmetic_ops:
+                return _operator(_arithmetic_ops[op], left, right)
+            function, message = _division_ops[op, node.left.type]
+            return _division(function, message, left, right)
+        elif isinstance(node, expression.unary_operator):
+            return _unary(_unary_ops[node.operator], self.expression(node.left, env))
+        elif isinstance(node, expression.cast):
+            try:
+                function = _casts[node.expression.type, node.cast_type]
+            except KeyError:
+                if node.cast_type != void_t:
+                    raise VectorizeError(node.position, 'Cast to <%s> cannot be vectorized' % node.cast_type)
+                return self.expression(node.expression, env)
+            return _cast(function, self.expression(node.expression, env))
+        elif isinstance(node, expression.call):
+            callee = node.function.bind
+            if isinstance(callee, builtins.pdf_function):
+                raise VectorizeError(node.position, "Call of built-in function '%s' cannot be vectorized" % callee.name)
+            arguments = [self.expression(argument, env) for argument in node.arguments]
+            return _call(self.function(callee), _dtype(node.type, node.position), arguments)
+        raise NotImplementedError()
+
+def load(source):
+    '''Parse and check the Javalette source code. Return the checked program.
+    Raise VectorizeError if the program is not valid (the errors are printed
+    on stderr, as by the compiler).'''
+    from tokenizer import Tokenizer
+    from parser import Parser
+    tokenizer = Tokenizer()
+    tokenizer.build()
+    tokenizer.input(source)
+    program = Parser(tokenizer).parse()
+    context.add_pdf(program)
+    ok = context.inspect(program)
+    ok &= context.validate(program)
+    if not ok:
+        raise VectorizeError(None, 'Invalid program')
+    return program
+
+def vectorize(program, name):
+    '''Compile the function of the checked program with the given name into a
+    Python function, which takes arrays of the arguments (or anything that
+    numpy.asarray() accepts), broadcasts them against each other, and returns
+    the array of results.
+    Raise VectorizeError if the function cannot be vectorized.'''
+    for function in program.contents:
+        if function.name == name:
+            break
+    else:
+        raise VectorizeError(None, "Function '%s' undeclared" % name)
+    [entry] = _Compiler().function(function)
+    dtypes = [_dtype(type, function.position) for type in function.type.arg_type_list]
+    def vectorized(*arguments):
+        if len(arguments) != len(dtypes):
+            raise TypeError('%s() takes exactly %d arguments (%d given)' % (name, len(dtypes), len(arguments)))
+        arrays = numpy.broadcast_arrays(*[
+            numpy.asarray(argument).astype(dtype, casting='same_kind')
+            for argument, dtype in zip(arguments, dtypes)
+        ])
+        shape = arrays and arrays[0].shape or ()
+        lanes = int(numpy.prod(shape))
+        # Inactive lanes may overflow or divide by zero, harmlessly:
+        with numpy.errstate(all='ignore'):
+            result = entry([array.ravel() for array in arrays], lanes)
+        return result.reshape(shape)
+    vectorized.__name__ = name
+    return vectorized
+
+# vim:ts=4 sts=4 sw=4 et
@@ -22,6 +22,7 @@
 
 '''x86 (IA-32) assembly support.'''
 
+import itertools
 from tempfile import NamedTemporaryFile as mktemp
 from subprocess import call
 from shutil import copyfileobj
@@ -39,11 +40,26 @@ class GccError(CompileError):
     pass
 
 class Env(object):
-    def __init__(self, vsp=0):
+    def __init__(self, vsp=0, registers=None, sse2=False):
         self.vsp = vsp
+        # Register allocation of the function (see the registers module), or
+        # None if every variable is kept in memory:
+        self.registers = registers
+        # Whether doubles are computed in SSE2 registers (the value of a
+        # double expression is left in xmm0), rather than on the x87 stack
+        # (in st0):
+        self.sse2 = sse2
 
     def clone(self):
-        return Env(self.vsp)
+        return Env(self.vsp, self.registers, self.sse2)
+
+# Prefix of names of generated labels. Worker processes (see the parallel
+# module) use distinct prefixes, so that labels they generate never clash.
+label_prefix = ''
+_label_counter = itertools.count()
+
+def _new_label_name(kind):
+    return '_%s_%s%x' % (kind, label_prefix, _label_counter.next())
 
 class Const(object):
 
@@ -54,10 +70,11 @@ class Const(object):
         for arg in args:
             self.bytes += [ord(ch) for ch in arg]
         self.bytes = tuple(self.bytes)
+        self.name = _new_label_name('c')
 
     def __str__(self):
         '''Return a label for the constant.'''
-        return ('_c_%x' % id(self)).replace('-', 'M')
+        return self.name
 
 class Extern(object):
 
@@ -75,7 +92,7 @@ class Label(object):
 
     def __init__(self, name=None, public=False):
         if name is None:
-            name = ('_l_%x' % id(self)).replace('-', 'M')
+            name = _new_label_name('l')
         self.name = name
         self.public = public
 
@@ -83,9 +100,22 @@ class Label(object):
         '''Return the label'''
         return self.name
 
+class Fragment(object):
+
+    '''A part of the listing that has been already rendered.'''
+
+    def __init__(self, lines, consts):
+        self.lines = lines
+        self.consts = consts
+
 class Return(object):
+
     '''Pseudo-instruction: clean up the stack and return from a procedure/function.'''
-    pass
+
+    def __init__(self, saved=()):
+        '''Initialize the pseudo-instruction. 'saved' is the list of registers
+        pushed on entry to the function, which are to be restored.'''
+        self.saved = saved
 
 class SyncESP(object):
     '''Pseudo-instruction: forget any non-yet-performed lazy ESP operations.'''
@@ -169,62 +199,167 @@ _jmp_ops = set((
 
 import re
 
-_sj_ops_re = re.compile(r'\be?sp\b|^(%s)\b' % '|'.join(set(_stack_ops) | _jmp_ops))
-_bp_re = re.compile(r'##\((-?\d+)\)')
+_esp_re = re.compile(r'\be?sp\b')
 
-def compile(listing, o_file=None):
-    '''Compile the x86 assembly code into an executable ELF file.'''
-    asm_file = mktemp(prefix='jtc', suffix='.asm')
-    o_file_tmp = _maybe_mktemp(o_file, prefix='jtc', suffix='.o')
+class Frame(object):
+
+    '''A memory operand: a slot of the stack frame of the current function, at
+    the offset from the value that ESP had on entry to the function.'''
+
+    def __init__(self, offset, size=None):
+        self.offset = offset
+        self.size = size
+
+    def sized(self, size):
+        '''Return the operand, with the size specified.'''
+        return Frame(self.offset, size)
+
+    def render(self, esp):
+        '''Render the operand, given the current offset of ESP.'''
+        address = '[esp + %d]' % (self.offset + esp)
+        if self.size is None:
+            return address
+        return '%s %s' % (self.size, address)
+
+    def __repr__(self):
+        return '%s(%d, %r)' % (type(self).__name__, self.offset, self.size)
+
+class Instruction(object):
+
+    '''An instruction. Operands are strings (registers, immediates and other
+    memory references), integers (immediates), labels, constants, externs and
+    frame slots.'''
+
+    __slots__ = ('opcode', 'operands')
+
+    def __init__(self, opcode, *operands):
+        self.opcode = opcode
+        self.operands = operands
+
+    def refers_to_esp(self):
+        '''Return whether ESP is an operand of the instruction.'''
+        for operand in self.operands:
+            if operand.__class__ is str and 'sp' in operand and _esp_re.search(operand):
+                return True
+        return False
+
+    def uses_stack(self):
+        '''Return whether the instruction uses ESP, or changes it.'''
+        return self.opcode in _stack_ops or self.refers_to_esp()
+
+    def is_jump(self):
+        '''Return whether the instruction is a (conditional) jump.'''
+        return self.opcode in _jmp_ops
+
+    def render(self, esp):
+        '''Render the instruction into a text line, given the current offset
+        of ESP.'''
+        if not self.operands:
+            return '\t' + self.opcode
+        return '\t%s %s' % (self.opcode, ', '.join([
+            operand.__class__ is Frame and operand.render(esp) or str(operand)
+            for operand in self.operands
+        ]))
+
+    def __repr__(self):
+        return '%s%r' % (type(self).__name__, (self.opcode,) + self.operands)
+
+def parse(listing):
+    '''Parse the assembly text: replace lines of the listing with
+    instructions, and "<name>:" lines with labels.'''
+    result = []
+    for line in listing:
+        if isinstance(line, basestring):
+            if line.endswith(':'):
+                line = Label(line[:-1])
+            else:
+                opcode, _, operands = line.partition(' ')
+                operands = operands and operands.split(', ') or ()
+                line = Instruction(opcode, *operands)
+        result += line,
+    return result
+
+def is_memory(operand):
+    '''Return whether the operand is in memory.'''
+    return isinstance(operand, Frame) or (isinstance(operand, basestring) and operand.endswith(']'))
+
+def dword(operand):
+    '''Return the operand, with the size specified if it is in memory.'''
+    if isinstance(operand, Frame):
+        return operand.sized('DWORD')
+    if isinstance(operand, basestring) and operand.startswith('['):
+        return 'DWORD ' + operand
+    return operand
+
+def render(listing):
+    '''Render the x86 assembly code into text lines.
+    Return a fragment containing these lines and constants used by them.'''
+    lines = []
     consts = {}
     esp = 0
     lazy_esp = 0
-    print >>asm_file, 'BITS 32'
-    print >>asm_file, 'SECTION .text'
     for line in listing:
-        if isinstance(line, Const):
-            bytes = line.bytes
-            if bytes in consts:
-                consts[bytes] += line,
+        if isinstance(line, Instruction):
+            opcode = line.opcode
+            if lazy_esp != 0 and (line.uses_stack() or line.is_jump()):
+                lines += '\tlea esp, [esp + %d]' % lazy_esp,
+                esp -= lazy_esp
+                lazy_esp = 0
+            diff_esp = _stack_ops.get(opcode, 0)
+            if diff_esp == NotImplemented:
+                raise NotImplementedError('The "%s" x86 instruction is not supported' % opcode)
+            if diff_esp > 0:
+                # Addresses of pushed operands are computed before ESP is
+                # decreased:
+                lines += line.render(esp),
+                esp += diff_esp
             else:
-                consts[bytes] = [line]
-        elif isinstance(line, Extern):
-            print >>asm_file, 'EXTERN %s' % line
+                esp += diff_esp
+                lines += line.render(esp),
+        elif isinstance(line, Label):
+            if lazy_esp != 0:
+                lines += '\tlea esp, [esp + %d]' % lazy_esp,
+                esp -= lazy_esp
+                lazy_esp = 0
+            if line.public:
+                lines += 'GLOBAL %s' % line,
+            lines += '%s:' % line,
         elif isinstance(line, SubESP):
             lazy_esp -= line.n
+        elif isinstance(line, Const):
+            consts.setdefault(line.bytes, []).append(str(line))
+        elif isinstance(line, Fragment):
+            lines += line.lines
+            for bytes, names in line.consts.iteritems():
+                consts.setdefault(bytes, []).extend(names)
+        elif isinstance(line, Extern):
+            lines += 'EXTERN %s' % line,
         elif isinstance(line, SyncESP):
             lazy_esp = 0
             esp = 0
         elif isinstance(line, Return):
-            if esp:
-                print >>asm_file, '\tadd esp, %d' % esp
-            print >>asm_file, '\tret'
+            cleanup = esp - 4 * len(line.saved)
+            if cleanup:
+                lines += '\tadd esp, %d' % cleanup,
+            for register in reversed(line.saved):
+                lines += '\tpop %s' % register,
+            lines += '\tret',
         else:
-            was_label = isinstance(line, Label)
-            if was_label and line.public:
-                print >>asm_file, 'GLOBAL %s' % line
-            line = str(line)
-            if was_label:
-                line += ':'
-            was_instr = line[:1].islower() and not was_label
-            if was_instr:
-                op = line.split(None, 1)[0]
-                if op in _stack_ops:
-                    diff_esp = _stack_ops[op]
-                    if diff_esp == NotImplemented:
-                        raise NotImplementedError('The "%s" x86 instruction is not supported' % op)
-                    esp += diff_esp
-            if lazy_esp != 0 and (_sj_ops_re.search(line) or was_label):
-                print >>asm_file, '\tlea esp, [esp + %d]' % lazy_esp
-                esp -= lazy_esp
-                lazy_esp = 0
-            if was_instr:
-                line = re.sub(_bp_re, lambda m: 'esp + %d' % (int(m.group(1)) + esp), line)
-                line = '\t' + line
-            print >>asm_file, line
-    for bytes, lines in consts.iteritems():
-        for line in lines:
-            print >>asm_file, '%s:' % line
+            raise TypeError('Unexpected item of x86 listing: %r' % (line,))
+    return Fragment(lines, consts)
+
+def compile(listing, o_file=None):
+    '''Compile the x86 assembly code into an executable ELF file.'''
+    asm_file = mktemp(prefix='jtc', suffix='.asm')
+    o_file_tmp = _maybe_mktemp(o_file, prefix='jtc', suffix='.o')
+    fragment = render(listing)
+    print >>asm_file, 'BITS 32'
+    print >>asm_file, 'SECTION .text'
+    for line in fragment.lines:
+        print >>asm_file, line
+    for bytes, names in fragment.consts.iteritems():
+        for name in names:
+            print >>asm_file, '%s:' % name
         print >>asm_file, '\tDB %s' % ','.join(str(byte) for byte in bytes)
     asm_file.flush()
     retcode = call(['nasm', '-O3', '-f', 'elf', asm_file.name, '-o', o_file_tmp.name])
@@ -0,0 +1,510 @@
+# encoding=UTF-8
+
+# Copyright © 2007-2017 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Peephole optimizer for x86 listings.
+
+Rules rewrite short sequences of instructions. Some of them need a register
+to be dead after the sequence: a register is dead if straight-line code that
+follows overwrites it before reading it (or calls a function, which clobbers
+eax, ecx and edx). Jumps are followed to their targets within the function;
+the search gives up, conservatively, after a bounded number of instructions
+and paths.
+
+ESP is never tracked here: pushes and pops are only removed in pairs, around
+instructions that don't refer to ESP (other than through frame slots, which
+the renderer addresses from the current ESP).'''
+
+import re
+
+import x86
+
+__all__ = ['optimize', 'count', 'rules']
+
+_registers = ('eax', 'ebx', 'ecx', 'edx', 'esi', 'edi', 'ebp', 'esp')
+
+_aliases_re = {
+    'eax': re.compile(r'\b(?:eax|ax|al|ah)\b'),
+    'ebx': re.compile(r'\b(?:ebx|bx|bl|bh)\b'),
+    'ecx': re.compile(r'\b(?:ecx|cx|cl|ch)\b'),
+    'edx': re.compile(r'\b(?:edx|dx|dl|dh)\b'),
+    'esi': re.compile(r'\b(?:esi|si)\b'),
+    'edi': re.compile(r'\b(?:edi|di)\b'),
+    'ebp': re.compile(r'\b(?:ebp|bp)\b'),
+    'esp': re.compile(r'\b(?:esp|sp)\b'),
+}
+
+# Instructions that overwrite their first operand without reading it:
+_moves = frozenset(['mov', 'movzx', 'movsx', 'lea', 'pop'])
+
+# Registers read or written by instructions, besides their operands:
+_implicit_reads = {
+    'cdq': ('eax',),
+    'idiv': ('eax', 'edx'),
+    'div': ('eax', 'edx'),
+    'ret': ('eax',),
+}
+_implicit_writes = {
+    'cdq': ('edx',),
+    'idiv': ('edx',),
+    'div': ('edx',),
+    'call': ('eax', 'ecx', 'edx'),
+}
+
+_commutative_ops = frozenset(['add', 'imul', 'and', 'or', 'xor'])
+_arithmetic_ops = _commutative_ops | frozenset(['sub', 'cmp'])
+_flag_setting_ops = frozenset(['and', 'or', 'xor'])
+
+# Instructions that set all the flags that conditional instructions read:
+_flag_writing_ops = frozenset([
+    'add', 'sub', 'cmp', 'test', 'and', 'or', 'xor', 'neg',
+    'ucomisd', 'fucomi', 'fucomip',
+])
+
+_immediate_prefixes = frozenset('-"0123456789')
+
+# How far to look for uses of a register, and along how many paths:
+_max_distance = 32
+_max_paths = 8
+
+def _mentions(operand, register):
+    '''Return whether the operand refers to the register (or a part of it).'''
+    return operand.__class__ is str and _aliases_re[register].search(operand) is not None
+
+def _is_register(operand):
+    return operand in _registers
+
+def _is_immediate(operand):
+    if isinstance(operand, (int, long, x86.Label, x86.Const, x86.Extern)):
+        return True
+    # Numbers and character constants:
+    return isinstance(operand, str) and operand[:1] in _immediate_prefixes
+
+def _same(operand, other):
+    if isinstance(operand, x86.Frame):
+        return isinstance(other, x86.Frame) and operand.offset == other.offset
+    return operand == other
+
+def _reads_flags(instruction):
+    opcode = instruction.opcode
+    return (instruction.is_jump() and opcode != 'jmp') or opcode.startswith(('set', 'cmov')) or opcode in ('adc', 'sbb')
+
+def _flags_are_dead(listing, i):
+    '''Return whether no instruction may read the flags, as they are at
+    position i of the listing, before setting them.'''
+    for item in listing[i:i + _max_distance]:
+        if isinstance(item, x86.Instruction):
+            if _reads_flags(item) or item.is_jump():
+                return False
+            if item.opcode in _flag_writing_ops or item.opcode in ('call', 'ret'):
+                # Flags are not preserved across calls and returns:
+                return True
+        elif isinstance(item, x86.Return):
+            return True
+        elif not isinstance(item, (x86.SubESP, x86.Const, x86.Extern)):
+            # Labels, and anything unknown:
+            return False
+    return False
+
+def _is_single_imul(instruction):
+    return instruction.opcode in ('imul', 'mul') and len(instruction.operands) == 1
+
+def _reads(instruction, register):
+    '''Return whether the instruction may read the register.'''
+    opcode = instruction.opcode
+    operands = instruction.operands
+    if register in _implicit_reads.get(opcode, ()) or (register == 'eax' and _is_single_imul(instruction)):
+        return True
+    if opcode in ('xor', 'sub') and len(operands) == 2 and operands[0] == operands[1] and _is_register(operands[0]):
+        # Zeroing idioms:
+        return False
+    if opcode in _moves and _is_register(operands[0]):
+        operands = operands[1:]
+    for operand in operands:
+        if _mentions(operand, register):
+            return True
+    return False
+
+def _kills(instruction, register):
+    '''Return whether the instruction overwrites the whole register, and
+    doesn't read it.'''
+    opcode = instruction.opcode
+    operands = instruction.operands
+    if register in _implicit_writes.get(opcode, ()) or (register == 'edx' and _is_single_imul(instruction)):
+        return not _reads(instruction, register)
+    if opcode in _moves or opcode in ('xor', 'sub'):
+        return operands[0] == register and not _reads(instruction, register)
+    return False
+
+def _is_dead(listing, i, register, labels):
+    '''Return whether the register is dead at position i of the listing.
+    'labels' maps labels to their positions.'''
+    pending = [i]
+    seen = set()
+    while pending:
+        i = pending.pop()
+        if i in seen:
+            continue
+        seen.add(i)
+        if len(seen) > _max_paths:
+            return False
+        for item in listing[i:i + _max_distance]:
+            if isinstance(item, x86.Instruction):
+                if _reads(item, register):
+                    return False
+                if _kills(item, register) or item.opcode == 'ret':
+                    break
+                if item.is_jump():
+                    [target] = item.operands
+                    if target not in labels:
+                        return False
+                    pending += labels[target],
+                    if item.opcode == 'jmp':
+                        break
+            elif isinstance(item, x86.Return):
+                if register == 'eax':
+                    return False
+                break
+            elif not isinstance(item, (x86.Label, x86.SubESP, x86.Const, x86.Extern)):
+                return False
+        else:
+            return False
+    return True
+
+def _instructions(listing, i, n):
+    '''Return the n items at position i, if they are all instructions.'''
+    items = listing[i:i + n]
+    if len(items) < n:
+        return None
+    for item in items:
+        if not isinstance(item, x86.Instruction):
+            return None
+    return items
+
+def _push_pop(listing, i, labels):
+    # push A; ...; pop B -> mov B, A; ...
+    # where A is a register or an immediate, and the instructions in between
+    # don't touch B or the stack:
+    push = listing[i]
+    if push.opcode != 'push' or not (_is_register(push.operands[0]) or _is_immediate(push.operands[0])):
+        return None
+    [source] = push.operands
+    if source == 'esp':
+        return None
+    j = i + 1
+    while j < len(listing) and j - i <= _max_distance:
+        item = listing[j]
+        if not isinstance(item, x86.Instruction):
+            return None
+        if item.opcode == 'pop':
+            break
+        if item.uses_stack() or item.is_jump():
+            return None
+        j += 1
+    else:
+        return None
+    [target] = listing[j].operands
+    if not _is_register(target) or target == 'esp':
+        return None
+    middle = listing[i + 1:j]
+    for item in middle:
+        if _reads(item, target) or _kills(item, target) or target in _implicit_writes.get(item.opcode, ()):
+            return None
+        for operand in item.operands:
+            if _mentions(operand, target):
+                return None
+        if target == 'edx' and _is_single_imul(item):
+            return None
+    if source == target:
+        if middle:
+            return None
+        return [], j + 1 - i
+    return [x86.Instruction('mov', target, source)] + middle, j + 1 - i
+
+def _exchange(listing, i, labels):
+    # mov A, B; mov B, S; xchg B, A -> mov A, S
+    items = _instructions(listing, i, 3)
+    if items is None:
+        return None
+    first, second, third = items
+    if not (first.opcode == 'mov' and second.opcode == 'mov' and third.opcode == 'xchg'):
+        return None
+    a, b = first.operands
+    if not (_is_register(a) and _is_register(b) and second.operands[0] == b):
+        return None
+    if sorted(third.operands) != sorted([a, b]):
+        return None
+    source = second.operands[1]
+    if _mentions(source, a) or _mentions(source, b):
+        return None
+    return [x86.Instruction('mov', a, source)], 3
+
+def _arithmetic(opcode, target, source):
+    if opcode == 'imul' and _is_immediate(source):
+        return x86.Instruction('imul', target, target, source)
+    return x86.Instruction(opcode, target, source)
+
+def _commute(listing, i, labels):
+    # mov R, eax; mov eax, S; op eax, R -> op eax, S
+    # where op is commutative, and R is dead afterwards:
+    items = _instructions(listing, i, 3)
+    if items is None:
+        return None
+    first, second, third = items
+    if not (first.opcode == 'mov' and second.opcode == 'mov'):
+        return None
+    register, value = first.operands
+    if value != 'eax' or not _is_register(register) or second.operands[0] != 'eax':
+        return None
+    source = second.operands[1]
+    if _mentions(source, 'eax') or _mentions(source, register):
+        return None
+    if _is_single_imul(third) and third.operands[0] == register:
+        opcode = 'imul'
+    elif third.opcode in _commutative_ops and third.operands == ('eax', register):
+        opcode = third.opcode
+    else:
+        return None
+    if not _is_dead(listing, i + 3, register, labels) or (_is_single_imul(third) and not _is_dead(listing, i + 3, 'edx', labels)):
+        return None
+    return [_arithmetic(opcode, 'eax', source)], 3
+
+def _compare(listing, i, labels):
+    # mov R, eax; mov eax, S; cmp R, eax; setcc al; and eax, 1
+    # -> cmp eax, S; setcc al; and eax, 1
+    # where R is dead afterwards:
+    items = _instructions(listing, i, 5)
+    if items is None:
+        return None
+    first, second, third, fourth, fifth = items
+    if not (first.opcode == 'mov' and second.opcode == 'mov' and third.opcode == 'cmp'):
+        return None
+    register, value = first.operands
+    if value != 'eax' or not _is_register(register) or second.operands[0] != 'eax':
+        return None
+    source = second.operands[1]
+    if _mentions(source, 'eax') or _mentions(source, register):
+        return None
+    if third.operands != (register, 'eax'):
+        return None
+    if not (fourth.opcode.startswith('set') and fourth.operands == ('al',)):
+        return None
+    if not (fifth.opcode == 'and' and fifth.operands == ('eax', 1)):
+        return None
+    if not _is_dead(listing, i + 5, register, labels):
+        return None
+    return [x86.Instruction('cmp', 'eax', source), fourth, fifth], 5
+
+def _exchange_commutative(listing, i, labels):
+    # xchg A, B; op A, B -> op A, B
+    # where op is commutative, and B is dead afterwards:
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if first.opcode != 'xchg' or second.opcode not in _commutative_ops:
+        return None
+    if sorted(first.operands) != sorted(second.operands):
+        return None
+    if not (_is_register(second.operands[0]) and _is_register(second.operands[1])):
+        return None
+    if not _is_dead(listing, i + 2, second.operands[1], labels):
+        return None
+    return [second], 2
+
+def _fold_operand(listing, i, labels):
+    # mov R, S; op D, R -> op D, S
+    # where R is dead afterwards:
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if first.opcode != 'mov' or not _is_register(first.operands[0]):
+        return None
+    register, source = first.operands
+    if _mentions(source, register):
+        return None
+    if _is_single_imul(second) and second.operands[0] == register:
+        if not _is_dead(listing, i + 2, 'edx', labels):
+            return None
+        target = 'eax'
+        opcode = 'imul'
+    elif second.opcode in _arithmetic_ops and len(second.operands) == 2 and second.operands[1] == register:
+        target = second.operands[0]
+        opcode = second.opcode
+        if not _is_register(target) or target == register:
+            return None
+    else:
+        return None
+    if _mentions(source, target) and x86.is_memory(source):
+        return None
+    if not _is_dead(listing, i + 2, register, labels):
+        return None
+    return [_arithmetic(opcode, target, source)], 2
+
+def _store_load(listing, i, labels):
+    # mov X, Y; mov Y, X -> mov X, Y (and the same for "movsd")
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if not (first.opcode in ('mov', 'movsd') and second.opcode == first.opcode):
+        return None
+    if not (_same(first.operands[0], second.operands[1]) and _same(first.operands[1], second.operands[0])):
+        return None
+    return [first], 2
+
+def _redundant_test(listing, i, labels):
+    # and R, S; or R, R -> and R, S (and the same for "or", "xor" and "test")
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if first.opcode not in _flag_setting_ops or second.opcode not in ('or', 'test'):
+        return None
+    register = first.operands[0]
+    if not _is_register(register) or second.operands != (register, register):
+        return None
+    return [first], 2
+
+def _true(listing, i, labels):
+    # xor R, R; inc R -> mov R, 1
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if not (first.opcode == 'xor' and second.opcode == 'inc'):
+        return None
+    register = second.operands[0]
+    if first.operands != (register, register):
+        return None
+    # Unlike inc, mov leaves the flags alone:
+    if not _flags_are_dead(listing, i + 2):
+        return None
+    return [x86.Instruction('mov', register, 1)], 2
+
+def _push_operand(listing, i, labels):
+    # mov R, S; push R -> push S
+    # where R is dead afterwards:
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if not (first.opcode == 'mov' and second.opcode == 'push'):
+        return None
+    register, source = first.operands
+    if not _is_register(register) or second.operands != (register,) or register == 'esp':
+        return None
+    if _mentions(source, register) or not _is_dead(listing, i + 2, register, labels):
+        return None
+    return [x86.Instruction('push', x86.dword(source))], 2
+
+def _store_operand(listing, i, labels):
+    # mov R, S; mov D, R -> mov D, S
+    # where R is dead afterwards, and S and D are not both in memory:
+    items = _instructions(listing, i, 2)
+    if items is None:
+        return None
+    first, second = items
+    if not (first.opcode == 'mov' and second.opcode == 'mov'):
+        return None
+    register, source = first.operands
+    target = second.operands[0]
+    if not _is_register(register) or second.operands[1] != register:
+        return None
+    if _mentions(source, register) or _mentions(target, register) or _same(target, source):
+        return None
+    if x86.is_memory(source) and x86.is_memory(target):
+        return None
+    if x86.is_memory(target) and _is_immediate(source):
+        target = x86.dword(target)
+    if not _is_dead(listing, i + 2, register, labels):
+        return None
+    return [x86.Instruction('mov', target, source)], 2
+
+# The rules, by priority: every rule is applied to the whole listing, before
+# the next one is tried.
+rules = [
+    ('push-pop', _push_pop),
+    ('exchange', _exchange),
+    ('commute', _commute),
+    ('compare', _compare),
+    ('exchange-commutative', _exchange_commutative),
+    ('fold-operand', _fold_operand),
+    ('store-load', _store_load),
+    ('redundant-test', _redundant_test),
+    ('true', _true),
+    ('push-operand', _push_operand),
+    ('store-operand', _store_operand),
+]
+
+def _sweep(listing, rule):
+    '''Apply the rule wherever it matches. Return the new listing and the
+    number of matches.'''
+    labels = {}
+    for i, item in enumerate(listing):
+        if isinstance(item, x86.Label):
+            labels[item] = i
+    result = []
+    hits = 0
+    i = 0
+    n = len(listing)
+    while i < n:
+        item = listing[i]
+        if isinstance(item, x86.Instruction):
+            match = rule(listing, i, labels)
+            if match is not None:
+                replacement, length = match
+                result += replacement
+                hits += 1
+                i += length
+                continue
+        result += item,
+        i += 1
+    return result, hits
+
+def optimize(listing, hits=None):
+    '''Optimize the listing in place. If 'hits' is a dictionary, add to it the
+    number of times every rule matched.'''
+    result = listing
+    changed = True
+    while changed:
+        changed = False
+        for name, rule in rules:
+            result, n = _sweep(result, rule)
+            if n:
+                changed = True
+                if hits is not None:
+                    hits[name] = hits.get(name, 0) + n
+    listing[:] = result
+
+def count(listing):
+    '''Return the number of instructions in the listing, and the number of
+    them that access memory (including the stack).'''
+    n = m = 0
+    for item in listing:
+        if isinstance(item, x86.Instruction):
+            n += 1
+            if item.opcode in ('push', 'pop') or any(x86.is_memory(operand) for operand in item.operands):
+                m += 1
+    return n, m
+
+# vim:ts=4 sts=4 sw=4 et